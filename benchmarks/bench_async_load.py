@@ -0,0 +1,81 @@
+"""Load test of concurrent requests, with blocking versus threaded data access.
+
+Fires concurrent requests at the app in process through an ASGI transport,
+so every request shares one event loop as under uvicorn. The "blocking" app
+calls the synchronous data access functions directly from its endpoints, as
+the routers used to; the "threaded" app is the real one.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_async_load
+"""
+import asyncio
+import logging
+import tempfile
+import time
+from pathlib import Path
+import httpx
+from fastapi import FastAPI
+from code.main import app as threaded_app
+from code.models import Car
+from code.data_access import utils
+from code.data_access.cars import create_car, get_available_cars
+
+REQUESTS = 400
+CONCURRENCY = 50
+
+blocking_app = FastAPI()
+
+
+@blocking_app.get("/cars/list_availables")
+async def blocking_list():
+    return get_available_cars()
+
+
+@blocking_app.post("/cars/new_car", status_code=201)
+async def blocking_create(car: Car):
+    return create_car(car)
+
+
+def _car(number: int) -> dict:
+    return {
+        "brand": "Toyota",
+        "model": "Model_5",
+        "year": 2020,
+        "license_plate": f"{number:06d}Y",
+        "fuel_type": "Gasoline",
+        "transmission": "Automatic",
+        "price": 50.0
+    }
+
+
+async def _load(app: FastAPI) -> float:
+    """Return the throughput of a mix of 1 write for 9 reads, in requests per second"""
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def request(number: int):
+            async with semaphore:
+                if number % 10 == 0:
+                    response = await client.post("/cars/new_car", json=_car(number))
+                else:
+                    response = await client.get("/cars/list_availables")
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(request(number) for number in range(REQUESTS)))
+        return REQUESTS / (time.perf_counter() - started)
+
+
+def run(app: FastAPI) -> float:
+    with tempfile.TemporaryDirectory() as data_dir:
+        utils.DATA_DIR = Path(data_dir)
+        for name in ("cars.json", "bookings.json"):
+            (utils.DATA_DIR / name).write_text("[]")
+        return asyncio.run(_load(app))
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    for name, app in (("blocking", blocking_app), ("threaded", threaded_app)):
+        print(f"{name:>9}: {run(app):8.1f} requests/s")
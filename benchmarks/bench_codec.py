@@ -0,0 +1,84 @@
+"""Benchmark of the JSON codec: load and save of 100k stored records.
+
+Compares the previous path (stdlib `json` with `indent=2`, one `Car(**record)`
+or `model_dump()` per record) against the current one (compact output, orjson
+when installed, whole-list conversion through a `TypeAdapter` with the
+garbage collector paused, as the table loads do). Pass another number of
+records as argument to change the size.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_codec [records]
+"""
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from code.models import Car
+from code.data_access import codec, utils
+from code.data_access.store import ModelRecords
+from benchmarks.bench_columnar import generate_records as generate_bookings
+from code.data_access.columnar import BookingColumns
+
+
+def generate_cars(total: int) -> list:
+    """Generate stored cars as plain records"""
+    return [
+        {
+            "id": car_id,
+            "brand": "Toyota",
+            "model": f"Model_{car_id % 20}",
+            "year": 2000 + car_id % 25,
+            "license_plate": f"{car_id % 10_000:04d}ABC",
+            "fuel_type": "Gasoline",
+            "transmission": "Automatic",
+            "price": 20.0 + car_id % 80,
+            "status": "Available",
+        }
+        for car_id in range(1, total + 1)
+    ]
+
+
+def timed(function) -> float:
+    started = time.perf_counter()
+    function()
+    return time.perf_counter() - started
+
+
+def previous_path(path: Path, data: list) -> dict:
+    """Time the stdlib codec with one pydantic model per car"""
+    cars = [Car(**record) for record in data]
+    results = {"save_s": timed(lambda: path.write_text(
+        json.dumps([car.model_dump() for car in cars], indent=2, default=str), encoding="utf-8"
+    ))}
+    results["load_s"] = timed(lambda: [Car(**record) for record in json.loads(path.read_text(encoding="utf-8"))])
+    results["size_mb"] = path.stat().st_size / 2**20
+    return results
+
+
+def current_path(filename: str, records, data: list) -> dict:
+    """Time the codec of the data files with the container of the table"""
+    records.load(data)
+    results = {"save_s": timed(lambda: utils._save_file(filename, records.dump()))}
+    with codec.paused_gc():
+        results["load_s"] = timed(lambda: records.load(utils._load_file(filename)))
+    results["size_mb"] = (utils.DATA_DIR / filename).stat().st_size / 2**20
+    return results
+
+
+def report(name: str, result: dict) -> None:
+    print(f"{name:>18}: save {result['save_s']:6.2f} s, load {result['load_s']:6.2f} s, "
+          f"file {result['size_mb']:6.1f} MB")
+
+
+if __name__ == "__main__":
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(f"{total} records, orjson {'enabled' if codec.orjson is not None else 'not installed'}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        utils.DATA_DIR = Path(directory)
+        cars = generate_cars(total)
+        report("cars, previous", previous_path(utils.DATA_DIR / "previous.json", cars))
+        report("cars, current", current_path("cars.json", ModelRecords(Car), cars))
+        report("bookings, current", current_path("bookings.json", BookingColumns(), generate_bookings(total)))
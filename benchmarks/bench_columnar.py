@@ -0,0 +1,81 @@
+"""Benchmark of the columnar booking store against one pydantic model per booking.
+
+Measures the memory held by 1M loaded bookings and the throughput of the
+column scans. Pass another number of bookings as argument to change the size.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_columnar [bookings]
+"""
+import gc
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+from code.models import Booking
+from code.data_access import columnar
+from code.data_access.columnar import BookingColumns
+from code.data_access.store import ModelRecords
+
+CARS = 1_000
+QUERIES = 20
+
+
+def generate_records(total: int) -> list:
+    """Generate stored bookings as plain records, as loaded from JSON"""
+    first_day = date(2020, 1, 1)
+    return [
+        {
+            "id": booking_id,
+            "car_id": booking_id % CARS + 1,
+            "customer_email": f"customer{booking_id % 50_000}@example.com",
+            "start_date": str(first_day + timedelta(days=booking_id // CARS * 8)),
+            "end_date": str(first_day + timedelta(days=booking_id // CARS * 8 + 7)),
+            "total_days": 7.0,
+            "total_price": 140.0,
+            "status": "Active",
+        }
+        for booking_id in range(1, total + 1)
+    ]
+
+
+def measure_load(records, data: list) -> dict:
+    """Return the time to load the records and the memory they hold"""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    records.load(data)
+    elapsed = time.perf_counter() - started
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return {"load_s": elapsed, "memory_mb": memory / 2**20}
+
+
+def measure_queries(columns: BookingColumns, total: int) -> dict:
+    """Return the mean latency of the column scans, in milliseconds"""
+    span = total // CARS * 8
+    results = {}
+    for name, query in (
+        ("dump_between", lambda start: columns.dump_between("start_date", start, start + timedelta(days=30))),
+        ("finished_ids", lambda start: columns.finished_ids(start)),
+    ):
+        started = time.perf_counter()
+        for number in range(QUERIES):
+            query(date(2020, 1, 1) + timedelta(days=span * number // QUERIES))
+        results[f"{name}_ms"] = (time.perf_counter() - started) / QUERIES * 1e3
+    return results
+
+
+if __name__ == "__main__":
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    data = generate_records(total)
+    print(f"{total} bookings, NumPy {'enabled' if columnar._numpy() is not None else 'not installed'}")
+
+    result = measure_load(ModelRecords(Booking), data)
+    print(f"  models: load {result['load_s']:6.2f} s, memory {result['memory_mb']:8.1f} MB")
+    columns = BookingColumns()
+    result = measure_load(columns, data)
+    print(f" columns: load {result['load_s']:6.2f} s, memory {result['memory_mb']:8.1f} MB")
+
+    for name, value in measure_queries(columns, total).items():
+        print(f"{name:>16}: {value:8.2f} ms")
@@ -0,0 +1,62 @@
+"""Benchmark of the booking conflict check against the number of stored bookings.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_interval_index
+"""
+import random
+import time
+from datetime import date, timedelta
+from code.models import Booking, BookingStatus
+from code.data_access.indexes import IntervalIndex
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+CARS = 1_000
+LOOKUPS = 100_000
+FIRST_DAY = date(2020, 1, 1)
+
+
+def generate_bookings(total: int):
+    """Generate non-overlapping active bookings spread over the fleet"""
+    per_car = total // CARS
+    booking_id = 0
+    for car_id in range(1, CARS + 1):
+        day = FIRST_DAY
+        for _ in range(per_car):
+            booking_id += 1
+            day += timedelta(days=random.randint(0, 3))
+            length = random.randint(1, 7)
+            yield Booking.model_construct(
+                id=booking_id,
+                car_id=car_id,
+                customer_email="bench@example.com",
+                start_date=day,
+                end_date=day + timedelta(days=length),
+                status=BookingStatus.active
+            )
+            day += timedelta(days=length)
+
+
+def run(total: int) -> float:
+    """Return the mean latency of a conflict check in microseconds"""
+    index = IntervalIndex()
+    index.rebuild(generate_bookings(total))
+
+    span = (total // CARS) * 7
+    queries = []
+    for _ in range(LOOKUPS):
+        start = FIRST_DAY + timedelta(days=random.randint(0, span))
+        queries.append((random.randint(1, CARS), start, start + timedelta(days=random.randint(1, 7))))
+
+    started = time.perf_counter()
+    for car_id, start_date, end_date in queries:
+        index.find_conflict(car_id, start_date, end_date)
+    elapsed = time.perf_counter() - started
+    return elapsed / LOOKUPS * 1e6
+
+
+if __name__ == "__main__":
+    random.seed(0)
+    print(f"{'bookings':>10}  {'us/check':>9}")
+    for size in SIZES:
+        print(f"{size:>10}  {run(size):>9.2f}")
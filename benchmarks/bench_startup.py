@@ -0,0 +1,89 @@
+"""Benchmark of the cold start: import time, warm-up and time to the first response.
+
+Every run starts a fresh interpreter, which imports the app, optionally warms
+it up, then sends a first request checking the availability of the cars,
+which needs both tables and their indexes. Times are measured from the start
+of the import. Runs in three modes:
+
+- "on demand": no warm-up, the first request loads the tables,
+- "warm-up": the tables are loaded from the storage before the request,
+- "snapshot": the tables are restored from snapshots written by a previous run.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_startup [bookings]
+"""
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from benchmarks.datagen import FIRST_DAY, SIZES, write_dataset
+
+MODES = ["on demand", "warm-up", "snapshot"]
+
+
+def _child(mode: str, data_dir: str) -> dict:
+    """Start the app in this process and time it, `mode` being one of `MODES` or "save" to write the snapshots"""
+    started = time.perf_counter()
+    import asyncio
+    import logging
+    import httpx
+    from code.main import app
+    from code.data_access import utils, warmup
+    imported = time.perf_counter()
+    logging.disable(logging.INFO)
+    utils.DATA_DIR = Path(data_dir)
+
+    if mode == "save":
+        warmup.warm_up(snapshots=False)
+        warmup.save_snapshots()
+        return {}
+    if mode != "on demand":
+        warmup.warm_up(snapshots=mode == "snapshot")
+    warmed_up = time.perf_counter()
+
+    async def first_request():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            response = await client.get("/cars/available", params={"start": str(FIRST_DAY), "end": "2020-01-08"})
+            response.raise_for_status()
+
+    asyncio.run(first_request())
+    return {
+        "import_s": imported - started,
+        "warm_up_s": warmed_up - imported,
+        "first_response_s": time.perf_counter() - started,
+    }
+
+
+def _run_child(mode: str, data_dir: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup", "--child", mode, data_dir],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def run(total: int) -> dict:
+    with tempfile.TemporaryDirectory() as data_dir:
+        write_dataset(Path(data_dir), total)
+        results = {}
+        for mode in MODES:
+            if mode == "snapshot":
+                _run_child("save", data_dir)
+            results[mode] = _run_child(mode, data_dir)
+        return results
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        print(json.dumps(_child(sys.argv[2], sys.argv[3])))
+        sys.exit()
+
+    total = SIZES.get(sys.argv[1]) or int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(f"{total} bookings")
+    print(f"{'mode':>10}  {'import s':>9}  {'warm-up s':>9}  {'first response s':>16}")
+    for mode, result in run(total).items():
+        print(f"{mode:>10}  {result['import_s']:>9.3f}  {result['warm_up_s']:>9.3f}  {result['first_response_s']:>16.3f}")
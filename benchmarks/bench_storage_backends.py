@@ -0,0 +1,70 @@
+"""Benchmark of the storage backends: load time and cost of single writes.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_storage_backends
+"""
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from code.models import Booking
+from code.data_access import utils
+from code.data_access.locks import data_lock
+from code.data_access.storage import get_storage
+from code.data_access.store import bookings_table
+
+BACKENDS = ["json", "log", "sqlite"]
+SIZES = [1_000, 10_000, 100_000]
+WRITES = 20
+
+
+def generate_bookings(total: int) -> list:
+    """Generate stored bookings as plain records"""
+    first_day = date(2020, 1, 1)
+    return [
+        {
+            "id": booking_id,
+            "car_id": booking_id % 500 + 1,
+            "customer_email": f"customer{booking_id}@example.com",
+            "start_date": str(first_day + timedelta(days=booking_id // 500 * 8)),
+            "end_date": str(first_day + timedelta(days=booking_id // 500 * 8 + 7)),
+            "total_days": 7.0,
+            "total_price": 140.0,
+            "status": "Active",
+        }
+        for booking_id in range(1, total + 1)
+    ]
+
+
+def run(backend: str, total: int) -> dict:
+    """Return the load time and the mean write latency of a backend, in milliseconds"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        utils.DATA_DIR = Path(data_dir)
+        utils.STORAGE_BACKEND = backend
+        with data_lock():
+            get_storage().compact("bookings.json", generate_bookings(total))
+
+        started = time.perf_counter()
+        bookings_table.all()
+        load = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for booking_id in range(total + 1, total + WRITES + 1):
+            bookings_table.insert(Booking(
+                id=booking_id,
+                car_id=1,
+                customer_email="bench@example.com",
+                start_date=date(2040, 1, 1),
+                end_date=date(2040, 1, 2)
+            ))
+        write = (time.perf_counter() - started) / WRITES
+        return {"load_ms": load * 1e3, "write_ms": write * 1e3}
+
+
+if __name__ == "__main__":
+    print(f"{'backend':>8}  {'bookings':>9}  {'load ms':>9}  {'write ms':>9}")
+    for size in SIZES:
+        for backend in BACKENDS:
+            result = run(backend, size)
+            print(f"{backend:>8}  {size:>9}  {result['load_ms']:>9.1f}  {result['write_ms']:>9.2f}")
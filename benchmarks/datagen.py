@@ -0,0 +1,89 @@
+"""Synthetic data generator for the benchmarks.
+
+Generates `cars.json` and `bookings.json` with a given number of bookings and
+one car for every 10 bookings (at least 100). The data only depends on the
+seed, so runs with the same arguments are comparable.
+
+Run from the repository root:
+
+    python -m benchmarks.datagen <bookings> <data dir> [seed]
+"""
+import random
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+from code.data_access import codec
+
+BRANDS = {
+    "Toyota": ["Corolla", "Yaris", "RAV4"],
+    "Seat": ["Ibiza", "Leon", "Ateca"],
+    "Tesla": ["Model_3", "Model_Y"],
+    "Renault": ["Clio", "Megane", "Zoe"],
+}
+FUEL_TYPES = ["Gasoline", "Diesel", "Electric", "Hybrid"]
+TRANSMISSIONS = ["Manual", "Automatic"]
+FIRST_DAY = date(2020, 1, 1)
+SIZES = {"1k": 1_000, "100k": 100_000, "1M": 1_000_000}
+
+
+def car_count(bookings: int) -> int:
+    return max(bookings // 10, 100)
+
+
+def generate_cars(total: int, seed: int = 0) -> list:
+    """Generate stored cars, 90% of them available"""
+    rng = random.Random(seed)
+    cars = []
+    for car_id in range(1, total + 1):
+        brand = rng.choice(list(BRANDS))
+        cars.append({
+            "id": car_id,
+            "brand": brand,
+            "model": rng.choice(BRANDS[brand]),
+            "year": rng.randint(2010, 2025),
+            "license_plate": f"{car_id:07d}",
+            "fuel_type": rng.choice(FUEL_TYPES),
+            "transmission": rng.choice(TRANSMISSIONS),
+            "price": float(rng.randint(20, 150)),
+            "status": "Available" if rng.random() < 0.9 else "Maintenance",
+        })
+    return cars
+
+
+def generate_bookings(total: int, cars: int, seed: int = 0) -> list:
+    """Generate stored bookings, back to back for each car from 2020 on"""
+    rng = random.Random(seed + 1)
+    next_start = [FIRST_DAY] * (cars + 1)
+    bookings = []
+    for booking_id in range(1, total + 1):
+        car_id = rng.randint(1, cars)
+        start = next_start[car_id] + timedelta(days=rng.randint(0, 5))
+        days = rng.randint(1, 14)
+        next_start[car_id] = start + timedelta(days=days)
+        status = rng.choices(["Active", "Completed", "Cancelled"], weights=[3, 6, 1])[0]
+        bookings.append({
+            "id": booking_id,
+            "car_id": car_id,
+            "customer_email": f"customer{rng.randint(1, max(total // 5, 1))}@example.com",
+            "start_date": str(start),
+            "end_date": str(start + timedelta(days=days)),
+            "total_days": float(days),
+            "total_price": float(days * 50),
+            "status": status,
+        })
+    return bookings
+
+
+def write_dataset(data_dir: Path, bookings: int, seed: int = 0) -> dict:
+    """Write the data files of a dataset into `data_dir`, returning the record counts"""
+    data_dir.mkdir(parents=True, exist_ok=True)
+    cars = car_count(bookings)
+    (data_dir / "cars.json").write_bytes(codec.dumps(generate_cars(cars, seed)))
+    (data_dir / "bookings.json").write_bytes(codec.dumps(generate_bookings(bookings, cars, seed)))
+    return {"cars": cars, "bookings": bookings}
+
+
+if __name__ == "__main__":
+    total = SIZES.get(sys.argv[1]) or int(sys.argv[1])
+    counts = write_dataset(Path(sys.argv[2]), total, int(sys.argv[3]) if len(sys.argv) > 3 else 0)
+    print(f"Wrote {counts['cars']} cars and {counts['bookings']} bookings to {sys.argv[2]}")
@@ -0,0 +1,275 @@
+"""Benchmark suite of the data access layer and the API.
+
+For every dataset size it loads synthetic data (see `benchmarks.datagen`)
+into a temporary data directory with the selected storage backend, then:
+
+- times the first load of the tables,
+- microbenchmarks `get_available_cars`, `get_car`, `is_car_available`,
+  `create_booking` and `delete_booking`,
+- runs an in-process load test through an ASGI transport, with concurrent
+  clients mixing reads and booking creations/deletions.
+
+Latencies are reported as mean, p50, p95 and p99 in milliseconds. The results
+are written as JSON with the environment of the run, and can be compared
+with a previous result file.
+
+Run from the repository root:
+
+    python -m benchmarks.suite --sizes 1k,100k --output results.json [--compare previous.json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import random
+import subprocess
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List
+import httpx
+from code.main import app
+from code.models import Booking
+from code.data_access import codec, columnar, utils
+from code.data_access.bookings import create_booking, delete_booking, is_car_available
+from code.data_access.cars import get_available_cars, get_car
+from code.data_access.locks import data_lock
+from code.data_access.storage import get_storage
+from code.data_access.store import bookings_table, cars_table
+from benchmarks.datagen import FIRST_DAY, SIZES, car_count, generate_bookings, generate_cars
+
+# Runs of each microbenchmark. Writes rewrite whole files with the json
+# backend and the full listing of the cars returns every car, so they run less
+ITERATIONS = 1_000
+WRITE_ITERATIONS = 50
+LISTING_ITERATIONS = 20
+
+# Load test, one request in 10 books a car and deletes the booking
+REQUESTS = 1_000
+CONCURRENCY = 20
+
+# Far enough in the future to never conflict with the generated bookings
+BOOKING_START = date.today() + timedelta(days=3650)
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Return the count, mean and percentiles of latencies given in seconds, in milliseconds"""
+    ordered = sorted(samples)
+
+    def percentile(fraction: float) -> float:
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)] * 1e3
+
+    return {
+        "count": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered) * 1e3,
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+    }
+
+
+def measure(function: Callable[[int], object], iterations: int) -> Dict[str, float]:
+    samples = []
+    for number in range(iterations):
+        started = time.perf_counter()
+        function(number)
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def load_dataset(total: int) -> dict:
+    """Store a generated dataset with the current backend and time its first load"""
+    cars = car_count(total)
+    bookings = generate_bookings(total, cars)
+    last_day = max(booking["end_date"] for booking in bookings)
+    with data_lock():
+        get_storage().compact("cars.json", generate_cars(cars))
+        get_storage().compact("bookings.json", bookings)
+    del bookings
+
+    started = time.perf_counter()
+    cars_table.get(1)
+    bookings_table.get(1)
+    return {
+        "cars": cars,
+        "bookings": total,
+        "last_day": last_day,
+        "load_tables_s": time.perf_counter() - started,
+    }
+
+
+def _available_car_ids() -> List[int]:
+    return [car.id for car in get_available_cars()]
+
+
+def microbenchmarks(cars: int, last_day: str) -> Dict[str, dict]:
+    rng = random.Random(0)
+    available_ids = _available_car_ids()
+    span = (date.fromisoformat(last_day) - FIRST_DAY).days + 1
+
+    def check(number: int):
+        start = FIRST_DAY + timedelta(days=rng.randrange(span))
+        is_car_available(rng.randint(1, cars), start, start + timedelta(days=7))
+
+    results = {
+        "get_available_cars": measure(lambda number: get_available_cars(), LISTING_ITERATIONS),
+        "get_available_cars_page": measure(lambda number: get_available_cars(limit=100), ITERATIONS),
+        "get_car": measure(lambda number: get_car(rng.randint(1, cars)), ITERATIONS),
+        "is_car_available": measure(check, ITERATIONS),
+    }
+
+    # Each booking is deleted right after, so the car is available again
+    create_samples, delete_samples = [], []
+    for number in range(WRITE_ITERATIONS):
+        booking = Booking(
+            car_id=available_ids[number % len(available_ids)],
+            customer_email="bench@example.com",
+            start_date=BOOKING_START,
+            end_date=BOOKING_START + timedelta(days=3)
+        )
+        started = time.perf_counter()
+        created = create_booking(booking)
+        create_samples.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        delete_booking(created.id)
+        delete_samples.append(time.perf_counter() - started)
+    results["create_booking"] = summarize(create_samples)
+    results["delete_booking"] = summarize(delete_samples)
+    return results
+
+
+async def _load_test(cars: int) -> Dict[str, dict]:
+    rng = random.Random(1)
+    available_ids = _available_car_ids()
+    samples: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def timed(name: str, request):
+            started = time.perf_counter()
+            response = await request
+            samples.setdefault(name, []).append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors[name] = errors.get(name, 0) + 1
+            return response
+
+        async def session(number: int):
+            async with semaphore:
+                kind = number % 10
+                if kind < 4:
+                    await timed("GET /cars/list_availables", client.get("/cars/list_availables", params={"limit": 100}))
+                elif kind < 7:
+                    start = FIRST_DAY + timedelta(days=rng.randrange(365))
+                    await timed("GET /cars/available", client.get("/cars/available", params={
+                        "start": str(start), "end": str(start + timedelta(days=7))
+                    }))
+                elif kind < 9:
+                    await timed("GET /", client.get("/"))
+                else:
+                    # Consecutive sessions book different cars
+                    car_id = available_ids[number // 10 % len(available_ids)]
+                    response = await timed("POST /bookings/new_booking", client.post("/bookings/new_booking", json={
+                        "car_id": car_id,
+                        "customer_email": "bench@example.com",
+                        "start_date": str(BOOKING_START),
+                        "end_date": str(BOOKING_START + timedelta(days=3)),
+                    }))
+                    if response.status_code == 201:
+                        booking_id = response.json()["id"]
+                        await timed("DELETE /bookings/delete_booking", client.delete(f"/bookings/delete_booking/{booking_id}"))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(session(number) for number in range(REQUESTS)))
+        elapsed = time.perf_counter() - started
+
+    results = {name: {**summarize(values), "errors": errors.get(name, 0)} for name, values in samples.items()}
+    results["total"] = {
+        **summarize([value for values in samples.values() for value in values]),
+        "errors": sum(errors.values()),
+        "throughput_rps": sum(len(values) for values in samples.values()) / elapsed,
+    }
+    return results
+
+
+def run(total: int) -> dict:
+    with tempfile.TemporaryDirectory() as data_dir:
+        utils.DATA_DIR = Path(data_dir)
+        dataset = load_dataset(total)
+        return {
+            "dataset": dataset,
+            "micro": microbenchmarks(dataset["cars"], dataset["last_day"]),
+            "load": asyncio.run(_load_test(dataset["cars"])),
+        }
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "storage_backend": utils.STORAGE_BACKEND,
+        "numpy": columnar._numpy() is not None,
+        "orjson": codec.orjson is not None,
+        "iterations": ITERATIONS,
+        "write_iterations": WRITE_ITERATIONS,
+        "requests": REQUESTS,
+        "concurrency": CONCURRENCY,
+    }
+
+
+def compare(previous: dict, current: dict) -> None:
+    """Print the ratio current / previous of the p50 and p99 latencies"""
+    print(f"\nCompared with the run of {previous['environment']['date']} ({previous['environment']['commit']}):")
+    for size, result in current["results"].items():
+        if size not in previous["results"]:
+            continue
+        for group in ("micro", "load"):
+            for name, stats in result[group].items():
+                before = previous["results"][size][group].get(name)
+                if not before:
+                    continue
+                ratios = [stats[key] / before[key] if before[key] else float("nan") for key in ("p50_ms", "p99_ms")]
+                print(f"{size:>5} {group:>5} {name:<36} p50 x{ratios[0]:5.2f}  p99 x{ratios[1]:5.2f}")
+
+
+def report(size: str, result: dict) -> None:
+    print(f"\n{size}: {result['dataset']['cars']} cars, {result['dataset']['bookings']} bookings, "
+          f"tables loaded in {result['dataset']['load_tables_s']:.2f} s")
+    for group in ("micro", "load"):
+        for name, stats in result[group].items():
+            print(f"{group:>5} {name:<36} mean {stats['mean_ms']:8.3f}  p50 {stats['p50_ms']:8.3f}  "
+                  f"p95 {stats['p95_ms']:8.3f}  p99 {stats['p99_ms']:8.3f} ms")
+    print(f" load throughput {result['load']['total']['throughput_rps']:.0f} requests/s, "
+          f"{result['load']['total']['errors']} errors")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1k,100k", help="Comma separated numbers of bookings, e.g. 1k,100k,1M")
+    parser.add_argument("--output", type=Path, help="JSON file to write the results to")
+    parser.add_argument("--compare", type=Path, help="Previous JSON result file to compare with")
+    arguments = parser.parse_args()
+
+    # The conflicts found by the availability checks are logged as warnings
+    logging.disable(logging.WARNING)
+    results = {"environment": environment(), "results": {}}
+    for size in arguments.sizes.split(","):
+        results["results"][size] = run(SIZES.get(size) or int(size))
+        report(size, results["results"][size])
+
+    if arguments.output:
+        arguments.output.write_text(json.dumps(results, indent=2))
+        print(f"\nResults written to {arguments.output}")
+    if arguments.compare:
+        compare(json.loads(arguments.compare.read_text()), results)
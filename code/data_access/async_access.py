@@ -0,0 +1,40 @@
+"""Async version of the data access API.
+
+The data access functions read and write files, parse JSON and build models,
+which would block the event loop if called directly from an `async def`
+endpoint. These wrappers run them in the default thread pool instead, so
+other in-flight requests keep being served meanwhile.
+"""
+import asyncio
+import functools
+from . import bookings, cars, pricing, reports
+
+
+def _in_thread(function):
+    """Wrap a blocking function into a coroutine function running it in a thread"""
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+        return await asyncio.to_thread(function, *args, **kwargs)
+    return wrapper
+
+
+get_available_cars = _in_thread(cars.get_available_cars)
+get_cars_version = _in_thread(cars.get_cars_version)
+get_cars_available_between = _in_thread(cars.get_cars_available_between)
+search_cars = _in_thread(cars.search_cars)
+get_car = _in_thread(cars.get_car)
+get_car_by_plate = _in_thread(cars.get_car_by_plate)
+create_car = _in_thread(cars.create_car)
+create_cars = _in_thread(cars.create_cars)
+update_car_status = _in_thread(cars.update_car_status)
+
+create_booking = _in_thread(bookings.create_booking)
+create_bookings = _in_thread(bookings.create_bookings)
+delete_booking = _in_thread(bookings.delete_booking)
+get_customer_bookings = _in_thread(bookings.get_customer_bookings)
+is_car_available = _in_thread(bookings.is_car_available)
+
+get_quote = _in_thread(pricing.get_quote)
+
+get_utilization = _in_thread(reports.get_utilization)
+get_cars_utilization = _in_thread(reports.get_cars_utilization)
@@ -1,29 +1,36 @@
-from typing import List, Tuple
-from datetime import date
-from ..models import Booking, BookingStatus, CarStatus
+from heapq import merge
+from typing import Dict, List, Optional, Tuple
+from datetime import date, timedelta
+from contextlib import ExitStack
+from ..models import Booking, BookingStatus, BulkBookingResult, CarStatus
 from .cars import get_car, update_car_status
 import logging
-from .utils import _load_file, _save_file
+from ..logging_config import sampled
+from ..metrics import STAGE_SECONDS
+from .locks import car_lock, data_lock
+from .pricing import quote_car
+from .store import archived_bookings_table, bookings_table, cars_table
 
 logger = logging.getLogger(__name__)
+# Messages emitted on every availability check, sampled
+hot_path_logger = sampled(logger)
 
 def _load_bookings() -> List[Booking]:
-    """Load bookings from JSON file"""
-    bookings_data = _load_file("bookings.json")
-    return [Booking(**booking) for booking in bookings_data]
+    """Load bookings from the in-memory store"""
+    return bookings_table.all()
 
-def _save_bookings(bookings: List[Booking]) -> None:
-    """Save bookings to JSON file"""
-    bookings_data = [booking.dict() for booking in bookings]
-    _save_file("bookings.json", bookings_data)
+def _booking_registered(booking_id: int) -> bool:
+    """Whether a booking with the given ID exists, in the bookings or in the archive"""
+    return bookings_table.get(booking_id) is not None or archived_bookings_table.get(booking_id) is not None
 
-def create_booking(booking: Booking) -> Booking:
-    """Create a new booking with validations"""
-    logger.info(f"Creating booking for car {booking.car_id} and customer {booking.customer_email}.")
-    
-    logger.info(f"Validating data.")
+def _allocate_booking_ids(count: int = 1, floor: int = 0) -> int:
+    """Reserve new booking IDs, above the IDs of the archived bookings too"""
+    return bookings_table.allocate_ids(count, floor=max(floor, archived_bookings_table.max_id()))
+
+def _validate_booking(booking: Booking, car) -> None:
+    """Check that the booking can be made, raising ValueError otherwise"""
+    hot_path_logger.info("Validating data.")
     # Validate if car exists
-    car = get_car(booking.car_id)
     if not car:
         raise ValueError(f"Car with ID {booking.car_id} not found.")
     
@@ -38,88 +45,187 @@ def create_booking(booking: Booking) -> Booking:
     if booking.start_date < date.today():
         raise ValueError("Start date cannot be in the past.")
 
-    # Set default status if not provided
-    if booking.status is None:
-        booking.status = BookingStatus.active
-        logger.info("Setting default status to Active")
+@STAGE_SECONDS.time(stage="create_booking")
+def create_booking(booking: Booking) -> Booking:
+    """Create a new booking with validations.
 
-    # Calculate the total days and price
-    booking.total_days, booking.total_price = compute_days_price(booking, car)
-    
-    # Generate the new booking ID
-    bookings = _load_bookings()
-    if booking.id is None:
-        booking.id = max([b.id for b in bookings], default=0) + 1
-        logger.info(f"Generated booking ID: {booking.id}")
-    else:
-        # Check if ID already exists
-        existing_ids = [b.id for b in bookings]
-        if booking.id in existing_ids:
-            raise ValueError(f"Booking ID {booking.id} already registered.")
-    
-    # Add to db
-    bookings.append(booking)
-    _save_bookings(bookings)
-    
-    # Update car status to Rented
-    update_car_status(booking.car_id, CarStatus.rented)
-    
-    logger.info(f"Booking created successfully with ID: {booking.id}.")
+    Runs under the lock of the booked car, so two requests can never book the
+    same car for overlapping dates, while bookings of other cars proceed in
+    parallel. Only the final write takes the global data lock.
+    """
+    logger.info("Creating booking for car %s and customer %s.", booking.car_id, booking.customer_email)
+    
+    with car_lock(booking.car_id):
+        car = get_car(booking.car_id)
+        _validate_booking(booking, car)
+
+        # Set default status if not provided
+        if booking.status is None:
+            booking.status = BookingStatus.active
+            logger.info("Setting default status to Active")
+
+        # Calculate the total days and price
+        booking.total_days, booking.total_price = compute_days_price(booking, car)
+        
+        with data_lock():
+            # Generate the new booking ID
+            if booking.id is None:
+                booking.id = _allocate_booking_ids()
+                logger.info("Generated booking ID: %s", booking.id)
+            else:
+                # Check if ID already exists
+                if _booking_registered(booking.id):
+                    raise ValueError(f"Booking ID {booking.id} already registered.")
+            
+            # Add to db
+            bookings_table.insert(booking)
+            
+            # Update car status to Rented
+            update_car_status(booking.car_id, CarStatus.rented)
+    
+    logger.info("Booking created successfully with ID: %s.", booking.id)
     return booking
 
+def create_bookings(bookings: List[Booking]) -> List[BulkBookingResult]:
+    """Create several bookings, validated against one snapshot and saved in a single write.
+
+    Bookings are checked in order with the same rules as create_booking, so a
+    booking is rejected if an earlier booking of the batch already took its car.
+    """
+    logger.info("Creating %s new bookings.", len(bookings))
+    
+    results = []
+    car_ids = sorted({booking.car_id for booking in bookings})
+    with ExitStack() as stack:
+        # Lock the cars in a fixed order, so two batches never deadlock
+        for car_id in car_ids:
+            stack.enter_context(car_lock(car_id))
+        stack.enter_context(data_lock())
+        
+        accepted = []
+        batch_ids = set()
+        booked_in_batch: Dict[int, int] = {}
+        for index, booking in enumerate(bookings):
+            car = get_car(booking.car_id)
+            try:
+                if booking.car_id in booked_in_batch:
+                    raise ValueError(
+                        f"Car with ID {booking.car_id} is not available for booking. "
+                        f"Booked by item {booked_in_batch[booking.car_id]} of the batch."
+                    )
+                _validate_booking(booking, car)
+                if booking.id is not None and (booking.id in batch_ids or _booking_registered(booking.id)):
+                    raise ValueError(f"Booking ID {booking.id} already registered.")
+            except ValueError as e:
+                results.append(BulkBookingResult(index=index, success=False, error=str(e)))
+                continue
+            
+            # Set default status if not provided
+            if booking.status is None:
+                booking.status = BookingStatus.active
+            booking.total_days, booking.total_price = compute_days_price(booking, car)
+            
+            batch_ids.add(booking.id)
+            booked_in_batch[booking.car_id] = index
+            accepted.append(booking)
+            results.append(BulkBookingResult(index=index, success=True, booking=booking))
+        
+        # Generate the missing IDs in one sweep, after every requested ID
+        generated = [booking for booking in accepted if booking.id is None]
+        if generated:
+            next_id = _allocate_booking_ids(len(generated), floor=max(batch_ids - {None}, default=0))
+            for booking in generated:
+                booking.id = next_id
+                next_id += 1
+        
+        # Add to db and update the booked cars status to Rented, unless every booking was rejected
+        if accepted:
+            bookings_table.insert_many(accepted)
+            cars_table.update_many([booking.car_id for booking in accepted], status=CarStatus.rented)
+    
+    logger.info("%s of %s bookings created successfully.", len(accepted), len(bookings))
+    return results
+
+@STAGE_SECONDS.time(stage="delete_booking")
 def delete_booking(booking_id: int) -> bool:
     """Delete a booking and update car status to available"""
-    logger.info(f"Deleting booking with ID: {booking_id}")
-    
-    bookings = _load_bookings()
-    booking_to_delete = None
+    logger.info("Deleting booking with ID: %s", booking_id)
     
-    # Find the booking to delete
-    for booking in bookings:
-        if booking.id == booking_id:
-            booking_to_delete = booking
-            break
+    booking_to_delete = bookings_table.get(booking_id)
     
     if not booking_to_delete:
-        logger.warning(f"Booking with ID {booking_id} not found.")
+        # Archived bookings are finished, deleting them leaves the cars as they are
+        if archived_bookings_table.delete(booking_id) is not None:
+            logger.info("Archived booking %s deleted successfully.", booking_id)
+            return True
+        logger.warning("Booking with ID %s not found.", booking_id)
         return False
     
-    # Check if booking is active
-    if booking_to_delete.status == BookingStatus.active:
-        # Update car status to available
-        car_id = booking_to_delete.car_id
-        update_car_status(car_id, CarStatus.available)
-        logger.info(f"Updated car {car_id} status to Available.")
-    
-    # Remove booking from list
-    bookings = [b for b in bookings if b.id != booking_id]
-    _save_bookings(bookings)
-    
-    logger.info(f"Booking {booking_id} deleted successfully.")
+    car_id = booking_to_delete.car_id
+    with car_lock(car_id), data_lock():
+        # Look it up again, another worker may have deleted it meanwhile
+        booking_to_delete = bookings_table.get(booking_id)
+        if not booking_to_delete:
+            logger.warning("Booking with ID %s not found.", booking_id)
+            return False
+        
+        # Check if booking is active
+        if booking_to_delete.status == BookingStatus.active:
+            # Update car status to available
+            update_car_status(car_id, CarStatus.available)
+            logger.info("Updated car %s status to Available.", car_id)
+        
+        # Remove booking from db
+        bookings_table.delete(booking_id)
+    
+    logger.info("Booking %s deleted successfully.", booking_id)
     return True
 
+def get_customer_bookings(customer_email: str, status: Optional[BookingStatus] = None,
+                          after_id: Optional[int] = None, limit: Optional[int] = None) -> List[Booking]:
+    """Get the bookings of a customer in ID order, archived ones included, optionally one page at a time.
+
+    Pages are slices of the ID lists of the customer index of each table, so
+    their cost does not depend on the number of stored bookings.
+    """
+    hot_path_logger.info("Searching bookings of customer %s.", customer_email)
+
+    def page(table):
+        def lookup(records) -> List[Booking]:
+            ids = table.indexes["customers"].ids(customer_email, status, after_id, limit)
+            return [records.get(booking_id) for booking_id in ids]
+        return table.query(lookup)
+
+    # A booking being archived may be in both tables for a moment
+    bookings, seen = [], set()
+    for booking in merge(page(bookings_table), page(archived_bookings_table), key=lambda booking: booking.id):
+        if booking.id not in seen:
+            seen.add(booking.id)
+            bookings.append(booking)
+    return bookings[:limit]
+
 def compute_days_price(booking: Booking, car) -> Tuple[int, float]:
-    """Calculate the total number of days and price for the booking"""
+    """Calculate the total number of days and price for the booking, following the pricing rules"""
     total_days = (booking.end_date - booking.start_date).days
 
     # Minimum number of booking days is 1
     total_days = total_days if total_days > 0 else 1
-    total_price = car.price * total_days
+    total_price = quote_car(car, booking.start_date, booking.start_date + timedelta(days=total_days)).total_price
 
-    logger.info(f"Booking calculated: {total_days} days, {total_price}€.")
+    hot_path_logger.info("Booking calculated: %s days, %s€.", total_days, total_price)
     return total_days, total_price
 
+@STAGE_SECONDS.time(stage="is_car_available")
 def is_car_available(car_id: int, start_date: date, end_date: date) -> bool:
     """Check if a car is available for specific dates"""
-    logger.info(f"Checking availability for car with ID: {car_id} from {start_date} to {end_date}.")
+    hot_path_logger.info("Checking availability for car with ID: %s from %s to %s.", car_id, start_date, end_date)
     
-    bookings = _load_bookings()
-    for booking in bookings:
-        if (booking.car_id == car_id and 
-            booking.status == BookingStatus.active and
-            not (end_date <= booking.start_date or start_date >= booking.end_date)):
-            logger.warning(f"Car {car_id} not available. Conflicts with booking {booking.id}.")
-            return False
+    conflict_id = bookings_table.query_index(
+        "intervals", lambda intervals: intervals.find_conflict(car_id, start_date, end_date)
+    )
+    if conflict_id is not None:
+        logger.warning("Car %s not available. Conflicts with booking %s.", car_id, conflict_id)
+        return False
     
-    logger.info(f"Car {car_id} is available for the requested dates.")
+    hot_path_logger.info("Car %s is available for the requested dates.", car_id)
     return True
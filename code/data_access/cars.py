@@ -1,73 +1,237 @@
-from typing import List
-from ..models import Car, CarStatus
+import hashlib
+from bisect import bisect_right
+from typing import Dict, Iterator, List, Optional, Set
+from datetime import date
+from ..models import BulkCarResult, Car, CarStatus, Fuel, Transmission
 import logging
-from .utils import _load_file, _save_file
+from ..logging_config import sampled
+from .locks import data_lock
+from .store import bookings_table, cars_table, normalize_plate
 
 logger = logging.getLogger(__name__)
+# Messages emitted on every car lookup, sampled
+hot_path_logger = sampled(logger)
 
 def _load_cars() -> List[Car]:
-    """Load cars from JSON file"""
-    cars_data = _load_file("cars.json")
-    return [Car(**car) for car in cars_data]
+    """Load cars from the in-memory store"""
+    return cars_table.all()
 
-def _save_cars(cars: List[Car]) -> None:
-    """Save cars to JSON file"""
-    cars_data = [car.dict() for car in cars]
-    _save_file("cars.json", cars_data)
+# Cars of a stream fetched under each lock of the table
+STREAM_CHUNK_SIZE = 1000
 
-def get_available_cars() -> List[Car]:
-    """Get all the cars that are available"""
+def _available_page(after_id: Optional[int], limit: Optional[int]) -> List[Car]:
+    """Return a page of the available cars, looked up under a single lock of the table"""
+    def page(records) -> List[Car]:
+        ids = cars_table.indexes["status"].ids(CarStatus.available, after_id, limit)
+        return [records.get(car_id) for car_id in ids]
+
+    return cars_table.query(page)
+
+def iter_available_cars(after_id: Optional[int] = None, limit: Optional[int] = None) -> Iterator[Car]:
+    """Iterate over the available cars in ID order, starting after `after_id`.
+
+    Cars are fetched `STREAM_CHUNK_SIZE` at a time as the iterator is consumed,
+    so callers can stream them without building the whole list first.
+    """
+    while limit is None or limit > 0:
+        size = STREAM_CHUNK_SIZE if limit is None else min(STREAM_CHUNK_SIZE, limit)
+        cars = _available_page(after_id, size)
+        yield from cars
+        if len(cars) < size:
+            return
+        after_id = cars[-1].id
+        if limit is not None:
+            limit -= len(cars)
+
+def get_available_cars(after_id: Optional[int] = None, limit: Optional[int] = None) -> List[Car]:
+    """Get the cars that are available, optionally one page at a time"""
     logger.info("Searching available cars.")
-    cars = _load_cars()
-    available_cars = [car for car in cars if car.status == CarStatus.available]
-    logger.info(f"{len(available_cars)} available cars found.")
+    available_cars = _available_page(after_id, limit)
+    logger.info("%s available cars found.", len(available_cars))
+    return available_cars
+
+def get_cars_version() -> str:
+    """Get a tag of the current version of the cars, changed by every change.
+
+    The tag is derived from the signature of the stored table, so every worker
+    holding the same cars gives the same tag and it can be used as an ETag.
+    """
+    return hashlib.blake2b(repr(cars_table.signature()).encode(), digest_size=8).hexdigest()
+
+def _matching_ids(indexes: Dict[str, object], brand: Optional[str] = None, fuel_type: Optional[Fuel] = None,
+                  transmission: Optional[Transmission] = None, status: Optional[CarStatus] = None,
+                  min_year: Optional[int] = None, max_year: Optional[int] = None,
+                  min_price: Optional[float] = None, max_price: Optional[float] = None) -> Optional[Set[int]]:
+    """Return the IDs of the cars matching every given filter, or None when no filter is given.
+
+    Each filter is answered by an index of the cars table, and the candidate
+    IDs are intersected starting from the smallest set.
+    """
+    candidates = [
+        indexes[name].ids(value)
+        for name, value in (("brand", brand), ("fuel_type", fuel_type), ("transmission", transmission),
+                            ("status", status))
+        if value is not None
+    ]
+    if min_year is not None or max_year is not None:
+        candidates.append(indexes["year"].ids_between(min_year, max_year))
+    if min_price is not None or max_price is not None:
+        candidates.append(indexes["price"].ids_between(min_price, max_price))
+    if not candidates:
+        return None
+
+    candidates.sort(key=len)
+    ids = set(candidates[0])
+    for other in candidates[1:]:
+        if not ids:
+            break
+        ids.intersection_update(other)
+    return ids
+
+def search_cars(brand: Optional[str] = None, fuel_type: Optional[Fuel] = None,
+                transmission: Optional[Transmission] = None, status: Optional[CarStatus] = None,
+                min_year: Optional[int] = None, max_year: Optional[int] = None,
+                min_price: Optional[float] = None, max_price: Optional[float] = None,
+                after_id: Optional[int] = None, limit: Optional[int] = None) -> List[Car]:
+    """Search the fleet by attributes, in ID order, optionally one page at a time.
+
+    The brand is matched case-insensitively, years and prices are inclusive
+    ranges. Filters are answered by the indexes of the cars, no car is scanned.
+    """
+    logger.info("Searching cars by attributes.")
+    if min_year is not None and max_year is not None and min_year > max_year:
+        raise ValueError("Minimum year must not be greater than maximum year.")
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise ValueError("Minimum price must not be greater than maximum price.")
+
+    def query(records) -> List[Car]:
+        ids = _matching_ids(cars_table.indexes, brand, fuel_type, transmission, status,
+                            min_year, max_year, min_price, max_price)
+        ids = sorted(ids) if ids is not None else sorted(car.id for car in records.rows())
+        if after_id is not None:
+            ids = ids[bisect_right(ids, after_id):]
+        return [records.get(car_id) for car_id in ids[:limit]]
+
+    cars = cars_table.query(query)
+    logger.info("%s cars found.", len(cars))
+    return cars
+
+def get_cars_available_between(start_date: date, end_date: date, fuel_type: Optional[Fuel] = None,
+                               transmission: Optional[Transmission] = None, max_price: Optional[float] = None) -> List[Car]:
+    """Get the cars that can be booked for the given dates, optionally filtered"""
+    logger.info("Searching cars available from %s to %s.", start_date, end_date)
+    if start_date >= end_date:
+        raise ValueError("Start date must be before end date.")
+
+    # Same rules as create_booking: available status and no overlapping active booking
+    candidates = search_cars(fuel_type=fuel_type, transmission=transmission, status=CarStatus.available,
+                             max_price=max_price)
+
+    def free(intervals) -> List[Car]:
+        return [car for car in candidates if intervals.find_conflict(car.id, start_date, end_date) is None]
+
+    available_cars = bookings_table.query_index("intervals", free)
+    logger.info("%s cars available for the requested dates.", len(available_cars))
     return available_cars
 
 def get_car(car_id: int) -> Car:
     """Get a specific car by ID"""
-    logger.info(f"Searching car with ID: {car_id}.")
-    cars = _load_cars()
-    for car in cars:
-        if car.id == car_id:
-            logger.info(f"Car with ID {car_id} found.")
-            return car
+    hot_path_logger.info("Searching car with ID: %s.", car_id)
+    car = cars_table.get(car_id)
+    if car:
+        hot_path_logger.info("Car with ID %s found.", car_id)
+        return car
     
-    logger.warning(f"Car with ID {car_id} not found.")
+    logger.warning("Car with ID %s not found.", car_id)
     return None
 
+def get_car_by_plate(plate: str) -> Optional[Car]:
+    """Get a car by license plate, ignoring case, spaces and dashes"""
+    hot_path_logger.info("Searching car with license plate: %s.", plate)
+
+    def lookup(records) -> Optional[Car]:
+        car_id = cars_table.indexes["license_plate"].get(plate)
+        return records.get(car_id) if car_id is not None else None
+
+    car = cars_table.query(lookup)
+    if car is None:
+        logger.warning("Car with license plate %s not found.", plate)
+    return car
+
+def _plate_registered(plate: str) -> bool:
+    return cars_table.query_index("license_plate", lambda index: index.get(plate)) is not None
+
 def create_car(car: Car) -> Car:
     """Create a new car"""
-    logger.info(f"Creating new car.")
+    logger.info("Creating new car.")
     
-    cars = _load_cars() 
-    # Generate ID if not provided
-    if car.id is None:
-        car.id = max([c.id for c in cars], default=0) + 1
-        logger.info(f"Generated ID: {car.id}")
-    else:
+    with data_lock():
         # Check if ID already exists
-        existing_ids = [c.id for c in cars]
-        if car.id in existing_ids:
+        if car.id is not None and cars_table.get(car.id) is not None:
             raise ValueError(f"ID {car.id} already registered.")
+
+        # Check if the license plate is already registered
+        if _plate_registered(car.license_plate):
+            raise ValueError(f"License plate {car.license_plate} already registered.")
+
+        # Generate ID if not provided
+        if car.id is None:
+            car.id = cars_table.allocate_ids()
+            logger.info("Generated ID: %s", car.id)
+        
+        # Add to db
+        cars_table.insert(car)
     
-    # Add to db
-    cars.append(car)
-    _save_cars(cars)
-    
-    logger.info(f"Car created successfully with ID: {car.id}")
+    logger.info("Car created successfully with ID: %s", car.id)
     return car
 
+def create_cars(cars: List[Car]) -> List[BulkCarResult]:
+    """Create several cars, validated against one snapshot and saved in a single write"""
+    logger.info("Creating %s new cars.", len(cars))
+    
+    results = []
+    with data_lock():
+        accepted = []
+        batch_ids = set()
+        batch_plates = set()
+        for index, car in enumerate(cars):
+            if car.id is not None and (car.id in batch_ids or cars_table.get(car.id) is not None):
+                results.append(BulkCarResult(index=index, success=False, error=f"ID {car.id} already registered."))
+                continue
+            plate = normalize_plate(car.license_plate)
+            if plate in batch_plates or _plate_registered(plate):
+                results.append(BulkCarResult(
+                    index=index, success=False, error=f"License plate {car.license_plate} already registered."
+                ))
+                continue
+            
+            batch_ids.add(car.id)
+            batch_plates.add(plate)
+            accepted.append(car)
+            results.append(BulkCarResult(index=index, success=True, car=car))
+        
+        # Generate the missing IDs in one sweep, after every requested ID
+        generated = [car for car in accepted if car.id is None]
+        if generated:
+            next_id = cars_table.allocate_ids(len(generated), floor=max(batch_ids - {None}, default=0))
+            for car in generated:
+                car.id = next_id
+                next_id += 1
+        
+        # Add to db, unless every car was rejected
+        if accepted:
+            cars_table.insert_many(accepted)
+    
+    logger.info("%s of %s cars created successfully.", len(accepted), len(cars))
+    return results
+
 def update_car_status(car_id: int, status: CarStatus) -> bool:
     """Update car status"""
-    logger.info(f"Updating car {car_id} status to: {status}.")
+    logger.info("Updating car %s status to: %s.", car_id, status)
     
-    cars = _load_cars()
-    for car in cars:
-        if car.id == car_id:
-            car.status = status
-            _save_cars(cars)
-            logger.info(f"Car status updated successfully.")
-            return True
+    if cars_table.update(car_id, status=status):
+        logger.info("Car status updated successfully.")
+        return True
     
-    logger.warning(f"Car with ID: {car_id} not found.")
+    logger.warning("Car with ID: %s not found.", car_id)
     return False
@@ -0,0 +1,49 @@
+import gc
+import json
+from contextlib import contextmanager
+from enum import Enum
+
+try:
+    import orjson
+except ImportError:  # Optional, speeds up encoding and decoding
+    orjson = None
+
+
+# Raised by `loads` on malformed input, with or without orjson
+DecodeError = json.JSONDecodeError
+
+
+def _default(value):
+    if isinstance(value, Enum):
+        return value.value
+    return str(value)
+
+
+def dumps(data) -> bytes:
+    """Encode data as compact JSON, dates as ISO strings and enums as their values"""
+    if orjson is not None:
+        return orjson.dumps(data, default=_default)
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False, default=_default).encode("utf-8")
+
+
+def loads(raw: bytes):
+    """Decode JSON from bytes or text"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+@contextmanager
+def paused_gc():
+    """Pause the cyclic garbage collector while decoding a whole table.
+
+    Bulk loads allocate many objects without creating cycles, and would
+    otherwise trigger repeated collections that scan all of them.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
@@ -0,0 +1,198 @@
+import functools
+import sys
+from array import array
+from collections import namedtuple
+from datetime import date
+from typing import Dict, Iterator, List, Optional
+from ..models import Booking, BookingStatus
+
+
+@functools.lru_cache(maxsize=None)
+def _numpy():
+    """Return NumPy, imported on first use as it takes longer than the service modules, or None"""
+    try:
+        import numpy
+    except ImportError:  # Optional, speeds up the vectorized queries
+        return None
+    return numpy
+
+
+STATUSES = [None, BookingStatus.active, BookingStatus.completed, BookingStatus.cancelled]
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+ACTIVE = STATUS_CODES[BookingStatus.active]
+
+# Lightweight view of one booking, with the attribute names of the model
+BookingRow = namedtuple(
+    "BookingRow",
+    ["id", "car_id", "customer_email", "start_date", "end_date", "total_days", "total_price", "status"]
+)
+
+
+def _to_date(value) -> date:
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _to_float(value) -> float:
+    return float("nan") if value is None else value
+
+
+def _from_float(value: float) -> Optional[float]:
+    return None if value != value else value
+
+
+class BookingColumns:
+    """Bookings stored column by column in typed arrays.
+
+    Car IDs, status codes and start/end dates as day ordinals sit in compact
+    `array` columns instead of one pydantic model per booking, and customer
+    emails are interned. Stored data is trusted and loaded without validation,
+    `Booking` models are only built when a booking is handed out. Rows are
+    reached through an ID -> row hash map, and deleting moves the last row into
+    the freed one.
+
+    The partition dumps and the lookup of finished bookings scan whole
+    columns, vectorized with NumPy when it is installed. Overlap checks and
+    aggregates are answered by the booking indexes instead. NumPy views pin the
+    arrays, so scans must run under the lock of the owning table.
+    """
+
+    def __init__(self):
+        self._clear()
+
+    def _clear(self) -> None:
+        self.ids = array("q")
+        self.car_ids = array("q")
+        self.statuses = array("b")
+        self.starts = array("i")
+        self.ends = array("i")
+        self.total_days = array("d")
+        self.total_prices = array("d")
+        self.emails: List[str] = []
+        self._rows: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _values(self, record: dict) -> tuple:
+        status = record.get("status")
+        return (
+            record["id"],
+            record["car_id"],
+            STATUS_CODES[BookingStatus(status) if status is not None else None],
+            _to_date(record["start_date"]).toordinal(),
+            _to_date(record["end_date"]).toordinal(),
+            _to_float(record.get("total_days")),
+            _to_float(record.get("total_price")),
+            sys.intern(record["customer_email"]),
+        )
+
+    def _append(self, values: tuple) -> None:
+        booking_id, car_id, status, start, end, total_days, total_price, email = values
+        self._rows[booking_id] = len(self.ids)
+        self.ids.append(booking_id)
+        self.car_ids.append(car_id)
+        self.statuses.append(status)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.total_days.append(total_days)
+        self.total_prices.append(total_price)
+        self.emails.append(email)
+
+    def _set(self, row: int, values: tuple) -> None:
+        (self.ids[row], self.car_ids[row], self.statuses[row], self.starts[row], self.ends[row],
+         self.total_days[row], self.total_prices[row], self.emails[row]) = values
+
+    def load(self, data: list) -> None:
+        """Replace the content with stored records"""
+        self._clear()
+        for record in data:
+            if record["id"] in self._rows:
+                self._set(self._rows[record["id"]], self._values(record))
+            else:
+                self._append(self._values(record))
+
+    def row(self, row: int) -> BookingRow:
+        """Return the view of one row"""
+        return BookingRow(
+            self.ids[row],
+            self.car_ids[row],
+            self.emails[row],
+            date.fromordinal(self.starts[row]),
+            date.fromordinal(self.ends[row]),
+            _from_float(self.total_days[row]),
+            _from_float(self.total_prices[row]),
+            STATUSES[self.statuses[row]],
+        )
+
+    def rows(self) -> Iterator[BookingRow]:
+        """Iterate over the views of all rows"""
+        return (self.row(row) for row in range(len(self.ids)))
+
+    def models(self) -> List[Booking]:
+        """Build the models of all the bookings"""
+        return [Booking.model_construct(**row._asdict()) for row in self.rows()]
+
+    def get(self, booking_id: int) -> Optional[Booking]:
+        """Build the model of one booking, or return None"""
+        row = self._rows.get(booking_id)
+        if row is None:
+            return None
+        return Booking.model_construct(**self.row(row)._asdict())
+
+    def put(self, booking: Booking) -> None:
+        """Insert or overwrite a booking"""
+        values = self._values(booking.model_dump())
+        row = self._rows.get(booking.id)
+        if row is None:
+            self._append(values)
+        else:
+            self._set(row, values)
+
+    def remove(self, booking_id: int) -> None:
+        """Delete a booking by moving the last row into its place"""
+        row = self._rows.pop(booking_id)
+        last = len(self.ids) - 1
+        if row != last:
+            values = tuple(column[last] for column in self._columns())
+            self._set(row, values)
+            self._rows[values[0]] = row
+        for column in self._columns():
+            column.pop()
+
+    def _columns(self) -> list:
+        return [self.ids, self.car_ids, self.statuses, self.starts, self.ends,
+                self.total_days, self.total_prices, self.emails]
+
+    def max_id(self) -> int:
+        return max(self.ids, default=0)
+
+    def dump(self) -> list:
+        """Return all the bookings as plain records"""
+        return [row._asdict() for row in self.rows()]
+
+    def dump_between(self, field: str, start: date, end: date) -> list:
+        """Return as plain records the bookings whose `field`, start_date or end_date, is within [start, end)"""
+        numpy = _numpy()
+        column = {"start_date": self.starts, "end_date": self.ends}[field]
+        first, last = start.toordinal(), end.toordinal()
+        if numpy is not None:
+            values = numpy.frombuffer(column, dtype=numpy.int32)
+            rows = numpy.flatnonzero((values >= first) & (values < last)).tolist()
+        else:
+            rows = [row for row in range(len(self.ids)) if first <= column[row] < last]
+        return [self.row(row)._asdict() for row in rows]
+
+    def finished_ids(self, cutoff: date) -> List[int]:
+        """Return the IDs of the bookings no longer active that ended on `cutoff` or before"""
+        numpy = _numpy()
+        last_end = cutoff.toordinal()
+        if numpy is not None:
+            mask = (
+                (numpy.frombuffer(self.statuses, dtype=numpy.int8) != ACTIVE)
+                & (numpy.frombuffer(self.ends, dtype=numpy.int32) <= last_end)
+            )
+            return numpy.frombuffer(self.ids, dtype=numpy.int64)[mask].tolist()
+        return [
+            self.ids[row] for row in range(len(self.ids))
+            if self.statuses[row] != ACTIVE and self.ends[row] <= last_end
+        ]
@@ -0,0 +1,72 @@
+import functools
+import logging
+import mmap
+import os
+import struct
+import threading
+import zlib
+from typing import Dict
+from . import utils
+
+logger = logging.getLogger(__name__)
+
+GENERATIONS_FILE = ".generations"
+
+# Counters of the file, tables sharing a slot only cause spurious checks
+SLOTS = 256
+COUNTER = struct.Struct("<Q")
+
+
+@functools.lru_cache(maxsize=None)
+def _offset(table: str) -> int:
+    """Return the position of the counter of a table in the file"""
+    return zlib.crc32(table.encode()) % SLOTS * COUNTER.size
+
+
+class Generations:
+    """Generation counters of the tables, shared by the worker processes.
+
+    Each table has a 64-bit counter in the memory-mapped file
+    `<data dir>/.generations`, bumped after every write to the table. Workers
+    compare it with the counter of their last load, a read of shared memory
+    instead of a stat of the data files or a query of the database, and only
+    then check the stored tables. Bumps must run under the data lock.
+    """
+
+    def __init__(self):
+        # By data directory, read without the lock once mapped
+        self._maps: Dict[object, mmap.mmap] = {}
+        self._maps_lock = threading.Lock()
+
+    def _map(self) -> mmap.mmap:
+        counters = self._maps.get(utils.DATA_DIR)
+        if counters is not None:
+            return counters
+
+        with self._maps_lock:
+            if utils.DATA_DIR not in self._maps:
+                utils.DATA_DIR.mkdir(exist_ok=True)
+                fd = os.open(utils.DATA_DIR / GENERATIONS_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    # Extending to the same size from several workers is harmless
+                    if os.fstat(fd).st_size < SLOTS * COUNTER.size:
+                        os.ftruncate(fd, SLOTS * COUNTER.size)
+                    self._maps[utils.DATA_DIR] = mmap.mmap(fd, SLOTS * COUNTER.size)
+                finally:
+                    os.close(fd)
+                logger.info("Mapped the generation counters of %s.", utils.DATA_DIR)
+            return self._maps[utils.DATA_DIR]
+
+    def get(self, table: str) -> int:
+        """Return the generation of a table"""
+        return COUNTER.unpack_from(self._map(), _offset(table))[0]
+
+    def bump(self, table: str) -> int:
+        """Increment the generation of a table, returning the new one"""
+        counters, offset = self._map(), _offset(table)
+        generation = COUNTER.unpack_from(counters, offset)[0] + 1
+        COUNTER.pack_into(counters, offset, generation)
+        return generation
+
+
+generations = Generations()
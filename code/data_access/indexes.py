@@ -0,0 +1,466 @@
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from heapq import heapify, heappop, heappush
+from datetime import date
+from itertools import accumulate
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from ..models import Booking, BookingStatus
+
+
+class IntervalIndex:
+    """Per-car index of the date ranges of active bookings.
+
+    Each car keeps its bookings as a list of (start_date, end_date, id) tuples
+    sorted by start date. Active bookings of a car never overlap, so the only
+    candidate for a conflict with [start, end) is the last booking starting
+    before `end`, which makes the check a single bisect. Cars whose stored
+    bookings do overlap (e.g. data edited by hand) fall back to scanning their
+    own bookings.
+    """
+
+    def __init__(self):
+        self._intervals: Dict[int, List[Tuple[date, date, int]]] = {}
+        self._overlapping: Set[int] = set()
+
+    def rebuild(self, bookings: Iterable[Booking]) -> None:
+        """Rebuild the index from scratch"""
+        self._intervals = {}
+        self._overlapping = set()
+        for booking in bookings:
+            self.add(booking)
+
+    def add(self, booking: Booking) -> None:
+        """Index a booking, if it is active"""
+        if booking.status != BookingStatus.active:
+            return
+
+        intervals = self._intervals.setdefault(booking.car_id, [])
+        if self.find_conflict(booking.car_id, booking.start_date, booking.end_date) is not None:
+            self._overlapping.add(booking.car_id)
+        insort(intervals, (booking.start_date, booking.end_date, booking.id))
+
+    def remove(self, booking: Booking) -> None:
+        """Remove a booking from the index, if present"""
+        intervals = self._intervals.get(booking.car_id)
+        if not intervals:
+            return
+
+        entry = (booking.start_date, booking.end_date, booking.id)
+        position = bisect_left(intervals, entry)
+        if position < len(intervals) and intervals[position] == entry:
+            del intervals[position]
+
+    def find_conflict(self, car_id: int, start_date: date, end_date: date) -> Optional[int]:
+        """Return the ID of an active booking of the car overlapping [start_date, end_date)"""
+        intervals = self._intervals.get(car_id)
+        if not intervals:
+            return None
+
+        # Bookings before this position start before the requested end date
+        position = bisect_left(intervals, (end_date,))
+        if car_id in self._overlapping:
+            for booking_start, booking_end, booking_id in intervals[:position]:
+                if booking_end > start_date:
+                    return booking_id
+            return None
+
+        if position > 0:
+            booking_start, booking_end, booking_id = intervals[position - 1]
+            if booking_end > start_date:
+                return booking_id
+        return None
+
+    def has_bookings(self, car_id: int) -> bool:
+        """Whether the car has any active booking"""
+        return bool(self._intervals.get(car_id))
+
+
+class ExpiryIndex:
+    """Min-heap of the active bookings keyed by end date.
+
+    Removed bookings are left in the heap and skipped when popped, so callers
+    must check that a popped booking is still active and still ends on the
+    popped date.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[date, int]] = []
+
+    def rebuild(self, bookings: Iterable[Booking]) -> None:
+        """Rebuild the index from scratch"""
+        self._heap = [
+            (booking.end_date, booking.id) for booking in bookings if booking.status == BookingStatus.active
+        ]
+        heapify(self._heap)
+
+    def add(self, booking: Booking) -> None:
+        """Index a booking, if it is active"""
+        if booking.status == BookingStatus.active:
+            heappush(self._heap, (booking.end_date, booking.id))
+
+    def remove(self, booking: Booking) -> None:
+        """Removed bookings are skipped when popped"""
+
+    def next_end_date(self) -> Optional[date]:
+        """Return the earliest end date of the indexed bookings"""
+        return self._heap[0][0] if self._heap else None
+
+    def pop_ended(self, today: date) -> List[Tuple[date, int]]:
+        """Pop the (end_date, id) entries of the bookings ending on `today` or before"""
+        ended = []
+        while self._heap and self._heap[0][0] <= today:
+            ended.append(heappop(self._heap))
+        return ended
+
+
+class CustomerIndex:
+    """Hash index from the customer email to the sorted IDs of their bookings.
+
+    Emails are compared case-insensitively. IDs are also kept by email and
+    status, so a page of the bookings of one status is a slice of one list.
+    """
+
+    def __init__(self):
+        self._ids: Dict[object, List[int]] = {}
+
+    @staticmethod
+    def _keys(booking: Booking) -> Tuple[str, Tuple[str, Optional[BookingStatus]]]:
+        email = booking.customer_email.casefold()
+        return email, (email, booking.status)
+
+    def rebuild(self, bookings: Iterable[Booking]) -> None:
+        """Rebuild the index from scratch"""
+        ids: Dict[object, List[int]] = defaultdict(list)
+        # Customers have many bookings, fold each email once
+        folded: Dict[str, str] = {}
+        for booking in bookings:
+            email = folded.get(booking.customer_email)
+            if email is None:
+                email = folded[booking.customer_email] = booking.customer_email.casefold()
+            ids[email].append(booking.id)
+            ids[email, booking.status].append(booking.id)
+        for booking_ids in ids.values():
+            booking_ids.sort()
+        self._ids = dict(ids)
+
+    def add(self, booking: Booking) -> None:
+        """Index a booking"""
+        for key in self._keys(booking):
+            insort(self._ids.setdefault(key, []), booking.id)
+
+    def remove(self, booking: Booking) -> None:
+        """Remove a booking from the index, if present"""
+        for key in self._keys(booking):
+            ids = self._ids.get(key)
+            if not ids:
+                continue
+            position = bisect_left(ids, booking.id)
+            if position < len(ids) and ids[position] == booking.id:
+                del ids[position]
+
+    def ids(self, email: str, status: Optional[BookingStatus] = None, after_id: Optional[int] = None,
+            limit: Optional[int] = None) -> List[int]:
+        """Return the sorted IDs of the bookings of a customer, optionally of one status, one page at a time"""
+        key = email.casefold() if status is None else (email.casefold(), status)
+        ids = self._ids.get(key, [])
+        first = 0 if after_id is None else bisect_right(ids, after_id)
+        return ids[first:] if limit is None else ids[first:first + limit]
+
+
+class FieldIndex:
+    """Hash index from the value of a field to the sorted IDs of the records holding it.
+
+    Values go through `normalize`, if given, both when indexed and when looked up.
+    """
+
+    def __init__(self, field: str, normalize: Optional[Callable] = None):
+        self.field = field
+        self.normalize = normalize
+        self._ids: Dict[object, List[int]] = {}
+
+    def _key(self, value):
+        return self.normalize(value) if self.normalize else value
+
+    def rebuild(self, records: Iterable) -> None:
+        """Rebuild the index from scratch"""
+        self._ids = {}
+        for record in records:
+            self.add(record)
+
+    def add(self, record) -> None:
+        """Index a record"""
+        insort(self._ids.setdefault(self._key(getattr(record, self.field)), []), record.id)
+
+    def remove(self, record) -> None:
+        """Remove a record from the index, if present"""
+        ids = self._ids.get(self._key(getattr(record, self.field)))
+        if not ids:
+            return
+
+        position = bisect_left(ids, record.id)
+        if position < len(ids) and ids[position] == record.id:
+            del ids[position]
+
+    def ids(self, value, after_id: Optional[int] = None, limit: Optional[int] = None) -> List[int]:
+        """Return the sorted IDs of the records holding the value, optionally only those after an ID, one page at a time"""
+        ids = self._ids.get(self._key(value), [])
+        first = 0 if after_id is None else bisect_right(ids, after_id)
+        return ids[first:] if limit is None else ids[first:first + limit]
+
+
+class UniqueIndex:
+    """Hash index from the normalized value of a field to the ID of the single record holding it.
+
+    Uniqueness is enforced by the callers before inserting. If the stored data
+    holds duplicates anyway, the value maps to the last indexed record.
+    """
+
+    def __init__(self, field: str, normalize: Callable):
+        self.field = field
+        self.normalize = normalize
+        self._ids: Dict[object, int] = {}
+
+    def rebuild(self, records: Iterable) -> None:
+        """Rebuild the index from scratch"""
+        self._ids = {self.normalize(getattr(record, self.field)): record.id for record in records}
+
+    def add(self, record) -> None:
+        """Index a record"""
+        self._ids[self.normalize(getattr(record, self.field))] = record.id
+
+    def remove(self, record) -> None:
+        """Remove a record from the index, if it is the one indexed for its value"""
+        key = self.normalize(getattr(record, self.field))
+        if self._ids.get(key) == record.id:
+            del self._ids[key]
+
+    def get(self, value) -> Optional[int]:
+        """Return the ID of the record holding the value, or None"""
+        return self._ids.get(self.normalize(value))
+
+
+class RangeIndex:
+    """Sorted array of the (value, id) pairs of a numeric field, for range queries"""
+
+    def __init__(self, field: str):
+        self.field = field
+        self._entries: List[Tuple[float, int]] = []
+
+    def rebuild(self, records: Iterable) -> None:
+        """Rebuild the index from scratch"""
+        self._entries = sorted((getattr(record, self.field), record.id) for record in records)
+
+    def add(self, record) -> None:
+        """Index a record"""
+        insort(self._entries, (getattr(record, self.field), record.id))
+
+    def remove(self, record) -> None:
+        """Remove a record from the index, if present"""
+        entry = (getattr(record, self.field), record.id)
+        position = bisect_left(self._entries, entry)
+        if position < len(self._entries) and self._entries[position] == entry:
+            del self._entries[position]
+
+    def ids_between(self, low: Optional[float] = None, high: Optional[float] = None) -> Set[int]:
+        """Return the IDs of the records whose value is within [low, high], bounds being optional"""
+        first = 0 if low is None else bisect_left(self._entries, (low,))
+        last = len(self._entries) if high is None else bisect_right(self._entries, (high, float("inf")))
+        return {record_id for _, record_id in self._entries[first:last]}
+
+
+class OccupancyIndex:
+    """Booked cars and revenue per day of the active and completed bookings.
+
+    Each car adds one booked car to every day covered by its bookings, and
+    each booking its price spread evenly over its days, stored as difference
+    arrays indexed by day: +1 at the start and -1 at the end. The arrays are
+    split into blocks of `BLOCK_DAYS` days, only allocated where a change
+    starts or ends, so far-off dates cost two blocks. A running sum over the
+    blocks gives the per-day values, so range queries cost one pass over the
+    days of the history whatever the number of bookings, and adding or
+    removing a booking touches a few entries.
+
+    Each car also keeps its bookings as sorted (start, end, daily revenue, id)
+    tuples of day ordinals, for per-car reports. Bookings of a car may overlap
+    in stored data, so days covered by several of them are counted once.
+    """
+
+    COUNTED = {BookingStatus.active, BookingStatus.completed}
+    BLOCK_DAYS = 1024
+
+    def __init__(self):
+        self.rebuild([])
+
+    def rebuild(self, bookings: Iterable[Booking]) -> None:
+        """Rebuild the index from scratch"""
+        self._booked: Dict[int, array] = {}
+        self._revenue: Dict[int, array] = {}
+        self._cars: Dict[int, List[Tuple[int, int, float, int]]] = {}
+        # Longest booking of each car, bookings starting earlier end before a given day
+        self._longest: Dict[int, int] = {}
+
+        for booking in bookings:
+            entry = self._entry(booking)
+            if entry is not None:
+                self._cars.setdefault(booking.car_id, []).append(entry)
+
+        # Changes are summed by day first, many bookings start or end on the same days
+        booked: Dict[int, int] = defaultdict(int)
+        revenue: Dict[int, float] = defaultdict(float)
+        for car_id, entries in self._cars.items():
+            entries.sort()
+            longest, covered_start, covered_end = 0, entries[0][0], entries[0][1]
+            for start, end, daily_revenue, _ in entries:
+                longest = max(longest, end - start)
+                revenue[start] += daily_revenue
+                revenue[end] -= daily_revenue
+                if start <= covered_end:
+                    covered_end = max(covered_end, end)
+                else:
+                    booked[covered_start] += 1
+                    booked[covered_end] -= 1
+                    covered_start, covered_end = start, end
+            booked[covered_start] += 1
+            booked[covered_end] -= 1
+            self._longest[car_id] = longest
+        for day, change in booked.items():
+            self._point(day, change, 0.0)
+        for day, change in revenue.items():
+            self._point(day, 0, change)
+
+    def _entry(self, booking: Booking) -> Optional[Tuple[int, int, float, int]]:
+        if booking.status not in self.COUNTED or booking.end_date <= booking.start_date:
+            return None
+        start, end = booking.start_date.toordinal(), booking.end_date.toordinal()
+        return start, end, (booking.total_price or 0.0) / (end - start), booking.id
+
+    def _point(self, day: int, booked: int, revenue: float) -> None:
+        block, offset = divmod(day, self.BLOCK_DAYS)
+        if block not in self._booked:
+            self._booked[block] = array("q", bytes(8 * self.BLOCK_DAYS))
+            self._revenue[block] = array("d", bytes(8 * self.BLOCK_DAYS))
+        self._booked[block][offset] += booked
+        self._revenue[block][offset] += revenue
+
+    def _change_booked(self, start: int, end: int, sign: int) -> None:
+        self._point(start, sign, 0.0)
+        self._point(end, -sign, 0.0)
+
+    def _change_revenue(self, entry: Tuple[int, int, float, int], sign: int) -> None:
+        self._point(entry[0], 0, sign * entry[2])
+        self._point(entry[1], 0, -sign * entry[2])
+
+    @staticmethod
+    def _covered(entries: List[Tuple[int, int, float, int]], start: int, end: int) -> List[Tuple[int, int]]:
+        """Return the sorted, disjoint ranges of days within [start, end) covered by the bookings"""
+        ranges = []
+        for entry_start, entry_end, _, _ in entries:
+            first, last = max(entry_start, start), min(entry_end, end)
+            if first >= last:
+                continue
+            if ranges and first <= ranges[-1][1]:
+                ranges[-1] = (ranges[-1][0], max(ranges[-1][1], last))
+            else:
+                ranges.append((first, last))
+        return ranges
+
+    def _uncovered(self, car_id: int, start: int, end: int) -> List[Tuple[int, int]]:
+        """Return the ranges of days within [start, end) not covered by the bookings of the car"""
+        ranges, day = [], start
+        for first, last in self._covered(self._car_entries(car_id, start, end), start, end):
+            if first > day:
+                ranges.append((day, first))
+            day = max(day, last)
+        if day < end:
+            ranges.append((day, end))
+        return ranges
+
+    def add(self, booking: Booking) -> None:
+        """Count a booking, if it is active or completed"""
+        entry = self._entry(booking)
+        if entry is None:
+            return
+        for start, end in self._uncovered(booking.car_id, entry[0], entry[1]):
+            self._change_booked(start, end, 1)
+        self._change_revenue(entry, 1)
+        insort(self._cars.setdefault(booking.car_id, []), entry)
+        self._longest[booking.car_id] = max(self._longest.get(booking.car_id, 0), entry[1] - entry[0])
+
+    def remove(self, booking: Booking) -> None:
+        """Stop counting a booking, if present"""
+        entry = self._entry(booking)
+        entries = self._cars.get(booking.car_id)
+        if entry is None or not entries:
+            return
+
+        position = bisect_left(entries, entry)
+        if position < len(entries) and entries[position] == entry:
+            del entries[position]
+            # The longest booking is kept, it only bounds the lookups
+            for start, end in self._uncovered(booking.car_id, entry[0], entry[1]):
+                self._change_booked(start, end, -1)
+            self._change_revenue(entry, -1)
+
+    def daily(self, start_date: date, end_date: date) -> Tuple[List[int], List[float]]:
+        """Return the booked cars and the revenue of each day of [start_date, end_date)"""
+        start, end = start_date.toordinal(), end_date.toordinal()
+        booked, revenue = [0] * (end - start), [0.0] * (end - start)
+        day, running_booked, running_revenue = start, 0, 0.0
+        for block in sorted(self._booked):
+            first = block * self.BLOCK_DAYS
+            if first >= end:
+                break
+            block_booked = list(accumulate(self._booked[block]))
+            block_revenue = list(accumulate(self._revenue[block]))
+            # Days between the blocks keep the running values
+            if first > day:
+                booked[day - start:first - start] = [running_booked] * (first - day)
+                revenue[day - start:first - start] = [running_revenue] * (first - day)
+            low, high = max(first, start), min(first + self.BLOCK_DAYS, end)
+            if low < high:
+                booked[low - start:high - start] = [running_booked + value for value in block_booked[low - first:high - first]]
+                revenue[low - start:high - start] = [running_revenue + value for value in block_revenue[low - first:high - first]]
+            running_booked += block_booked[-1]
+            running_revenue += block_revenue[-1]
+            day = max(day, high)
+        if day < end:
+            booked[day - start:] = [running_booked] * (end - day)
+            revenue[day - start:] = [running_revenue] * (end - day)
+        return booked, revenue
+
+    def _car_entries(self, car_id: int, start: int, end: int) -> List[Tuple[int, int, float, int]]:
+        """Return the bookings of a car that may overlap the days [start, end)"""
+        entries = self._cars.get(car_id, [])
+        first = bisect_left(entries, (start - self._longest.get(car_id, 0) + 1,))
+        return entries[first:bisect_left(entries, (end,))]
+
+    def car_daily(self, car_id: int, start_date: date, end_date: date) -> Tuple[List[int], List[float]]:
+        """Return whether the car is booked and its revenue on each day of [start_date, end_date)"""
+        start, end = start_date.toordinal(), end_date.toordinal()
+        booked, revenue = [0] * (end - start), [0.0] * (end - start)
+        entries = self._car_entries(car_id, start, end)
+        for first, last in self._covered(entries, start, end):
+            booked[first - start:last - start] = [1] * (last - first)
+        for booking_start, booking_end, daily_revenue, _ in entries:
+            for day in range(max(booking_start, start), min(booking_end, end)):
+                revenue[day - start] += daily_revenue
+        return booked, revenue
+
+    def car_totals(self, start_date: date, end_date: date) -> Dict[int, Tuple[int, float]]:
+        """Return the booked days and revenue within [start_date, end_date) of every car with bookings"""
+        start, end = start_date.toordinal(), end_date.toordinal()
+        totals = {}
+        for car_id in self._cars:
+            days, revenue, covered_end = 0, 0.0, start
+            for booking_start, booking_end, daily_revenue, _ in self._car_entries(car_id, start, end):
+                first, last = max(booking_start, start), min(booking_end, end)
+                if first < last:
+                    revenue += (last - first) * daily_revenue
+                    # Bookings are sorted by start, days before the end of the previous ones are counted already
+                    if last > covered_end:
+                        days += last - max(first, covered_end)
+                        covered_end = last
+            if days:
+                totals[car_id] = (days, revenue)
+        return totals
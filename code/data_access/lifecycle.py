@@ -0,0 +1,115 @@
+"""Background lifecycle of the bookings.
+
+Active bookings are completed once their end date is reached, freeing their
+car when it has no other active booking, and finished bookings older than
+`ARCHIVE_AFTER_DAYS` are moved to the archive table, so the bookings table
+only holds the working set. The scheduler runs in the app lifespan.
+"""
+import asyncio
+import logging
+import os
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional
+from ..models import BookingStatus, CarStatus
+from .cars import get_car
+from .locks import data_lock
+from .store import archived_bookings_table, bookings_table, cars_table
+
+logger = logging.getLogger(__name__)
+
+# Finished bookings are archived this number of days after their end date
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", "90"))
+
+# Longest wait, in seconds, between two runs of the scheduler
+LIFECYCLE_INTERVAL = float(os.environ.get("LIFECYCLE_INTERVAL", "3600"))
+
+
+def complete_expired_bookings(today: Optional[date] = None) -> List[int]:
+    """Complete the active bookings ending on `today` or before, returning their IDs.
+
+    Runs under the data lock, so no booking can take a car between the check
+    that it has no active booking left and the change of its status.
+    """
+    today = today or date.today()
+    with data_lock():
+        ended = bookings_table.query(lambda records: bookings_table.indexes["expiry"].pop_ended(today))
+
+        # The heap keeps entries of bookings deleted or changed since they were indexed
+        booking_ids = []
+        for end_date, booking_id in ended:
+            booking = bookings_table.get(booking_id)
+            if booking is not None and booking.status == BookingStatus.active and booking.end_date == end_date:
+                booking_ids.append(booking_id)
+        if not booking_ids:
+            return []
+
+        completed = bookings_table.update_many(booking_ids, status=BookingStatus.completed)
+
+        # Free the cars left without active bookings, unless their status was changed by hand
+        completed_car_ids = sorted({booking.car_id for booking in completed})
+        busy = bookings_table.query_index(
+            "intervals", lambda intervals: {car_id for car_id in completed_car_ids if intervals.has_bookings(car_id)}
+        )
+        car_ids = []
+        for car_id in completed_car_ids:
+            car = get_car(car_id)
+            if car is not None and car.status == CarStatus.rented and car_id not in busy:
+                car_ids.append(car_id)
+        cars_table.update_many(car_ids, status=CarStatus.available)
+
+    logger.info("Completed %s bookings and freed %s cars.", len(completed), len(car_ids))
+    return booking_ids
+
+
+def archive_old_bookings(today: Optional[date] = None) -> List[int]:
+    """Move the finished bookings ended `ARCHIVE_AFTER_DAYS` days ago to the archive, returning their IDs.
+
+    Bookings are copied to the archive before being deleted, so a crash in
+    between leaves a copy in both tables, which the next run removes.
+    """
+    cutoff = (today or date.today()) - timedelta(days=ARCHIVE_AFTER_DAYS)
+    with data_lock():
+        booking_ids = bookings_table.query(lambda records: records.finished_ids(cutoff))
+        if not booking_ids:
+            return []
+
+        archived_bookings_table.insert_many([bookings_table.get(booking_id) for booking_id in booking_ids])
+        bookings_table.delete_many(booking_ids)
+
+    logger.info("Archived %s bookings ended before %s.", len(booking_ids), cutoff)
+    return booking_ids
+
+
+def run_lifecycle(today: Optional[date] = None) -> Dict[str, int]:
+    """Complete the ended bookings and archive the old ones"""
+    return {
+        "completed": len(complete_expired_bookings(today)),
+        "archived": len(archive_old_bookings(today)),
+    }
+
+
+def next_end_date() -> Optional[date]:
+    """Return the earliest end date of the active bookings"""
+    return bookings_table.query_index("expiry", lambda expiry: expiry.next_end_date())
+
+
+def _seconds_until(day: Optional[date], interval: float) -> float:
+    """Return the seconds to wait until the start of `day`, at most `interval`"""
+    if day is None:
+        return interval
+    remaining = (datetime.combine(day, time.min) - datetime.now()).total_seconds()
+    return min(max(remaining, 1.0), interval)
+
+
+async def run_scheduler(interval: float = LIFECYCLE_INTERVAL) -> None:
+    """Run the lifecycle when the next booking ends, and at least every `interval` seconds"""
+    logger.info("Booking lifecycle scheduler started.")
+    while True:
+        next_day = None
+        try:
+            result = await asyncio.to_thread(run_lifecycle)
+            logger.info("Booking lifecycle run: %s.", result)
+            next_day = await asyncio.to_thread(next_end_date)
+        except Exception as e:
+            logger.error("Error running the booking lifecycle: %s", e)
+        await asyncio.sleep(_seconds_until(next_day, interval))
@@ -0,0 +1,83 @@
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict
+from . import utils
+
+try:
+    import fcntl
+except ImportError:  # Windows: locks only hold within the process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DATA_LOCK_FILE = ".data.lock"
+CAR_LOCK_FILE = ".cars.lock"
+
+_data_lock = threading.RLock()
+_data_lock_depth = 0
+_car_locks: Dict[int, threading.Lock] = {}
+_car_locks_guard = threading.Lock()
+_lock_fds: Dict[str, int] = {}
+_lock_fds_guard = threading.Lock()
+
+
+def _lock_fd(filename: str) -> int:
+    """Return a file descriptor of the lock file, opened once per process.
+
+    POSIX record locks are dropped when the process closes any descriptor of
+    the file, so descriptors are kept open for the lifetime of the process.
+    """
+    path = str(utils.DATA_DIR / filename)
+    with _lock_fds_guard:
+        if path not in _lock_fds:
+            utils.DATA_DIR.mkdir(exist_ok=True)
+            _lock_fds[path] = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        return _lock_fds[path]
+
+
+@contextmanager
+def data_lock():
+    """Exclusive lock over the data files, shared by threads and processes.
+
+    Reentrant within a thread. Every read-modify-write of a data file must run
+    under this lock so that concurrent workers never overwrite each other.
+    """
+    global _data_lock_depth
+    with _data_lock:
+        fd = None
+        if _data_lock_depth == 0 and fcntl is not None:
+            fd = _lock_fd(DATA_LOCK_FILE)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        _data_lock_depth += 1
+        try:
+            yield
+        finally:
+            _data_lock_depth -= 1
+            if fd is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+@contextmanager
+def car_lock(car_id: int):
+    """Exclusive lock over the bookings of one car, shared by threads and processes.
+
+    Only requests on the same car wait on each other: across processes each
+    car locks its own byte of the car lock file.
+    """
+    with _car_locks_guard:
+        lock = _car_locks.setdefault(car_id, threading.Lock())
+
+    # Byte offsets must be positive, sharing a byte between two cars is harmless
+    offset = car_id % (1 << 31)
+    with lock:
+        fd = None
+        if fcntl is not None:
+            fd = _lock_fd(CAR_LOCK_FILE)
+            fcntl.lockf(fd, fcntl.LOCK_EX, 1, offset)
+        try:
+            yield
+        finally:
+            if fd is not None:
+                fcntl.lockf(fd, fcntl.LOCK_UN, 1, offset)
@@ -0,0 +1,32 @@
+"""One-shot migration of the JSON data files to the SQLite storage backend.
+
+Run from the repository root:
+
+    python -m code.data_access.migrate
+"""
+import logging
+from .locks import data_lock
+from .sqlite_storage import SqliteStorage
+from .storage import JsonStorage
+
+logger = logging.getLogger(__name__)
+
+TABLES = ["cars.json", "bookings.json", "bookings_archive.json"]
+
+
+def migrate_json_to_sqlite() -> dict:
+    """Copy every JSON table into the SQLite database, replacing its content"""
+    source, target = JsonStorage(), SqliteStorage()
+    counts = {}
+    with data_lock():
+        for filename in TABLES:
+            records = source.load(filename)
+            target.compact(filename, records)
+            counts[filename] = len(records)
+            logger.info("Migrated %s records from %s.", len(records), filename)
+    return counts
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(migrate_json_to_sqlite())
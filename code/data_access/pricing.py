@@ -0,0 +1,154 @@
+"""Pricing of the rentals.
+
+The price of a day is the daily price of the car times a factor given by the
+pricing rules: the multiplier of its season, raised by the weekend surcharge
+on Saturdays and Sundays. Long rentals then get a discount on the total.
+
+Rules are read as JSON from the `PRICING_RULES` environment variable, e.g.
+
+    {"seasons": [{"start": "07-01", "end": "08-31", "multiplier": 1.3}],
+     "weekend_surcharge": 0.1,
+     "long_rental_discounts": [{"min_days": 7, "discount": 0.1}]}
+
+and charge the daily price of the car as is when missing.
+"""
+import calendar
+import functools
+import logging
+import os
+import threading
+from array import array
+from bisect import bisect_right
+from datetime import date
+from itertools import accumulate
+from typing import List, Optional
+from ..models import Car, PricingRules, Quote
+from .cars import get_car
+
+logger = logging.getLogger(__name__)
+
+# Quotes kept in memory, the booking form asks for one on every date change
+QUOTE_CACHE_SIZE = int(os.environ.get("QUOTE_CACHE_SIZE", "4096"))
+
+
+def _season_factors(rules: PricingRules) -> List[float]:
+    """Return the season multiplier of every day of a leap year, by day of the year"""
+    factors = [1.0] * 366
+    # The first matching season applies, so earlier seasons overwrite later ones
+    for season in reversed(rules.seasons):
+        first = date(2000, *map(int, season.start.split("-"))).timetuple().tm_yday - 1
+        last = date(2000, *map(int, season.end.split("-"))).timetuple().tm_yday - 1
+        days = range(first, last + 1) if first <= last else [*range(first, 366), *range(0, last + 1)]
+        for day in days:
+            factors[day] = season.multiplier
+    return factors
+
+
+class RateCalendar:
+    """Prefix sums of the daily price factors over a cycle of the Gregorian calendar.
+
+    Days and weekdays repeat every 400 years, so the factor sum of any range of
+    days is a number of whole cycles plus the difference of two prefix sums,
+    and pricing a rental takes the same time whatever its length.
+    """
+
+    def __init__(self, rules: PricingRules):
+        seasons = _season_factors(rules)
+        weekend = 1.0 + rules.weekend_surcharge
+        factors = []
+        for year in range(1, 401):
+            # Seasons are indexed by the days of a leap year
+            days = seasons if calendar.isleap(year) else seasons[:59] + seasons[60:]
+            weekday = date(year, 1, 1).weekday()
+            factors.extend(
+                factor * weekend if (weekday + day) % 7 >= 5 else factor for day, factor in enumerate(days)
+            )
+        self._prefix = array("d", accumulate(factors, initial=0.0))
+        self._cycle = len(factors)
+
+    def _sum_before(self, ordinal: int) -> float:
+        """Return the sum of the factors of the days before a proleptic Gregorian ordinal"""
+        cycles, day = divmod(ordinal - 1, self._cycle)
+        return cycles * self._prefix[-1] + self._prefix[day]
+
+    def factor_sum(self, start: date, end: date) -> float:
+        """Return the sum of the factors of the days from `start` to the day before `end`"""
+        return self._sum_before(end.toordinal()) - self._sum_before(start.toordinal())
+
+
+def _load_rules() -> PricingRules:
+    raw = os.environ.get("PRICING_RULES")
+    return PricingRules.model_validate_json(raw) if raw else PricingRules()
+
+
+_rules = _load_rules()
+# Part of the key of the cached quotes, bumped by every change of the rules
+_version = 0
+# Built at import from configured rules, so bad rules fail the startup and not the first booking.
+# The default rules charge the daily price as is, their calendar is built on first use
+_calendar: Optional[RateCalendar] = RateCalendar(_rules) if _rules != PricingRules() else None
+_calendar_lock = threading.Lock()
+
+
+def get_rules() -> PricingRules:
+    """Return the pricing rules in use"""
+    return _rules
+
+
+def set_rules(rules: PricingRules) -> None:
+    """Replace the pricing rules, dropping the quotes computed with the old ones"""
+    global _rules, _calendar, _version
+    # Built first, so invalid seasons leave the rules in use unchanged
+    rate_calendar = RateCalendar(rules)
+    with _calendar_lock:
+        _rules, _calendar = rules, rate_calendar
+        _version += 1
+        _quote.cache_clear()
+    logger.info("Pricing rules updated.")
+
+
+def get_calendar() -> RateCalendar:
+    """Return the rate calendar of the rules, built on first use"""
+    global _calendar
+    rate_calendar = _calendar
+    if rate_calendar is None:
+        with _calendar_lock:
+            if _calendar is None:
+                _calendar = RateCalendar(_rules)
+                logger.info("Built the rate calendar.")
+            rate_calendar = _calendar
+    return rate_calendar
+
+
+def _discount(rules: PricingRules, total_days: int) -> float:
+    """Return the discount of the longest rental length reached by `total_days`"""
+    tiers = sorted((tier.min_days, tier.discount) for tier in rules.long_rental_discounts)
+    position = bisect_right(tiers, (total_days, float("inf")))
+    return tiers[position - 1][1] if position else 0.0
+
+
+@functools.lru_cache(maxsize=QUOTE_CACHE_SIZE)
+def _quote(version: int, car_id: Optional[int], price: float, start: date, end: date) -> Quote:
+    # The price is part of the key, so a changed car is never quoted at its old price
+    total_days = (end - start).days
+    discount = _discount(_rules, total_days)
+    total_price = price * get_calendar().factor_sum(start, end) * (1 - discount)
+    return Quote(
+        car_id=car_id, start_date=start, end_date=end, total_days=total_days,
+        base_price=round(price * total_days, 2), discount=discount, total_price=round(total_price, 2),
+    )
+
+
+def quote_car(car: Car, start: date, end: date) -> Quote:
+    """Price the rental of a car from `start` to the day before `end`"""
+    return _quote(_version, car.id, car.price, start, end)
+
+
+def get_quote(car_id: int, start: date, end: date) -> Optional[Quote]:
+    """Price the rental of a car between two dates, None if the car does not exist"""
+    if start >= end:
+        raise ValueError("Start date must be before end date.")
+    car = get_car(car_id)
+    if car is None:
+        return None
+    return quote_car(car, start, end)
@@ -0,0 +1,115 @@
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+from ..models import CarUtilization, UtilizationPeriod, UtilizationReport
+from .cars import get_car
+from .store import archived_bookings_table, bookings_table, cars_table
+import logging
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = ("day", "month")
+
+
+def _occupancy(function) -> list:
+    """Call `function` with the up to date occupancy index of the bookings, then of the archive.
+
+    Each call runs under the lock of its table, returning one result per table.
+    """
+    return [
+        table.query(lambda records: function(table.indexes["occupancy"]))
+        for table in (bookings_table, archived_bookings_table)
+    ]
+
+
+def _add_daily(results: list) -> Tuple[List[int], List[float]]:
+    """Sum the per-day (booked, revenue) lists of several tables"""
+    booked = [sum(values) for values in zip(*(result[0] for result in results))]
+    revenue = [sum(values) for values in zip(*(result[1] for result in results))]
+    return booked, revenue
+
+
+def _add_totals(results: list) -> Dict[int, Tuple[int, float]]:
+    """Sum the per-car (booked days, revenue) totals of several tables"""
+    totals: Dict[int, Tuple[int, float]] = {}
+    for result in results:
+        for car_id, (booked_days, revenue) in result.items():
+            previous_days, previous_revenue = totals.get(car_id, (0, 0.0))
+            totals[car_id] = (previous_days + booked_days, previous_revenue + revenue)
+    return totals
+
+
+def _validate_range(start_date: date, end_date: date) -> None:
+    if start_date >= end_date:
+        raise ValueError("Start date must be before end date.")
+
+
+def _periods(start_date: date, booked: List[int], revenue: List[float], granularity: str,
+             cars: int) -> List[UtilizationPeriod]:
+    """Group per-day values into periods of the given granularity"""
+    groups: Dict[str, List] = {}
+    for offset, (day_booked, day_revenue) in enumerate(zip(booked, revenue)):
+        day = start_date + timedelta(days=offset)
+        key = day.isoformat() if granularity == "day" else f"{day.year:04d}-{day.month:02d}"
+        group = groups.setdefault(key, [0, 0, 0.0])
+        group[0] += 1
+        group[1] += day_booked
+        group[2] += day_revenue
+
+    return [
+        UtilizationPeriod(
+            period=key,
+            booked_days=group_booked,
+            revenue=round(group_revenue, 2),
+            utilization=group_booked / (days * cars) if cars else 0.0
+        )
+        for key, (days, group_booked, group_revenue) in groups.items()
+    ]
+
+
+def get_utilization(start_date: date, end_date: date, granularity: str = "day",
+                    car_id: Optional[int] = None) -> UtilizationReport:
+    """Get the booked days, revenue and utilization of the fleet or of one car, by period"""
+    logger.info("Computing utilization from %s to %s by %s.", start_date, end_date, granularity)
+    _validate_range(start_date, end_date)
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Granularity must be one of: {', '.join(GRANULARITIES)}.")
+
+    if car_id is None:
+        cars = cars_table.query(len)
+        booked, revenue = _add_daily(_occupancy(lambda index: index.daily(start_date, end_date)))
+    else:
+        if get_car(car_id) is None:
+            raise ValueError(f"Car with ID {car_id} not found.")
+        cars = 1
+        booked, revenue = _add_daily(_occupancy(lambda index: index.car_daily(car_id, start_date, end_date)))
+
+    total_booked = sum(booked)
+    return UtilizationReport(
+        start_date=start_date,
+        end_date=end_date,
+        granularity=granularity,
+        car_id=car_id,
+        cars=cars,
+        booked_days=total_booked,
+        revenue=round(sum(revenue), 2),
+        utilization=total_booked / (len(booked) * cars) if cars else 0.0,
+        periods=_periods(start_date, booked, revenue, granularity, cars)
+    )
+
+
+def get_cars_utilization(start_date: date, end_date: date) -> List[CarUtilization]:
+    """Get the booked days, revenue and utilization of every car between two dates"""
+    logger.info("Computing utilization of every car from %s to %s.", start_date, end_date)
+    _validate_range(start_date, end_date)
+
+    days = (end_date - start_date).days
+    car_ids = sorted(cars_table.query(lambda records: [car.id for car in records.rows()]))
+    totals = _add_totals(_occupancy(lambda index: index.car_totals(start_date, end_date)))
+
+    report = []
+    for car_id in car_ids:
+        booked_days, revenue = totals.get(car_id, (0, 0.0))
+        report.append(CarUtilization(
+            car_id=car_id, booked_days=booked_days, revenue=round(revenue, 2), utilization=booked_days / days
+        ))
+    return report
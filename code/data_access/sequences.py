@@ -0,0 +1,51 @@
+import logging
+import threading
+from typing import Dict
+from . import utils
+from .storage import _file_signature
+
+logger = logging.getLogger(__name__)
+
+SEQUENCES_FILE = "sequences.json"
+
+
+class Sequences:
+    """Persistent ID sequences, one per table.
+
+    Each sequence stores the last ID handed out for its table, so IDs are never
+    reused even after the record holding the highest one is deleted. The file
+    is cached in memory and only re-read when another worker changed it.
+    Allocation must run under the data lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values: Dict[str, int] = {}
+        self._source = None
+        self._signature = None
+
+    def _refresh(self) -> None:
+        path = utils.DATA_DIR / SEQUENCES_FILE
+        signature = _file_signature(path)
+        if path == self._source and signature == self._signature:
+            return
+
+        self._values = {entry["table"]: entry["last_id"] for entry in utils._load_file(SEQUENCES_FILE)}
+        self._source = path
+        self._signature = signature
+
+    def allocate(self, table: str, floor: int, count: int = 1) -> int:
+        """Reserve `count` consecutive IDs above `floor`, returning the first one"""
+        with self._lock:
+            self._refresh()
+            first_id = max(self._values.get(table, 0), floor) + 1
+            self._values[table] = first_id + count - 1
+            utils._save_file(SEQUENCES_FILE, [
+                {"table": name, "last_id": last_id} for name, last_id in self._values.items()
+            ])
+            self._signature = _file_signature(self._source)
+            logger.info("Allocated %s IDs for %s from %s.", count, table, first_id)
+            return first_id
+
+
+sequences = Sequences()
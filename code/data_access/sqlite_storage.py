@@ -0,0 +1,194 @@
+import logging
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date
+from enum import Enum
+from pathlib import Path
+from typing import Callable, Dict, List
+from . import utils
+
+logger = logging.getLogger(__name__)
+
+DATABASE_FILE = "rental.db"
+POOL_SIZE = 4
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cars (
+    id INTEGER PRIMARY KEY,
+    brand TEXT NOT NULL,
+    model TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    license_plate TEXT NOT NULL,
+    fuel_type TEXT NOT NULL,
+    transmission TEXT NOT NULL,
+    price REAL NOT NULL,
+    status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cars_status ON cars (status);
+
+CREATE TABLE IF NOT EXISTS bookings (
+    id INTEGER PRIMARY KEY,
+    car_id INTEGER NOT NULL,
+    customer_email TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL,
+    total_days REAL,
+    total_price REAL,
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_bookings_car_dates ON bookings (car_id, start_date, end_date);
+CREATE INDEX IF NOT EXISTS idx_bookings_status ON bookings (status);
+
+CREATE TABLE IF NOT EXISTS bookings_archive (
+    id INTEGER PRIMARY KEY,
+    car_id INTEGER NOT NULL,
+    customer_email TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL,
+    total_days REAL,
+    total_price REAL,
+    status TEXT
+);
+
+CREATE TABLE IF NOT EXISTS versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+
+def _to_column(value):
+    """Convert a record value to a type SQLite stores natively"""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+class ConnectionPool:
+    """Small pool of connections to one SQLite database in WAL mode"""
+
+    def __init__(self, path: Path, size: int = POOL_SIZE):
+        self.path = path
+        self._connections = queue.LifoQueue()
+        for _ in range(size):
+            self._connections.put(self._connect())
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(str(self.path), isolation_level=None, check_same_thread=False, timeout=30)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(SCHEMA)
+        return connection
+
+    @contextmanager
+    def connection(self):
+        connection = self._connections.get()
+        try:
+            yield connection
+        finally:
+            self._connections.put(connection)
+
+
+class SqliteStorage:
+    """Storage backend keeping the tables in a SQLite database.
+
+    Each table of the data directory maps to a SQL table named after the JSON
+    file (`cars.json` -> `cars`), and every change event is a single row
+    statement. A per-table version counter, bumped in the same transaction,
+    lets the in-memory store detect changes made by other workers.
+    """
+
+    def __init__(self):
+        self._pools: Dict[Path, ConnectionPool] = {}
+        self._pools_lock = threading.Lock()
+
+    def _pool(self) -> ConnectionPool:
+        path = utils.DATA_DIR / DATABASE_FILE
+        with self._pools_lock:
+            if path not in self._pools:
+                utils.DATA_DIR.mkdir(exist_ok=True)
+                self._pools[path] = ConnectionPool(path)
+            return self._pools[path]
+
+    @staticmethod
+    def _table(filename: str) -> str:
+        return Path(filename).stem
+
+    @contextmanager
+    def _transaction(self, filename: str):
+        with self._pool().connection() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+                connection.execute(
+                    "INSERT INTO versions (name, version) VALUES (?, 1) "
+                    "ON CONFLICT (name) DO UPDATE SET version = version + 1",
+                    (self._table(filename),)
+                )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _insert(connection: sqlite3.Connection, table: str, record: dict) -> None:
+        columns = ", ".join(record)
+        placeholders = ", ".join("?" for _ in record)
+        connection.execute(
+            f"INSERT OR REPLACE INTO {table} ({columns}) VALUES ({placeholders})",
+            [_to_column(value) for value in record.values()]
+        )
+
+    def load(self, filename: str) -> list:
+        """Load all the records of a table"""
+        with self._pool().connection() as connection:
+            rows = connection.execute(f"SELECT * FROM {self._table(filename)} ORDER BY rowid").fetchall()
+        return [dict(row) for row in rows]
+
+    def signature(self, filename: str):
+        """Return the version counter of the table"""
+        with self._pool().connection() as connection:
+            row = connection.execute(
+                "SELECT version FROM versions WHERE name = ?", (self._table(filename),)
+            ).fetchone()
+        return row["version"] if row else 0
+
+    def partitioning(self, filename: str) -> None:
+        """Rows are written one by one, tables are never partitioned"""
+        return None
+
+    def write(self, filename: str, events: List[dict], records: Callable[[], list], partitions=None) -> None:
+        """Persist a batch of change events as row statements in one transaction"""
+        table = self._table(filename)
+        with self._transaction(filename) as connection:
+            for event in events:
+                if event["op"] == "insert":
+                    self._insert(connection, table, event["record"])
+                elif event["op"] == "update":
+                    changes = event["changes"]
+                    assignments = ", ".join(f"{column} = ?" for column in changes)
+                    connection.execute(
+                        f"UPDATE {table} SET {assignments} WHERE id = ?",
+                        [_to_column(value) for value in changes.values()] + [event["id"]]
+                    )
+                elif event["op"] == "delete":
+                    connection.execute(f"DELETE FROM {table} WHERE id = ?", (event["id"],))
+                else:
+                    raise ValueError(f"Unknown event operation: {event['op']}.")
+
+    def needs_compaction(self, filename: str) -> bool:
+        """SQLite tables never need compaction"""
+        return False
+
+    def compact(self, filename: str, records: list) -> None:
+        """Replace the full content of a table"""
+        table = self._table(filename)
+        with self._transaction(filename) as connection:
+            connection.execute(f"DELETE FROM {table}")
+            for record in records:
+                self._insert(connection, table, record)
@@ -0,0 +1,275 @@
+import logging
+import os
+from datetime import date
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from ..metrics import BYTES_WRITTEN
+from . import codec, utils
+from .sqlite_storage import SqliteStorage
+
+logger = logging.getLogger(__name__)
+
+Signature = Optional[Tuple[int, int, int]]
+
+
+def _file_signature(path: Path) -> Signature:
+    """Return the (inode, mtime, size) triple used to detect changes made to a file"""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def apply_event(records: Dict[int, dict], event: dict) -> None:
+    """Apply one change event to records indexed by ID.
+
+    Events are idempotent when replayed in order over a state that already
+    contains them, so a log that outlived its compaction is harmless.
+    """
+    op = event["op"]
+    if op == "insert":
+        records[event["record"]["id"]] = event["record"]
+    elif op == "update":
+        if event["id"] in records:
+            records[event["id"]].update(event["changes"])
+    elif op == "delete":
+        records.pop(event["id"], None)
+    else:
+        raise ValueError(f"Unknown event operation: {op}.")
+
+
+class MonthPartitions:
+    """Split of the records of a table into one partition per month of a date field"""
+
+    def __init__(self, field: str):
+        self.field = field
+
+    def key(self, record) -> str:
+        """Return the partition of a record, model or plain dict, e.g. 2024-05"""
+        value = record[self.field] if isinstance(record, dict) else getattr(record, self.field)
+        return str(value)[:7]
+
+    def range(self, key: str) -> Tuple[date, date]:
+        """Return the first day of the partition and the first day after it"""
+        year, month = map(int, key.split("-"))
+        return date(year, month, 1), date(year + month // 12, month % 12 + 1, 1)
+
+    def group(self, records: Iterable[dict]) -> Dict[str, list]:
+        """Group records by partition"""
+        groups: Dict[str, list] = {}
+        for record in records:
+            groups.setdefault(self.key(record), []).append(record)
+        return groups
+
+
+# Tables stored by the JSON backend as one file per month, in a folder named
+# after the table. Old bookings are never rewritten by changes of new ones
+PARTITIONED_TABLES = {
+    "bookings.json": MonthPartitions("start_date"),
+    "bookings_archive.json": MonthPartitions("start_date"),
+}
+
+# Sorted list of the partition files of a partitioned table, rewritten last by every change
+MANIFEST_FILE = "manifest.json"
+
+# Functions returning the records of the partitions changed by a write, by partition
+Partitions = Optional[Dict[str, Callable[[], list]]]
+
+
+class JsonStorage:
+    """Storage backend keeping each table in a JSON file.
+
+    Every change rewrites the whole file, except for the tables listed in
+    `PARTITIONED_TABLES`, kept as one file per month in the folder
+    `<table>/` (e.g. `bookings/2024-05.json`) next to a manifest of the
+    partitions. Changes only rewrite the partitions they touch, then the
+    manifest, whose signature is the one of the table. A table stored as a
+    single file is split into partitions by its first change.
+    """
+
+    def _folder(self, filename: str) -> str:
+        return Path(filename).stem
+
+    def _manifest(self, filename: str) -> str:
+        return f"{self._folder(filename)}/{MANIFEST_FILE}"
+
+    def _partition_file(self, filename: str, key: str) -> str:
+        return f"{self._folder(filename)}/{key}.json"
+
+    def _is_split(self, filename: str) -> bool:
+        return (utils.DATA_DIR / self._manifest(filename)).exists()
+
+    def partitioning(self, filename: str) -> Optional[MonthPartitions]:
+        """Return the partitioning of a table, or None when it is stored as a whole"""
+        return PARTITIONED_TABLES.get(filename)
+
+    def load(self, filename: str) -> list:
+        """Load all the records of a table"""
+        return self._load_snapshot(filename)
+
+    def _load_snapshot(self, filename: str) -> list:
+        """Load a table as written by this backend, whole or split into partitions"""
+        if filename not in PARTITIONED_TABLES or not self._is_split(filename):
+            return utils._load_file(filename)
+
+        records = []
+        for key in utils._load_file(self._manifest(filename)):
+            records.extend(utils._load_file(self._partition_file(filename, key)))
+        return records
+
+    def _snapshot_signature(self, filename: str):
+        if filename not in PARTITIONED_TABLES:
+            return _file_signature(utils.DATA_DIR / filename)
+        return _file_signature(utils.DATA_DIR / filename), _file_signature(utils.DATA_DIR / self._manifest(filename))
+
+    def signature(self, filename: str):
+        """Return a value that changes whenever the table changes on disk"""
+        return self._snapshot_signature(filename)
+
+    def write(self, filename: str, events: List[dict], records: Callable[[], list],
+              partitions: Partitions = None) -> None:
+        """Persist a batch of change events.
+
+        `records` returns the full table after them and, for partitioned
+        tables, `partitions` the records of each partition they changed.
+        """
+        partitioning = self.partitioning(filename)
+        if partitioning is None:
+            utils._save_file(filename, records())
+        elif not self._is_split(filename):
+            logger.info("Splitting %s into monthly partitions.", filename)
+            self.compact(filename, records())
+        else:
+            self._save_partitions(filename, {key: dump() for key, dump in partitions.items()})
+
+    def _save_partitions(self, filename: str, groups: Dict[str, list], replace: bool = False) -> None:
+        """Write partitions, dropping the empty ones, then the manifest.
+
+        With `replace`, the partitions missing from `groups` are dropped too.
+        Files are only deleted once the manifest no longer lists them.
+        """
+        keys = set() if replace or not self._is_split(filename) else set(utils._load_file(self._manifest(filename)))
+        for key, group in groups.items():
+            if group:
+                utils._save_file(self._partition_file(filename, key), group)
+                keys.add(key)
+            else:
+                keys.discard(key)
+        utils._save_file(self._manifest(filename), sorted(keys))
+
+        for path in (utils.DATA_DIR / self._folder(filename)).glob("*.json"):
+            if path.name != MANIFEST_FILE and path.stem not in keys:
+                path.unlink()
+        (utils.DATA_DIR / filename).unlink(missing_ok=True)
+
+    def needs_compaction(self, filename: str) -> bool:
+        """Whether the table should be compacted"""
+        return False
+
+    def compact(self, filename: str, records: list) -> None:
+        """Write the full table as a snapshot"""
+        partitioning = self.partitioning(filename)
+        if partitioning is None:
+            utils._save_file(filename, records)
+        else:
+            self._save_partitions(filename, partitioning.group(records), replace=True)
+
+
+class LogStorage(JsonStorage):
+    """Storage backend keeping each table as a snapshot plus an append-only log.
+
+    The snapshot is the table as written by `JsonStorage`, a single file or
+    monthly partitions, so existing data is picked up as is. Each batch of changes is appended to
+    `<filename>.log` as JSON lines with a single fsync. Loading replays the log over the snapshot, and the
+    log is folded into a new snapshot once it holds `max_events` events.
+    """
+
+    def __init__(self, max_events: int = 1000):
+        self.max_events = max_events
+        self._event_counts: Dict[str, int] = {}
+
+    def _log_path(self, filename: str) -> Path:
+        return utils.DATA_DIR / f"{filename}.log"
+
+    def partitioning(self, filename: str) -> Optional[MonthPartitions]:
+        """Appends never rewrite the snapshot, which is kept whole"""
+        return None
+
+    def _read_events(self, filename: str) -> List[dict]:
+        path = self._log_path(filename)
+        if not path.exists():
+            return []
+
+        events = []
+        with path.open("rb") as f:
+            for number, line in enumerate(f, start=1):
+                try:
+                    events.append(codec.loads(line))
+                except codec.DecodeError:
+                    # A torn line is left by a crash in the middle of an append
+                    logger.warning("Ignoring corrupted line %s of %s.", number, path.name)
+        return events
+
+    def load(self, filename: str) -> list:
+        records = {record["id"]: record for record in self._load_snapshot(filename)}
+        events = self._read_events(filename)
+        for event in events:
+            apply_event(records, event)
+        self._event_counts[filename] = len(events)
+        logger.info("Replayed %s events over %s.", len(events), filename)
+        return list(records.values())
+
+    def signature(self, filename: str):
+        return self._snapshot_signature(filename), _file_signature(self._log_path(filename))
+
+    def write(self, filename: str, events: List[dict], records: Callable[[], list],
+              partitions: Partitions = None) -> None:
+        utils.DATA_DIR.mkdir(exist_ok=True)
+        lines = b"".join(codec.dumps(event) + b"\n" for event in events)
+        with self._log_path(filename).open("a+b") as f:
+            # A crash can leave a torn last line, end it so the new events are not merged into it
+            if f.seek(0, os.SEEK_END) > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    lines = b"\n" + lines
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        BYTES_WRITTEN.inc(len(lines), file=f"{filename}.log")
+        self._event_counts[filename] = self._event_counts.get(filename, 0) + len(events)
+
+    def needs_compaction(self, filename: str) -> bool:
+        return self._event_counts.get(filename, 0) >= self.max_events
+
+    def compact(self, filename: str, records: list) -> None:
+        logger.info("Compacting %s into a new snapshot.", filename)
+        if filename in PARTITIONED_TABLES and self._is_split(filename):
+            # Keep the layout of the snapshot, the partitions would hide a new single file
+            self._save_partitions(filename, PARTITIONED_TABLES[filename].group(records), replace=True)
+        else:
+            utils._save_file(filename, records)
+        # Replaying the old log over the new snapshot would be harmless, so a
+        # crash before this truncation loses nothing
+        with self._log_path(filename).open("w", encoding="utf-8") as f:
+            f.flush()
+            os.fsync(f.fileno())
+        self._event_counts[filename] = 0
+
+
+_BACKENDS = {
+    "json": JsonStorage,
+    "log": LogStorage,
+    "sqlite": SqliteStorage,
+}
+_instances: Dict[str, JsonStorage] = {}
+
+
+def get_storage() -> JsonStorage:
+    """Return the storage backend selected by `utils.STORAGE_BACKEND`"""
+    name = utils.STORAGE_BACKEND
+    if name not in _instances:
+        if name not in _BACKENDS:
+            raise ValueError(f"Unknown storage backend: {name}.")
+        _instances[name] = _BACKENDS[name]()
+    return _instances[name]
@@ -0,0 +1,417 @@
+import functools
+import logging
+import pickle
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Type
+from pydantic import BaseModel, TypeAdapter
+from ..metrics import STAGE_SECONDS, TABLE_CACHE_LOOKUPS, TABLE_RECORDS
+from ..models import Car
+from . import codec, utils
+from .columnar import BookingColumns
+from .generations import generations
+from .indexes import (
+    CustomerIndex, ExpiryIndex, FieldIndex, IntervalIndex, OccupancyIndex, RangeIndex, UniqueIndex
+)
+from .locks import data_lock
+from .sequences import sequences
+from .storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRecords:
+    """Records kept as pydantic models in a hash map by ID.
+
+    Stored records are converted and dumped as a whole list in a single pass of
+    pydantic-core. Models are shared with the callers, which must treat them as
+    read-only.
+    """
+
+    def __init__(self, model: Type[BaseModel]):
+        self.model = model
+        self._adapter = TypeAdapter(List[model])
+        self._records: Dict[int, BaseModel] = {}
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __getstate__(self) -> dict:
+        # The adapter cannot be pickled, it is rebuilt from the model
+        return {"model": self.model, "records": self._records}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state["model"])
+        self._records = state["records"]
+
+    def load(self, data: list) -> None:
+        """Replace the content with stored records"""
+        self._records = {record.id: record for record in self._adapter.validate_python(data)}
+
+    def rows(self) -> Iterable[BaseModel]:
+        """Iterate over the records, as handed to the indexes"""
+        return self._records.values()
+
+    def models(self) -> List[BaseModel]:
+        return list(self._records.values())
+
+    def get(self, record_id: int) -> Optional[BaseModel]:
+        return self._records.get(record_id)
+
+    def put(self, record: BaseModel) -> None:
+        self._records[record.id] = record
+
+    def remove(self, record_id: int) -> None:
+        del self._records[record_id]
+
+    def max_id(self) -> int:
+        return max(self._records, default=0)
+
+    def dump(self) -> list:
+        return self._adapter.dump_python(self.models())
+
+    def dump_between(self, field: str, start, end) -> list:
+        """Return as plain records the records whose `field` is within [start, end)"""
+        return self._adapter.dump_python([
+            record for record in self._records.values() if start <= getattr(record, field) < end
+        ])
+
+
+class Table:
+    """In-memory copy of one table of the storage backend.
+
+    The table is loaded once and reads are served from memory. Every mutation
+    is written through to the storage backend as a change event, and the table
+    is reloaded when the data directory, the backend or the signature of the
+    stored data changes outside this process. Mutations run under the
+    inter-process data lock and reload the table first, so writes made by other
+    workers are never lost.
+
+    Records are held by a container such as `ModelRecords` or `BookingColumns`,
+    which reaches them through a hash map by ID, so lookups by ID are constant
+    time. Records returned by the table may be shared with the cache, so
+    callers must treat them as read-only and go through `insert`, `update` and
+    `delete`.
+
+    Indexes are objects with `rebuild(records)`, `add(record)` and
+    `remove(record)` methods, kept in step with every load and mutation.
+
+    When the storage backend splits the table into partitions, mutations hand
+    it the records of the partitions they touched only, dumped with the
+    `dump_between` method of the container.
+
+    Every write also bumps the generation counter of the table shared by the
+    worker processes. With `utils.CACHE_INVALIDATION` set to "generation",
+    reads only check the stored table once that counter moved. The counter does
+    not tell which partitions changed, so the other workers then reload the
+    whole table.
+
+    The version of the table is bumped by every load and mutation. It is local
+    to the process, whereas `signature` returns the signature of the stored
+    table the records reflect, the same in every worker holding the same data.
+
+    `snapshot` and `restore` hand the loaded state over to another process,
+    which only trusts it while the signature of the stored table is the same.
+    """
+
+    def __init__(self, filename: str, records, indexes: Optional[Dict[str, object]] = None):
+        self.filename = filename
+        self.indexes = indexes or {}
+        self._lock = threading.RLock()
+        self._records = records
+        self._max_id = 0
+        self._source = None
+        self._signature = None
+        self._generation = None
+        self._compacting = False
+        self._version = 0
+
+    def _refresh(self) -> None:
+        """Reload the records if the stored table has changed since the last load"""
+        storage = get_storage()
+        source = (utils.DATA_DIR, storage)
+        # Read before the stored table, so a write landing meanwhile moves it again
+        generation = generations.get(self.filename) if utils.CACHE_INVALIDATION == "generation" else None
+        if source == self._source and generation is not None and generation == self._generation:
+            TABLE_CACHE_LOOKUPS.inc(table=self.filename, result="hit")
+            return
+
+        signature = storage.signature(self.filename)
+        if source == self._source and signature == self._signature:
+            self._generation = generation
+            TABLE_CACHE_LOOKUPS.inc(table=self.filename, result="hit")
+            return
+
+        TABLE_CACHE_LOOKUPS.inc(table=self.filename, result="miss")
+        logger.info("Reloading %s into memory.", self.filename)
+        with codec.paused_gc():
+            with STAGE_SECONDS.time(stage="table_read"):
+                while True:
+                    data = storage.load(self.filename)
+                    # Readers do not take the data lock, retry if a writer got in the way
+                    loaded_signature = storage.signature(self.filename)
+                    if loaded_signature == signature:
+                        break
+                    signature = loaded_signature
+
+            # Conversion of the stored records to models or columns, and indexing
+            with STAGE_SECONDS.time(stage="table_build"):
+                self._records.load(data)
+                self._max_id = self._records.max_id()
+                for index in self.indexes.values():
+                    index.rebuild(self._records.rows())
+        TABLE_RECORDS.set(len(self._records), table=self.filename)
+        self._version += 1
+        self._source = source
+        self._signature = signature
+        self._generation = generation
+
+    def snapshot(self) -> bytes:
+        """Return the up to date records and indexes pickled, with the signature of the stored table they reflect"""
+        with self._lock:
+            self._refresh()
+            state = (self._signature, self._max_id, self._records, self.indexes)
+            return pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def restore(self, snapshot: bytes) -> bool:
+        """Replace the records and indexes with a snapshot, unless the stored table changed since it was taken"""
+        with codec.paused_gc():
+            signature, max_id, records, indexes = pickle.loads(snapshot)
+        storage = get_storage()
+        with self._lock:
+            generation = generations.get(self.filename) if utils.CACHE_INVALIDATION == "generation" else None
+            if storage.signature(self.filename) != signature:
+                return False
+            self._records, self.indexes, self._max_id = records, indexes, max_id
+            TABLE_RECORDS.set(len(self._records), table=self.filename)
+            self._version += 1
+            self._source = (utils.DATA_DIR, storage)
+            self._signature = signature
+            self._generation = generation
+            return True
+
+    def _partition_keys(self, records: Iterable[BaseModel]) -> Set[str]:
+        """Return the partitions of the stored table holding the records, if partitioned"""
+        partitioning = get_storage().partitioning(self.filename)
+        return {partitioning.key(record) for record in records} if partitioning else set()
+
+    def _persist(self, events: List[dict], partition_keys: Set[str]) -> None:
+        """Write a batch of change events through to the storage backend"""
+        storage = get_storage()
+        self._version += 1
+        TABLE_RECORDS.set(len(self._records), table=self.filename)
+        partitioning = storage.partitioning(self.filename)
+        partitions = None
+        if partitioning is not None:
+            partitions = {
+                key: functools.partial(self._records.dump_between, partitioning.field, *partitioning.range(key))
+                for key in partition_keys
+            }
+        try:
+            with STAGE_SECONDS.time(stage="table_write"):
+                storage.write(self.filename, events, self._records.dump, partitions)
+        except Exception:
+            # Drop the unsaved changes, the next access reloads from disk
+            self._source = None
+            raise
+        self._signature = storage.signature(self.filename)
+        generation = generations.bump(self.filename)
+        if self._generation is not None:
+            self._generation = generation
+
+        if storage.needs_compaction(self.filename) and not self._compacting:
+            self._compacting = True
+            threading.Thread(target=self._compact_in_background, daemon=True).start()
+
+    def _compact_in_background(self) -> None:
+        try:
+            self.compact()
+        except Exception as e:
+            logger.error("Error compacting %s: %s", self.filename, e)
+        finally:
+            self._compacting = False
+
+    def compact(self) -> None:
+        """Fold the stored change events into a snapshot of the table"""
+        with data_lock(), self._lock:
+            self._refresh()
+            storage = get_storage()
+            storage.compact(self.filename, self._records.dump())
+            self._signature = storage.signature(self.filename)
+
+    @property
+    def version(self) -> int:
+        """Return the up to date version of the table"""
+        with self._lock:
+            self._refresh()
+            return self._version
+
+    def signature(self):
+        """Return the signature of the stored table the up to date records reflect"""
+        with self._lock:
+            self._refresh()
+            return self._signature
+
+    def query_index(self, name: str, function):
+        """Call `function` with an up to date index of the table, under the table lock.
+
+        Indexes are rebuilt in place by reloads, so they must not be read
+        outside the lock.
+        """
+        with self._lock:
+            self._refresh()
+            return function(self.indexes[name])
+
+    def all(self) -> List[BaseModel]:
+        """Return all the records"""
+        with self._lock:
+            self._refresh()
+            return self._records.models()
+
+    def query(self, function):
+        """Call `function` with the up to date record container, under the table lock"""
+        with self._lock:
+            self._refresh()
+            return function(self._records)
+
+    def get(self, record_id: int) -> Optional[BaseModel]:
+        """Return the record with the given ID, or None"""
+        with self._lock:
+            self._refresh()
+            return self._records.get(record_id)
+
+    def max_id(self) -> int:
+        """Return the highest ID of the stored records, deleted ones included since the last load"""
+        with self._lock:
+            self._refresh()
+            return self._max_id
+
+    def allocate_ids(self, count: int = 1, floor: int = 0) -> int:
+        """Reserve `count` new consecutive IDs above every stored ID and `floor`.
+
+        Returns the first one. IDs come from a persistent sequence, so they are
+        never reused, even after deleting the record holding the highest one.
+        """
+        with data_lock(), self._lock:
+            self._refresh()
+            return sequences.allocate(self.filename, max(self._max_id, floor), count)
+
+    def insert(self, record: BaseModel) -> BaseModel:
+        """Add a record and write it through to disk"""
+        with data_lock(), self._lock:
+            self._refresh()
+            self._records.put(record)
+            self._max_id = max(self._max_id, record.id)
+            for index in self.indexes.values():
+                index.add(record)
+            self._persist([{"op": "insert", "record": record.model_dump()}], self._partition_keys([record]))
+            return record
+
+    def insert_many(self, records: List[BaseModel]) -> List[BaseModel]:
+        """Add several records and write them through to disk in a single write"""
+        # Empty batches write nothing, so other workers have nothing to reload
+        if not records:
+            return records
+        with data_lock(), self._lock:
+            self._refresh()
+            for record in records:
+                self._records.put(record)
+                self._max_id = max(self._max_id, record.id)
+                for index in self.indexes.values():
+                    index.add(record)
+            self._persist(
+                [{"op": "insert", "record": record.model_dump()} for record in records], self._partition_keys(records)
+            )
+            return records
+
+    def update(self, record_id: int, **changes) -> Optional[BaseModel]:
+        """Apply field changes to a record and write them through to disk"""
+        with data_lock(), self._lock:
+            self._refresh()
+            record = self.get(record_id)
+            if record is None:
+                return None
+            partition_keys = self._partition_keys([record])
+            for index in self.indexes.values():
+                index.remove(record)
+            for field, value in changes.items():
+                setattr(record, field, value)
+            self._records.put(record)
+            for index in self.indexes.values():
+                index.add(record)
+            self._persist(
+                [{"op": "update", "id": record_id, "changes": changes}], partition_keys | self._partition_keys([record])
+            )
+            return record
+
+    def update_many(self, record_ids: List[int], **changes) -> List[BaseModel]:
+        """Apply the same field changes to several records in a single write"""
+        if not record_ids:
+            return []
+        with data_lock(), self._lock:
+            self._refresh()
+            records = [record for record in map(self.get, record_ids) if record is not None]
+            partition_keys = self._partition_keys(records)
+            for record in records:
+                for index in self.indexes.values():
+                    index.remove(record)
+                for field, value in changes.items():
+                    setattr(record, field, value)
+                self._records.put(record)
+                for index in self.indexes.values():
+                    index.add(record)
+            self._persist(
+                [{"op": "update", "id": record.id, "changes": changes} for record in records],
+                partition_keys | self._partition_keys(records)
+            )
+            return records
+
+    def delete(self, record_id: int) -> Optional[BaseModel]:
+        """Remove a record and write the change through to disk"""
+        with data_lock(), self._lock:
+            self._refresh()
+            record = self.get(record_id)
+            if record is None:
+                return None
+            self._records.remove(record_id)
+            for index in self.indexes.values():
+                index.remove(record)
+            self._persist([{"op": "delete", "id": record_id}], self._partition_keys([record]))
+            return record
+
+    def delete_many(self, record_ids: List[int]) -> List[BaseModel]:
+        """Remove several records in a single write"""
+        if not record_ids:
+            return []
+        with data_lock(), self._lock:
+            self._refresh()
+            records = [record for record in map(self.get, record_ids) if record is not None]
+            for record in records:
+                self._records.remove(record.id)
+                for index in self.indexes.values():
+                    index.remove(record)
+            self._persist([{"op": "delete", "id": record.id} for record in records], self._partition_keys(records))
+            return records
+
+
+def normalize_plate(plate: str) -> str:
+    """Return the form of a license plate used to compare plates: upper case, without spaces or dashes"""
+    return plate.replace(" ", "").replace("-", "").upper()
+
+
+cars_table = Table("cars.json", ModelRecords(Car), indexes={
+    "license_plate": UniqueIndex("license_plate", normalize=normalize_plate),
+    "status": FieldIndex("status"),
+    "brand": FieldIndex("brand", normalize=str.casefold),
+    "fuel_type": FieldIndex("fuel_type"),
+    "transmission": FieldIndex("transmission"),
+    "year": RangeIndex("year"),
+    "price": RangeIndex("price"),
+})
+bookings_table = Table("bookings.json", BookingColumns(), indexes={
+    "intervals": IntervalIndex(), "occupancy": OccupancyIndex(), "expiry": ExpiryIndex(), "customers": CustomerIndex()
+})
+# Cold storage of the finished bookings moved out of the bookings table, only loaded by the reports and the
+# booking history of the customers
+archived_bookings_table = Table("bookings_archive.json", BookingColumns(), indexes={
+    "occupancy": OccupancyIndex(), "customers": CustomerIndex()
+})
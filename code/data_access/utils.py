@@ -1,8 +1,11 @@
-import json
 import logging
+import os
+import tempfile
 from pathlib import Path
 from typing import List
 from pydantic import BaseModel
+from ..metrics import BYTES_READ, BYTES_WRITTEN, STAGE_SECONDS
+from . import codec
 
 
 logger = logging.getLogger(__name__)
@@ -10,38 +13,68 @@ logger = logging.getLogger(__name__)
 
 DATA_DIR = Path(__file__).parent.parent.parent / "data"
 
+# Storage backend of the data files: "json" rewrites the whole file on every
+# change, "log" appends each change to a log compacted in the background and
+# "sqlite" keeps the tables in an indexed SQLite database
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "json")
+
+# How workers notice the changes made by others: "signature" checks the stored
+# tables on every access, which also notices files edited outside the service,
+# "generation" only compares shared counters bumped by every write, much cheaper
+# when several workers serve the same data
+CACHE_INVALIDATION = os.environ.get("CACHE_INVALIDATION", "signature")
+
+@STAGE_SECONDS.time(stage="load_file")
 def _load_file(filename: str) -> list:
     """Load the data from the indicated JSON file"""
 
-    logger.info(f"Loading data from {filename}.")
+    logger.info("Loading data from %s.", filename)
 
     path = DATA_DIR / filename
     if not path.exists():
-        logger.warning(f"Path: {path} does not exist.")
+        logger.warning("Path: %s does not exist.", path)
         return []
 
     try:
-        with path.open("r", encoding="utf-8") as f:
-            data = json.load(f)
-            logger.info(f"Data from {filename} loaded successfully.")
-            return data
+        raw = path.read_bytes()
+        BYTES_READ.inc(len(raw), file=filename)
+        data = codec.loads(raw)
+        logger.info("Data from %s loaded successfully.", filename)
+        return data
     except Exception as e:
-        logger.error(f"Error loading data from {filename}: {e}")
+        logger.error("Error loading data from %s: %s", filename, e)
         return []
 
 
+@STAGE_SECONDS.time(stage="save_file")
 def _save_file(filename: str, data: list) -> None:
-    """Save the data on the indicated JSON file"""
+    """Save the data on the indicated JSON file.
+
+    The data is encoded as compact JSON and written to a temporary file that
+    then atomically replaces the original, so readers never see a partially
+    written file.
+    """
 
-    logger.info(f"Saving data on {filename}.")
+    logger.info("Saving data on %s.", filename)
 
     try:
-        DATA_DIR.mkdir(exist_ok=True)
         path = DATA_DIR / filename
+        path.parent.mkdir(parents=True, exist_ok=True)
 
-        with path.open("w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, default=str)
-        logger.info(f"Data saved on {filename}.")
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            raw = codec.dumps(data)
+            with os.fdopen(fd, "wb") as f:
+                f.write(raw)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        BYTES_WRITTEN.inc(len(raw), file=filename)
+        logger.info("Data saved on %s.", filename)
 
     except Exception as e:
-        logger.error(f"Error saving data on JSON: {e}")
\ No newline at end of file
+        logger.error("Error saving data on JSON: %s", e)
+        raise
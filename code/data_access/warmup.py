@@ -0,0 +1,135 @@
+"""Warm-up of the service at startup.
+
+The tables are loaded and indexed in the app lifespan, before the first
+request needs them, and the service only reports itself ready once they are.
+
+With `WARMUP_SNAPSHOTS=1`, the loaded records and indexes of every table are
+pickled to `<data dir>/.snapshots/` on shutdown, and the next startup restores
+them instead of parsing and indexing the stored tables, as long as neither
+the stored table nor the code changed meanwhile. Snapshots are unpickled, so
+the data folder must only be writable by the service. They can also be
+written ahead, e.g. right after a deployment, from the repository root:
+
+    python -m code.data_access.warmup
+"""
+import functools
+import logging
+import os
+import pickle
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict
+import pydantic
+from ..metrics import STAGE_SECONDS
+from .. import models
+from . import columnar, indexes, pricing, store, utils
+from .store import Table, archived_bookings_table, bookings_table, cars_table
+
+logger = logging.getLogger(__name__)
+
+# Whether the tables are restored from and saved to snapshots
+WARMUP_SNAPSHOTS = os.environ.get("WARMUP_SNAPSHOTS", "0") == "1"
+
+SNAPSHOT_DIR = ".snapshots"
+
+TABLES = [cars_table, bookings_table, archived_bookings_table]
+
+_ready = threading.Event()
+
+
+@functools.lru_cache(maxsize=None)
+def _code_version() -> int:
+    """Return a checksum of the code the pickled objects depend on"""
+    checksum = zlib.crc32(f"{sys.version_info[:2]} {pydantic.VERSION}".encode())
+    for module in (models, columnar, indexes, store):
+        checksum = zlib.crc32(Path(module.__file__).read_bytes(), checksum)
+    return checksum
+
+
+def _snapshot_path(table: Table) -> Path:
+    return utils.DATA_DIR / SNAPSHOT_DIR / f"{table.filename}.pickle"
+
+
+def _snapshot_key(table: Table) -> tuple:
+    return _code_version(), utils.STORAGE_BACKEND, table.filename
+
+
+def save_snapshot(table: Table) -> None:
+    """Write a snapshot of a table, loading it first if needed"""
+    path = _snapshot_path(table)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    snapshot = table.snapshot()
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            # The key comes first, so outdated snapshots are skipped without reading them
+            pickle.dump(_snapshot_key(table), f)
+            f.write(snapshot)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    logger.info("Saved a snapshot of %s (%s bytes).", table.filename, len(snapshot))
+
+
+def restore_snapshot(table: Table) -> bool:
+    """Restore a table from its snapshot, returning whether the snapshot was up to date"""
+    path = _snapshot_path(table)
+    try:
+        with path.open("rb") as f:
+            if pickle.load(f) != _snapshot_key(table):
+                logger.info("Ignoring the snapshot of %s, taken by another version of the code.", table.filename)
+                return False
+            restored = table.restore(f.read())
+    except FileNotFoundError:
+        return False
+    except Exception as e:
+        logger.warning("Ignoring the unreadable snapshot of %s: %s", table.filename, e)
+        return False
+
+    if not restored:
+        logger.info("Ignoring the snapshot of %s, the stored table changed since.", table.filename)
+    return restored
+
+
+@STAGE_SECONDS.time(stage="warm_up")
+def warm_up(snapshots: bool = WARMUP_SNAPSHOTS) -> Dict[str, str]:
+    """Load the tables and their indexes, returning whether each one came from its snapshot or the storage"""
+    sources = {}
+    for table in TABLES:
+        started = time.perf_counter()
+        if snapshots and restore_snapshot(table):
+            sources[table.filename] = "snapshot"
+        else:
+            # Reading the version loads the table
+            table.version
+            sources[table.filename] = "storage"
+        logger.info("Warmed up %s from its %s in %.3f s.", table.filename, sources[table.filename],
+                    time.perf_counter() - started)
+
+    # Imported and built on first use otherwise
+    columnar._numpy()
+    pricing.get_calendar()
+    _ready.set()
+    return sources
+
+
+def save_snapshots() -> None:
+    """Write a snapshot of every table"""
+    for table in TABLES:
+        save_snapshot(table)
+
+
+def is_ready() -> bool:
+    """Whether the warm-up is done"""
+    return _ready.is_set()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(warm_up())
+    save_snapshots()
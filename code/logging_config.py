@@ -0,0 +1,102 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+# Minimum level of the emitted messages
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+
+# "json" writes one JSON object per line, "text" the classic readable lines
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
+
+# Fraction of the hot-path messages (one per lookup) that are emitted, from 0 to 1
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", "1.0"))
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s  –  %(message)s"
+
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Format each record as a single line JSON object"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _RecordQueueHandler(QueueHandler):
+    """Queue handler that keeps the traceback apart from the message"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class SampledLogger(logging.LoggerAdapter):
+    """Logger emitting only a fraction of its messages, for the hot paths.
+
+    The sampling decision is taken before the record is built, so dropped
+    messages cost a single random draw. The rate is read from `LOG_SAMPLE_RATE`
+    on every call unless one is given.
+    """
+
+    def __init__(self, logger: logging.Logger, rate: Optional[float] = None):
+        super().__init__(logger, {})
+        self.rate = rate
+
+    def isEnabledFor(self, level: int) -> bool:
+        rate = LOG_SAMPLE_RATE if self.rate is None else self.rate
+        if rate < 1 and random.random() >= rate:
+            return False
+        return self.logger.isEnabledFor(level)
+
+
+def sampled(logger: logging.Logger, rate: Optional[float] = None) -> SampledLogger:
+    """Wrap a logger to sample its messages"""
+    return SampledLogger(logger, rate)
+
+
+def setup_logging() -> QueueListener:
+    """Route all the logging through a queue written by a background thread.
+
+    Request threads only put the records in the queue, the formatting and the
+    writes to stderr happen in the listener thread. Calling it again returns
+    the running listener.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+
+    records = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers = [_RecordQueueHandler(records)]
+    root.setLevel(LOG_LEVEL)
+
+    _listener = QueueListener(records, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
@@ -1,20 +1,82 @@
-from fastapi import FastAPI
-from .routers import cars, bookings
+import time
+
+# Start of the service, the startup metrics are measured from here
+started = time.perf_counter()
+
+from contextlib import asynccontextmanager
+import asyncio
+from fastapi import FastAPI, Response, status
+from .routers import cars, bookings, metrics, reports
+from .metrics import STARTUP_SECONDS, MetricsMiddleware
+from .logging_config import setup_logging
+from .data_access.lifecycle import run_scheduler
+from .data_access.warmup import WARMUP_SNAPSHOTS, is_ready, save_snapshots, warm_up
 import logging
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s %(name)s  –  %(message)s",
-)
+setup_logging()
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Car Rental Service API")
+# Seconds before retrying a failed warm-up, doubled by every failure up to the maximum
+WARMUP_RETRY_DELAY = 1.0
+WARMUP_MAX_RETRY_DELAY = 60.0
+
+async def _warm_up():
+    delay = WARMUP_RETRY_DELAY
+    while True:
+        try:
+            sources = await asyncio.to_thread(warm_up)
+            break
+        except Exception as e:
+            # Requests still load the tables on demand meanwhile
+            logger.error("Error warming up, retrying in %s s: %s", delay, e)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, WARMUP_MAX_RETRY_DELAY)
+    STARTUP_SECONDS.set(time.perf_counter() - started, phase="warm_up")
+    logger.info("Warm-up done in %.3f s: %s.", time.perf_counter() - started, sources)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the tables in the background, /ready answers 503 meanwhile
+    warming_up = asyncio.create_task(_warm_up())
+    # Complete and archive the ended bookings in the background while serving
+    scheduler = asyncio.create_task(run_scheduler())
+    yield
+    scheduler.cancel()
+    try:
+        await scheduler
+    except asyncio.CancelledError:
+        logger.info("Booking lifecycle scheduler stopped.")
+    warming_up.cancel()
+    try:
+        await warming_up
+    except asyncio.CancelledError:
+        logger.info("Warm-up stopped before the end.")
+    if WARMUP_SNAPSHOTS and is_ready():
+        try:
+            await asyncio.to_thread(save_snapshots)
+        except Exception as e:
+            logger.error("Error saving the table snapshots: %s", e)
+
+app = FastAPI(title="Car Rental Service API", lifespan=lifespan)
+app.add_middleware(MetricsMiddleware, started=started)
 
 # Include routers
 app.include_router(cars.router)
 app.include_router(bookings.router)
+app.include_router(reports.router)
+app.include_router(metrics.router)
 
 @app.get("/")
 async def root():
     logger.info("Root endpoint accessed.")
-    return {"status": "ok", "message": "Service up and running"}
\ No newline at end of file
+    return {"status": "ok", "message": "Service up and running"}
+
+@app.get("/ready")
+async def ready(response: Response):
+    """Whether the tables are loaded, the service answers without loading them first"""
+    if not is_ready():
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return {"status": "warming_up"}
+    return {"status": "ready"}
+
+STARTUP_SECONDS.set(time.perf_counter() - started, phase="import")
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List
 from datetime import date
 from enum import Enum
@@ -55,4 +55,80 @@ class Booking(BaseModel):
     status: Optional[BookingStatus] = Field(default=BookingStatus.active, description="Status of the booking")
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# Bulk operation results
+
+class BulkCarResult(BaseModel):
+    index: int = Field(..., description="Position of the car in the request")
+    success: bool = Field(..., description="Whether the car was created")
+    car: Optional[Car] = Field(None, description="Created car")
+    error: Optional[str] = Field(None, description="Reason why the car was rejected")
+
+class BulkBookingResult(BaseModel):
+    index: int = Field(..., description="Position of the booking in the request")
+    success: bool = Field(..., description="Whether the booking was created")
+    booking: Optional[Booking] = Field(None, description="Created booking")
+    error: Optional[str] = Field(None, description="Reason why the booking was rejected")
+
+# Pricing
+
+class Season(BaseModel):
+    start: str = Field(..., pattern=r"^\d{2}-\d{2}$", description="First day of the season, MM-DD")
+    end: str = Field(..., pattern=r"^\d{2}-\d{2}$", description="Last day of the season, MM-DD, may wrap to the next year")
+    multiplier: float = Field(..., gt=0, description="Factor applied to the daily price during the season")
+
+    @field_validator("start", "end")
+    @classmethod
+    def _check_day(cls, value: str) -> str:
+        month, day = map(int, value.split("-"))
+        try:
+            date(2000, month, day)
+        except ValueError:
+            raise ValueError(f"{value} is not a day of the year.")
+        return value
+
+class LongRentalDiscount(BaseModel):
+    min_days: int = Field(..., ge=1, description="Minimum rental days to get the discount")
+    discount: float = Field(..., ge=0, lt=1, description="Fraction taken off the price")
+
+class PricingRules(BaseModel):
+    seasons: List[Season] = Field(default_factory=list, description="Seasonal rates, the first matching season applies")
+    weekend_surcharge: float = Field(0.0, ge=0, description="Fraction added to the daily price on Saturdays and Sundays")
+    long_rental_discounts: List[LongRentalDiscount] = Field(
+        default_factory=list, description="Discounts by rental length, the longest reached applies"
+    )
+
+class Quote(BaseModel):
+    car_id: Optional[int] = Field(None, description="Quoted Car ID")
+    start_date: date = Field(..., description="Start date of the rental")
+    end_date: date = Field(..., description="End date of the rental")
+    total_days: int = Field(..., description="Rental days")
+    base_price: float = Field(..., description="Price of the days at the daily price of the car")
+    discount: float = Field(..., description="Long rental discount applied, as a fraction")
+    total_price: float = Field(..., description="Price with the seasonal rates, weekend surcharges and discount")
+
+# Reports
+
+class UtilizationPeriod(BaseModel):
+    period: str = Field(..., description="Day (YYYY-MM-DD) or month (YYYY-MM) of the period")
+    booked_days: int = Field(..., description="Car days booked in the period")
+    revenue: float = Field(..., description="Revenue of the booked days, from the booking prices")
+    utilization: float = Field(..., description="Booked car days over the car days of the period")
+
+class UtilizationReport(BaseModel):
+    start_date: date = Field(..., description="First day of the report")
+    end_date: date = Field(..., description="Day after the last day of the report")
+    granularity: str = Field(..., description="Length of the periods, day or month")
+    car_id: Optional[int] = Field(None, description="Reported car, the whole fleet if missing")
+    cars: int = Field(..., description="Number of cars the utilization is computed over")
+    booked_days: int = Field(..., description="Car days booked in the report")
+    revenue: float = Field(..., description="Revenue of the booked days")
+    utilization: float = Field(..., description="Booked car days over the car days of the report")
+    periods: List[UtilizationPeriod] = Field(..., description="Breakdown by period")
+
+class CarUtilization(BaseModel):
+    car_id: int = Field(..., description="Car ID")
+    booked_days: int = Field(..., description="Days the car is booked")
+    revenue: float = Field(..., description="Revenue of the booked days")
+    utilization: float = Field(..., description="Booked days over the days of the report")
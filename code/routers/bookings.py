@@ -1,6 +1,9 @@
-from fastapi import APIRouter, HTTPException, status
-from ..models import Booking
-from ..data_access.bookings import create_booking, delete_booking
+from fastapi import APIRouter, HTTPException, Query, Response, status
+from typing import List, Optional
+from datetime import date
+from ..models import Booking, BookingStatus, BulkBookingResult, Quote
+from ..data_access.async_access import create_booking, create_bookings, delete_booking, get_customer_bookings, get_quote
+from .cars import NEXT_PAGE_HEADER
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,30 +14,89 @@ router = APIRouter(prefix="/bookings", tags=["bookings"])
 async def create_booking_endpoint(booking: Booking):
     """Create a new booking"""
 
-    logger.info(f"POST /bookings/ endpoint called. Car: {booking.car_id}, Customer: {booking.customer_email}")
+    logger.info("POST /bookings/ endpoint called. Car: %s, Customer: %s", booking.car_id, booking.customer_email)
     try:
-        created_booking = create_booking(booking)
-        logger.info(f"Booking created successfully with ID: {created_booking.id}")
+        created_booking = await create_booking(booking)
+        logger.info("Booking created successfully with ID: %s", created_booking.id)
         return created_booking
     except ValueError as e:
-        logger.warning(f"Validation error creating booking: {str(e)}")
+        logger.warning("Validation error creating booking: %s", e)
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Error creating booking: {str(e)}")
+        logger.error("Error creating booking: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/bulk_new_bookings", response_model=List[BulkBookingResult])
+async def create_bookings_endpoint(bookings: List[Booking]):
+    """Create several bookings at once, reporting the result of each one"""
+
+    logger.info("POST /bookings/bulk_new_bookings endpoint called. Creating %s bookings.", len(bookings))
+    try:
+        results = await create_bookings(bookings)
+        logger.info("Bulk booking creation finished: %s of %s created.", sum(r.success for r in results), len(bookings))
+        return results
+    except Exception as e:
+        logger.error("Error creating bookings: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/by_customer", response_model=List[Booking])
+async def get_customer_bookings_endpoint(
+    response: Response,
+    email: str = Query(..., min_length=1, description="Email of the customer, case-insensitive"),
+    booking_status: Optional[BookingStatus] = Query(None, alias="status", description="Status of the bookings"),
+    limit: int = Query(100, gt=0, le=1000, description="Maximum number of bookings to return"),
+    after_id: Optional[int] = Query(None, description="Return only the bookings after this ID, to get the next page"),
+):
+    """Get the bookings of a customer, archived ones included.
+
+    Bookings are sorted by ID. When a full page of `limit` bookings is
+    returned, the `X-Next-After-Id` header holds the `after_id` of the next page.
+    """
+    logger.info("GET /bookings/by_customer endpoint called. Customer: %s", email)
+    try:
+        bookings = await get_customer_bookings(email, booking_status, after_id, limit)
+        if len(bookings) == limit:
+            response.headers[NEXT_PAGE_HEADER] = str(bookings[-1].id)
+        logger.info("Successfully returned %s bookings of customer %s.", len(bookings), email)
+        return bookings
+    except Exception as e:
+        logger.error("Error getting the bookings of a customer: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/quote", response_model=Quote)
+async def get_quote_endpoint(car_id: int, start: date, end: date):
+    """Price the rental of a car between two dates, following the pricing rules.
+
+    Quotes are cached by car and dates, so the booking form can ask for one
+    on every date change.
+    """
+    logger.info("GET /bookings/quote endpoint called. Car: %s, from %s to %s", car_id, start, end)
+    try:
+        quote = await get_quote(car_id, start, end)
+    except ValueError as e:
+        logger.warning("Validation error quoting a booking: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("Error quoting a booking: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if quote is None:
+        raise HTTPException(status_code=404, detail=f"Car with ID {car_id} not found.")
+    logger.info("Quoted %s€ for car %s.", quote.total_price, car_id)
+    return quote
+
 @router.delete("/delete_booking/{booking_id}")
 async def delete_booking_endpoint(booking_id: int):
     """Delete a booking and update car status to available"""
-    logger.info(f"DELETE /bookings/{booking_id} endpoint called.")
+    logger.info("DELETE /bookings/%s endpoint called.", booking_id)
     try:
-        success = delete_booking(booking_id)
+        success = await delete_booking(booking_id)
         if success:
-            logger.info(f"Booking {booking_id} deleted successfully.")
+            logger.info("Booking %s deleted successfully.", booking_id)
             return {"message": f"Booking {booking_id} deleted successfully."}
         else:
-            logger.warning(f"Booking {booking_id} not found.")
+            logger.warning("Booking %s not found.", booking_id)
             raise HTTPException(status_code=404, detail=f"Booking {booking_id} not found.")
     except Exception as e:
-        logger.error(f"Error deleting booking: {str(e)}")
+        logger.error("Error deleting booking: %s", e)
         raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
@@ -1,37 +1,231 @@
-from fastapi import APIRouter, HTTPException, status
-from typing import List
-from ..models import Car
-from ..data_access.cars import get_available_cars, create_car, get_car
+from collections import OrderedDict
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from typing import Hashable, List, Optional, Set, Tuple
+from datetime import date
+from ..models import BulkCarResult, Car, CarStatus, Fuel, Transmission
+from ..data_access.async_access import (
+    get_available_cars, get_cars_available_between, get_cars_version, create_car, create_cars,
+    get_car_by_plate, search_cars
+)
+from ..data_access.cars import iter_available_cars
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/cars", tags=["cars"])
 
+NEXT_PAGE_HEADER = "X-Next-After-Id"
+_cars_adapter = TypeAdapter(List[Car])
+
+
+class _ResponseCache:
+    """Serialized listings of one version of the cars, keyed by the query parameters.
+
+    Entries are dropped as soon as a request sees another version. The
+    endpoints run on the event loop thread, so no locking is needed.
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._version: Optional[str] = None
+        self._entries: "OrderedDict[Hashable, Tuple[bytes, dict]]" = OrderedDict()
+
+    def get(self, version: str, key: Hashable) -> Optional[Tuple[bytes, dict]]:
+        if version != self._version:
+            self._version = version
+            self._entries.clear()
+            return None
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, version: str, key: Hashable, entry: Tuple[bytes, dict]) -> None:
+        if version != self._version:
+            return
+        self._entries[key] = entry
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+_listings = _ResponseCache()
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches the ETag, weak tags included"""
+    if if_none_match is None:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag in tags
+
+
+def _parse_fields(fields: Optional[str]) -> Optional[Set[str]]:
+    """Parse a comma separated list of car fields to return, the ID is always included"""
+    if fields is None:
+        return None
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - set(Car.model_fields)
+    if unknown:
+        raise ValueError(f"Unknown car fields: {', '.join(sorted(unknown))}.")
+    return requested | {"id"}
+
+
 @router.get("/list_availables", response_model=List[Car])
-async def get_available_cars_endpoint():
-    """Get all cars that are available for booking"""
-    logger.info("GET /cars/available endpoint called")
+async def get_available_cars_endpoint(
+    request: Request,
+    limit: Optional[int] = Query(None, gt=0, description="Maximum number of cars to return"),
+    after_id: Optional[int] = Query(None, description="Return only the cars after this ID, to get the next page"),
+    fields: Optional[str] = Query(None, description="Comma separated car fields to return, all by default"),
+    output: str = Query("json", alias="format", pattern="^(json|ndjson)$", description="JSON list or streamed NDJSON"),
+):
+    """Get all cars that are available for booking.
+
+    Cars are sorted by ID. When a full page of `limit` cars is returned, the
+    `X-Next-After-Id` header holds the `after_id` of the next page.
+
+    The `ETag` header holds the version of the cars. Requests sending it back
+    in `If-None-Match` get an empty 304 response while no car has changed, and
+    JSON listings are served from a cache of serialized responses meanwhile.
+    """
+    logger.info("GET /cars/list_availables endpoint called")
+    try:
+        include = _parse_fields(fields)
+    except ValueError as e:
+        logger.warning("Validation error getting available cars. %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
+
     try:
-        available_cars = get_available_cars()
-        logger.info(f"Successfully returned {len(available_cars)} available cars.")
+        # Read before the cars, so a concurrent change can only make the tag older than the data
+        version = await get_cars_version()
+        etag = f'"{version}"'
+        cache_headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            logger.info("Available cars not modified since version %s.", version)
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+
+        if output == "ndjson":
+            lines = (car.model_dump_json(include=include) + "\n" for car in iter_available_cars(after_id, limit))
+            logger.info("Streaming available cars.")
+            return StreamingResponse(lines, media_type="application/x-ndjson", headers=cache_headers)
+
+        key = (after_id, limit, frozenset(include) if include else None)
+        cached = _listings.get(version, key)
+        if cached is None:
+            available_cars = await get_available_cars(after_id, limit)
+            headers = {}
+            if limit is not None and len(available_cars) == limit:
+                headers[NEXT_PAGE_HEADER] = str(available_cars[-1].id)
+            content = _cars_adapter.dump_json(available_cars, include={"__all__": include} if include else None)
+            cached = (content, headers)
+            _listings.put(version, key, cached)
+            logger.info("Successfully returned %s available cars.", len(available_cars))
+        else:
+            logger.info("Returned cached available cars of version %s.", version)
+        content, headers = cached
+        return Response(content=content, media_type="application/json", headers={**headers, **cache_headers})
+    except Exception as e:
+        logger.error("Error getting available cars. %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/available", response_model=List[Car])
+async def get_cars_available_between_endpoint(
+    start: date,
+    end: date,
+    fuel_type: Optional[Fuel] = None,
+    transmission: Optional[Transmission] = None,
+    max_price: Optional[float] = Query(None, gt=0),
+):
+    """Get all cars that can be booked between two dates"""
+    logger.info("GET /cars/available endpoint called. From %s to %s.", start, end)
+    try:
+        available_cars = await get_cars_available_between(start, end, fuel_type, transmission, max_price)
+        logger.info("Successfully returned %s cars available between dates.", len(available_cars))
         return available_cars
+    except ValueError as e:
+        logger.warning("Validation error searching available cars. %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("Error searching available cars. %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/search", response_model=List[Car])
+async def search_cars_endpoint(
+    response: Response,
+    brand: Optional[str] = Query(None, min_length=1, description="Brand of the cars, case-insensitive"),
+    fuel_type: Optional[Fuel] = None,
+    transmission: Optional[Transmission] = None,
+    car_status: Optional[CarStatus] = Query(None, alias="status", description="Status of the cars"),
+    min_year: Optional[int] = None,
+    max_year: Optional[int] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    limit: Optional[int] = Query(None, gt=0, description="Maximum number of cars to return"),
+    after_id: Optional[int] = Query(None, description="Return only the cars after this ID, to get the next page"),
+):
+    """Search the cars by attributes, whatever their status unless `status` is given.
+
+    Cars are sorted by ID and paged like `/cars/list_availables`.
+    """
+    logger.info("GET /cars/search endpoint called.")
+    try:
+        cars = await search_cars(brand, fuel_type, transmission, car_status, min_year, max_year,
+                                 min_price, max_price, after_id, limit)
+        if limit is not None and len(cars) == limit:
+            response.headers[NEXT_PAGE_HEADER] = str(cars[-1].id)
+        logger.info("Successfully returned %s cars.", len(cars))
+        return cars
+    except ValueError as e:
+        logger.warning("Validation error searching cars. %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Error getting available cars. {str(e)}")
+        logger.error("Error searching cars. %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/by_plate/{plate}", response_model=Car)
+async def get_car_by_plate_endpoint(plate: str):
+    """Get a car by license plate, ignoring case, spaces and dashes"""
+    logger.info("GET /cars/by_plate/%s endpoint called.", plate)
+    try:
+        car = await get_car_by_plate(plate)
+    except Exception as e:
+        logger.error("Error getting car by license plate. %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if car is None:
+        raise HTTPException(status_code=404, detail=f"Car with license plate {plate} not found.")
+    logger.info("Successfully returned car %s.", car.id)
+    return car
+
+
 @router.post("/new_car", response_model=Car, status_code=status.HTTP_201_CREATED)
 async def create_car_endpoint(car: Car):
     """Create a new car"""
-    logger.info(f"POST /cars/new_car endpoint called. Creating car: {car.brand} {car.model}")
+    logger.info("POST /cars/new_car endpoint called. Creating car: %s %s", car.brand, car.model)
     try:
-        created_car = create_car(car)
-        logger.info(f"Car created successfully with ID: {created_car.id}")
+        created_car = await create_car(car)
+        logger.info("Car created successfully with ID: %s", created_car.id)
         return created_car
     except ValueError as e:
-        logger.warning(f"Validation error creating car. {str(e)}")
+        logger.warning("Validation error creating car. %s", e)
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Error creating car. {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        logger.error("Error creating car. %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/bulk_new_cars", response_model=List[BulkCarResult])
+async def create_cars_endpoint(cars: List[Car]):
+    """Create several cars at once, reporting the result of each one"""
+    logger.info("POST /cars/bulk_new_cars endpoint called. Creating %s cars.", len(cars))
+    try:
+        results = await create_cars(cars)
+        logger.info("Bulk car creation finished: %s of %s created.", sum(r.success for r in results), len(cars))
+        return results
+    except Exception as e:
+        logger.error("Error creating cars. %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,9 @@
+from fastapi import APIRouter, Response
+from ..metrics import CONTENT_TYPE, render
+
+router = APIRouter(tags=["metrics"])
+
+@router.get("/metrics")
+async def metrics_endpoint():
+    """Export the service metrics in the Prometheus text format"""
+    return Response(content=render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,47 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Optional
+from datetime import date
+from ..models import CarUtilization, UtilizationReport
+from ..data_access.async_access import get_cars_utilization, get_utilization
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/reports", tags=["reports"])
+
+
+@router.get("/utilization", response_model=UtilizationReport)
+async def get_utilization_endpoint(
+    start: date,
+    end: date,
+    granularity: str = Query("day", pattern="^(day|month)$", description="Length of the periods, day or month"),
+    car_id: Optional[int] = Query(None, description="Report only this car, the whole fleet by default"),
+):
+    """Get the booked days, revenue and utilization between two dates, by day or month.
+
+    Active and completed bookings count, with their price spread evenly over
+    their days. Fleet utilization is over the current number of cars.
+    """
+    logger.info("GET /reports/utilization endpoint called. From %s to %s.", start, end)
+    try:
+        return await get_utilization(start, end, granularity, car_id)
+    except ValueError as e:
+        logger.warning("Validation error computing utilization. %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("Error computing utilization. %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/utilization/cars", response_model=List[CarUtilization])
+async def get_cars_utilization_endpoint(start: date, end: date):
+    """Get the booked days, revenue and utilization of every car between two dates"""
+    logger.info("GET /reports/utilization/cars endpoint called. From %s to %s.", start, end)
+    try:
+        return await get_cars_utilization(start, end)
+    except ValueError as e:
+        logger.warning("Validation error computing utilization of the cars. %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("Error computing utilization of the cars. %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,6 +1,7 @@
 import pytest
 from fastapi.testclient import TestClient
 from code.main import app
+from tests.helpers import SAMPLE_CAR_DATA
 import code.data_access.utils as utils
 import tempfile
 import shutil
@@ -25,15 +26,7 @@ def temp_data_dir(tmp_path, monkeypatch):
 @pytest.fixture
 def sample_car_data():
     """Sample car data for tests"""
-    return {
-        "brand": "Toyota",
-        "model": "Model_5",
-        "year": 2020,
-        "license_plate": "1234YYY",
-        "fuel_type": "Gasoline",
-        "transmission": "Automatic",
-        "price": 50.0
-    }
+    return dict(SAMPLE_CAR_DATA)
 
 @pytest.fixture
 def sample_booking_data():
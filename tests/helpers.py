@@ -0,0 +1,15 @@
+from code.models import Car
+
+SAMPLE_CAR_DATA = {
+    "brand": "Toyota",
+    "model": "Model_5",
+    "year": 2020,
+    "license_plate": "1234YYY",
+    "fuel_type": "Gasoline",
+    "transmission": "Automatic",
+    "price": 50.0
+}
+
+def make_car(**fields):
+    """Sample car for tests, with the given fields changed"""
+    return Car(**{**SAMPLE_CAR_DATA, **fields})
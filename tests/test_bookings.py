@@ -4,6 +4,7 @@ from datetime import date, timedelta
 from code.models import Booking, BookingStatus, Car, CarStatus
 from code.data_access.cars import create_car, get_car
 from code.data_access.bookings import create_booking, delete_booking, compute_days_price, is_car_available
+from code.data_access.store import archived_bookings_table, bookings_table, cars_table
 
 class TestBookingsEndpoints:
     """Tests for booking endpoints"""
@@ -102,6 +103,88 @@ class TestBookingsEndpoints:
         assert response.status_code == 200
         assert "deleted successfully" in response.json()["message"]
     
+    def test_bulk_new_bookings(self, client, sample_car_data):
+        """Creating several bookings at once, with conflicts inside the batch"""
+        # Create two cars
+        car_ids = []
+        for plate in ("1234YYY", "5678ZZZ"):
+            response = client.post("/cars/new_car", json={**sample_car_data, "license_plate": plate})
+            assert response.status_code == 201
+            car_ids.append(response.json()["id"])
+        
+        start = date.today() + timedelta(days=10)
+        def booking(car_id, start_date):
+            return {
+                "car_id": car_id,
+                "customer_email": "test@example.com",
+                "start_date": str(start_date),
+                "end_date": str(start_date + timedelta(days=2))
+            }
+        
+        bookings = [
+            booking(car_ids[0], start),
+            booking(car_ids[0], start + timedelta(days=1)),
+            booking(500, start),
+            booking(car_ids[1], start),
+        ]
+        response = client.post("/bookings/bulk_new_bookings", json=bookings)
+        assert response.status_code == 200
+        
+        results = response.json()
+        assert [r["success"] for r in results] == [True, False, False, True]
+        assert "item 0 of the batch" in results[1]["error"]
+        assert "not found" in results[2]["error"]
+        assert results[0]["booking"]["id"] == 1
+        assert results[3]["booking"]["id"] == 2
+        assert results[3]["booking"]["total_price"] == 100.0
+        
+        # Both cars are rented now
+        assert client.get("/cars/list_availables").json() == []
+
+        # A batch rejected as a whole writes nothing
+        versions = bookings_table.version, cars_table.version
+        response = client.post("/bookings/bulk_new_bookings", json=[booking(car_ids[0], start), booking(500, start)])
+        assert [r["success"] for r in response.json()] == [False, False]
+        assert (bookings_table.version, cars_table.version) == versions
+    
+
+    def test_bookings_by_customer(self, client):
+        """Getting the bookings of a customer one page at a time, archived ones included"""
+        start = date.today() + timedelta(days=1)
+
+        def booking(booking_id, email, status=BookingStatus.active):
+            return Booking(
+                id=booking_id, car_id=booking_id, customer_email=email, start_date=start,
+                end_date=start + timedelta(days=2), total_days=2, total_price=100.0, status=status
+            )
+
+        bookings_table.insert_many([
+            booking(1, "ana@example.com"),
+            booking(2, "bob@example.com"),
+            booking(3, "Ana@Example.com", BookingStatus.cancelled),
+            booking(5, "ana@example.com"),
+        ])
+        archived_bookings_table.insert(booking(4, "ana@example.com", BookingStatus.completed))
+
+        response = client.get("/bookings/by_customer", params={"email": "ANA@example.com"})
+        assert response.status_code == 200
+        assert [b["id"] for b in response.json()] == [1, 3, 4, 5]
+        assert "X-Next-After-Id" not in response.headers
+
+        response = client.get("/bookings/by_customer", params={"email": "ana@example.com", "limit": 2, "after_id": 1})
+        assert [b["id"] for b in response.json()] == [3, 4]
+        assert response.headers["X-Next-After-Id"] == "4"
+
+        response = client.get("/bookings/by_customer", params={"email": "ana@example.com", "status": "Active"})
+        assert [b["id"] for b in response.json()] == [1, 5]
+
+        # The index follows status changes and deletions
+        bookings_table.update(1, status=BookingStatus.cancelled)
+        delete_booking(5)
+        response = client.get("/bookings/by_customer", params={"email": "ana@example.com", "status": "Cancelled"})
+        assert [b["id"] for b in response.json()] == [1, 3]
+        response = client.get("/bookings/by_customer", params={"email": "ana@example.com", "status": "Active"})
+        assert response.json() == []
 
 class TestBookingsDataAccess:
     """Tests for booking data access functions"""
@@ -140,6 +223,38 @@ class TestBookingsDataAccess:
         is_available = is_car_available(car_id, start_date, end_date)
         assert is_available == True
     
+    def test_car_not_available_with_overlapping_booking(self, temp_data_dir):
+        """Car availability with an existing booking"""
+        # Create a car
+        car = Car(
+            brand="Toyota",
+            model="Model_5",
+            year=2020,
+            license_plate="1234YYY",
+            fuel_type="Gasoline",
+            transmission="Automatic",
+            price=50.0
+        )
+        created_car = create_car(car)
+        
+        # Create booking
+        start_date = date.today() + timedelta(days=10)
+        end_date = start_date + timedelta(days=5)
+        booking = Booking(
+            car_id=created_car.id,
+            customer_email="test@example.com",
+            start_date=start_date,
+            end_date=end_date
+        )
+        created_booking = create_booking(booking)
+        
+        assert not is_car_available(created_car.id, start_date + timedelta(days=2), end_date + timedelta(days=2))
+        assert is_car_available(created_car.id, end_date, end_date + timedelta(days=2))
+        
+        # Deleting the booking frees the dates
+        delete_booking(created_booking.id)
+        assert is_car_available(created_car.id, start_date, end_date)
+    
     def test_create_booking_default_status(self, temp_data_dir):
         """Create booking with default status when not provided"""
         # Create a car
@@ -1,7 +1,13 @@
+import json
 import pytest
+from datetime import date, timedelta
 from fastapi.testclient import TestClient
 from code.models import Car, CarStatus
-from code.data_access.cars import create_car, get_available_cars, get_car
+from code.data_access.cars import create_car, get_available_cars, get_car, iter_available_cars, update_car_status
+from code.routers import cars as cars_router
+from code.data_access import async_access, cars as cars_access
+from code.data_access.store import cars_table
+import asyncio
 
 class TestCarsEndpoints:
     """Tests for cars endpoints"""
@@ -26,6 +32,168 @@ class TestCarsEndpoints:
         assert cars[0]["brand"] == sample_car_data["brand"]
         assert cars[0]["status"] == "Available"
     
+    def test_available_cars_pagination(self, client, sample_car_data):
+        """Getting available cars one page at a time"""
+        cars = [{**sample_car_data, "license_plate": f"{number:04d}YYY"} for number in range(5)]
+        response = client.post("/cars/bulk_new_cars", json=cars)
+        assert response.status_code == 200
+        
+        response = client.get("/cars/list_availables", params={"limit": 2})
+        assert [car["id"] for car in response.json()] == [1, 2]
+        assert response.headers["X-Next-After-Id"] == "2"
+        
+        response = client.get("/cars/list_availables", params={"limit": 2, "after_id": 4})
+        assert [car["id"] for car in response.json()] == [5]
+        assert "X-Next-After-Id" not in response.headers
+    
+    def test_available_cars_fields(self, client, sample_car_data):
+        """Getting only some fields of the available cars"""
+        response = client.post("/cars/new_car", json=sample_car_data)
+        assert response.status_code == 201
+        
+        response = client.get("/cars/list_availables", params={"fields": "brand,price"})
+        assert response.status_code == 200
+        assert response.json() == [{"id": 1, "brand": "Toyota", "price": 50.0}]
+        
+        response = client.get("/cars/list_availables", params={"fields": "brand,color"})
+        assert response.status_code == 400
+        assert "color" in response.json()["detail"]
+    
+    def test_available_cars_ndjson(self, client, sample_car_data):
+        """Streaming the available cars as NDJSON"""
+        cars = [{**sample_car_data, "license_plate": f"{number:04d}YYY"} for number in range(3)]
+        response = client.post("/cars/bulk_new_cars", json=cars)
+        assert response.status_code == 200
+        
+        response = client.get("/cars/list_availables", params={"format": "ndjson", "after_id": 1, "fields": "model"})
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert lines == [{"id": 2, "model": "Model_5"}, {"id": 3, "model": "Model_5"}]
+
+    def test_available_cars_stream_in_chunks(self, sample_car_data, monkeypatch):
+        """Streamed cars are fetched chunk by chunk, following the page bounds"""
+        monkeypatch.setattr(cars_access, "STREAM_CHUNK_SIZE", 2)
+        for number in range(6):
+            create_car(Car(**{**sample_car_data, "license_plate": f"{number:04d}YYY"}))
+        update_car_status(3, CarStatus.out_of_service)
+
+        assert [car.id for car in iter_available_cars()] == [1, 2, 4, 5, 6]
+        assert [car.id for car in iter_available_cars(after_id=1, limit=3)] == [2, 4, 5]
+        assert [car.id for car in iter_available_cars(limit=0)] == []
+
+    def test_available_cars_etag(self, client, sample_car_data, monkeypatch):
+        """Unchanged cars are answered with 304 or from the cache of serialized listings"""
+        response = client.post("/cars/new_car", json=sample_car_data)
+        car_id = response.json()["id"]
+        response = client.get("/cars/list_availables")
+        etag = response.headers["ETag"]
+
+        response = client.get("/cars/list_availables", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+
+        async def fail(*args):
+            raise AssertionError("The cars were listed again")
+        with monkeypatch.context() as patch:
+            patch.setattr(cars_router, "get_available_cars", fail)
+            response = client.get("/cars/list_availables")
+        assert response.status_code == 200
+        assert response.json()[0]["id"] == car_id
+
+        update_car_status(car_id, CarStatus.maintenance)
+        response = client.get("/cars/list_availables", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.json() == []
+        assert response.headers["ETag"] != etag
+
+    def test_etag_shared_by_workers(self, client, sample_car_data, monkeypatch):
+        """Workers holding the same cars send the same ETag"""
+        client.post("/cars/new_car", json=sample_car_data)
+        etag = client.get("/cars/list_availables").headers["ETag"]
+
+        # Reloading the table, as another worker does, bumps its local version only
+        version = cars_table.version
+        monkeypatch.setattr(cars_table, "_source", None)
+        assert cars_table.version != version
+        response = client.get("/cars/list_availables", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+
+    def test_cars_available_between_dates(self, client, sample_car_data):
+        """Getting cars available between dates, excluding booked ones"""
+        # Create two cars, the second one electric and more expensive
+        response = client.post("/cars/new_car", json=sample_car_data)
+        assert response.status_code == 201
+        booked_car_id = response.json()["id"]
+        sample_car_data.update(license_plate="5678ZZZ", fuel_type="Electric", price=80.0)
+        response = client.post("/cars/new_car", json=sample_car_data)
+        assert response.status_code == 201
+        free_car_id = response.json()["id"]
+        
+        # Book the first car
+        start = date.today() + timedelta(days=10)
+        end = start + timedelta(days=3)
+        response = client.post("/bookings/new_booking", json={
+            "car_id": booked_car_id,
+            "customer_email": "test@example.com",
+            "start_date": str(start),
+            "end_date": str(end)
+        })
+        assert response.status_code == 201
+        
+        params = {"start": str(start + timedelta(days=1)), "end": str(end + timedelta(days=1))}
+        response = client.get("/cars/available", params=params)
+        assert response.status_code == 200
+        assert [car["id"] for car in response.json()] == [free_car_id]
+        
+        # Filters
+        response = client.get("/cars/available", params={**params, "fuel_type": "Gasoline"})
+        assert response.json() == []
+        response = client.get("/cars/available", params={**params, "max_price": 50})
+        assert response.json() == []
+        response = client.get("/cars/available", params={**params, "transmission": "Automatic", "max_price": 80})
+        assert [car["id"] for car in response.json()] == [free_car_id]
+    
+    def test_search_cars(self, client, sample_car_data):
+        """Searching cars by several attributes, following status changes"""
+        cars = [
+            sample_car_data,
+            {**sample_car_data, "license_plate": "2222YYY", "brand": "Seat", "year": 2018, "price": 35.0},
+            {**sample_car_data, "license_plate": "3333YYY", "fuel_type": "Electric", "year": 2023, "price": 90.0},
+            {**sample_car_data, "license_plate": "4444YYY", "transmission": "Manual", "year": 2015, "price": 25.0},
+        ]
+        response = client.post("/cars/bulk_new_cars", json=cars)
+        assert response.status_code == 200
+
+        def search(**params):
+            response = client.get("/cars/search", params=params)
+            assert response.status_code == 200
+            return [car["id"] for car in response.json()]
+
+        assert search() == [1, 2, 3, 4]
+        assert search(brand="toyota") == [1, 3, 4]
+        assert search(brand="toyota", min_year=2016) == [1, 3]
+        assert search(min_price=30, max_price=60) == [1, 2]
+        assert search(fuel_type="Gasoline", transmission="Automatic", max_year=2020) == [1, 2]
+        assert search(brand="Renault") == []
+
+        response = client.get("/cars/search", params={"limit": 2, "after_id": 1})
+        assert [car["id"] for car in response.json()] == [2, 3]
+        assert response.headers["X-Next-After-Id"] == "3"
+
+        update_car_status(1, CarStatus.maintenance)
+        assert search(status="Available", brand="Toyota") == [3, 4]
+        assert search(status="Maintenance") == [1]
+
+        response = client.get("/cars/search", params={"min_year": 2020, "max_year": 2010})
+        assert response.status_code == 400
+
+    def test_cars_available_invalid_dates(self, client):
+        """Getting cars available with end date before start date"""
+        response = client.get("/cars/available", params={"start": "2030-01-10", "end": "2030-01-05"})
+        assert response.status_code == 400
+        assert "before end date" in response.json()["detail"]
+    
     def test_create_car_success(self, client, sample_car_data):
         """Creating a car successfully"""
         response = client.post("/cars/new_car", json=sample_car_data)
@@ -50,6 +218,57 @@ class TestCarsEndpoints:
         assert response.status_code == 400
         assert "already registered" in response.json()["detail"]
     
+    def test_bulk_new_cars(self, client, sample_car_data):
+        """Creating several cars at once"""
+        response = client.post("/cars/new_car", json={**sample_car_data, "id": 2, "license_plate": "0000YYY"})
+        assert response.status_code == 201
+        
+        cars = [
+            sample_car_data,
+            {**sample_car_data, "id": 2, "license_plate": "0002YYY"},
+            {**sample_car_data, "id": 5, "license_plate": "0005YYY"},
+            {**sample_car_data, "id": 5, "license_plate": "0055YYY"},
+            {**sample_car_data, "license_plate": "0006YYY"},
+        ]
+        response = client.post("/cars/bulk_new_cars", json=cars)
+        assert response.status_code == 200
+        
+        results = response.json()
+        assert [r["success"] for r in results] == [True, False, True, False, True]
+        assert [r["car"]["id"] for r in results if r["success"]] == [6, 5, 7]
+        assert "already registered" in results[1]["error"]
+        assert len(client.get("/cars/list_availables").json()) == 4
+    
+    def test_car_duplicate_plate(self, client, sample_car_data):
+        """Creating cars with a license plate already registered, ignoring case, spaces and dashes"""
+        response = client.post("/cars/new_car", json=sample_car_data)
+        assert response.status_code == 201
+        
+        response = client.post("/cars/new_car", json={**sample_car_data, "license_plate": "1234-yyy"})
+        assert response.status_code == 400
+        assert "already registered" in response.json()["detail"]
+        
+        cars = [
+            {**sample_car_data, "license_plate": "1234 YYY"},
+            {**sample_car_data, "license_plate": "5678ZZZ"},
+            {**sample_car_data, "license_plate": "5678zzz"},
+        ]
+        response = client.post("/cars/bulk_new_cars", json=cars)
+        assert [r["success"] for r in response.json()] == [False, True, False]
+        assert "License plate" in response.json()[2]["error"]
+    
+    def test_get_car_by_plate(self, client, sample_car_data):
+        """Getting a car by license plate, ignoring case, spaces and dashes"""
+        response = client.post("/cars/new_car", json=sample_car_data)
+        car_id = response.json()["id"]
+        
+        response = client.get("/cars/by_plate/1234-yyy")
+        assert response.status_code == 200
+        assert response.json()["id"] == car_id
+        
+        response = client.get("/cars/by_plate/9999ZZZ")
+        assert response.status_code == 404
+    
     def test_car_invalid_data(self, client):
         """Creating a car with invalid data"""
         invalid_data = {
@@ -103,4 +322,19 @@ class TestCarsDataAccess:
         available_cars = get_available_cars()
         assert len(available_cars) == 1
         assert available_cars[0].status == CarStatus.available
-    
\ No newline at end of file
+
+    def test_async_create_and_get_car(self, temp_data_dir):
+        """Async wrappers run the data access functions"""
+        car_data = Car(
+            brand="Toyota",
+            model="Model_5",
+            year=2020,
+            license_plate="1234YYY",
+            fuel_type="Gasoline",
+            transmission="Automatic",
+            price=50.0
+        )
+        
+        created_car = asyncio.run(async_access.create_car(car_data))
+        found_car = asyncio.run(async_access.get_car(created_car.id))
+        assert found_car.license_plate == "1234YYY"
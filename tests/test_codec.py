@@ -0,0 +1,41 @@
+import pytest
+from datetime import date
+from code.models import BookingStatus, Car
+from code.data_access import codec, utils
+from code.data_access.store import ModelRecords
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def encoder(request, monkeypatch):
+    """JSON codec, with and without orjson"""
+    if request.param == "stdlib":
+        monkeypatch.setattr(codec, "orjson", None)
+    elif codec.orjson is None:
+        pytest.skip("orjson is not installed")
+    return request.param
+
+class TestCodec:
+    """Tests for the JSON codec of the data files"""
+
+    def test_compact_round_trip(self, encoder, temp_data_dir):
+        """Dates and enums are stored as strings in compact JSON"""
+        data = [{"id": 1, "start_date": date(2030, 1, 10), "status": BookingStatus.active, "email": "ñ@example.com"}]
+        utils._save_file("bookings.json", data)
+
+        raw = (temp_data_dir / "bookings.json").read_bytes()
+        assert b"\n" not in raw and b", " not in raw
+        assert utils._load_file("bookings.json") == [
+            {"id": 1, "start_date": "2030-01-10", "status": "Active", "email": "ñ@example.com"}
+        ]
+
+    def test_model_records_round_trip(self, encoder):
+        """Cars dumped as a whole list load back as equal models"""
+        records = ModelRecords(Car)
+        records.load([{
+            "id": 1, "brand": "Toyota", "model": "Model_5", "year": 2020, "license_plate": "1234YYY",
+            "fuel_type": "Gasoline", "transmission": "Automatic", "price": 50.0, "status": "Rented"
+        }])
+
+        reloaded = ModelRecords(Car)
+        reloaded.load(codec.loads(codec.dumps(records.dump())))
+        assert reloaded.models() == records.models()
+        assert reloaded.get(1).status.value == "Rented"
@@ -0,0 +1,57 @@
+import pytest
+from datetime import date
+from code.models import Booking, BookingStatus
+from code.data_access import columnar
+from code.data_access.columnar import BookingColumns
+
+@pytest.fixture(params=["numpy", "fallback"])
+def columns(request, monkeypatch):
+    """Booking columns, with and without NumPy"""
+    if request.param == "fallback":
+        monkeypatch.setattr(columnar, "_numpy", lambda: None)
+    elif columnar._numpy() is None:
+        pytest.skip("NumPy is not installed")
+
+    columns = BookingColumns()
+    columns.load([
+        {"id": 1, "car_id": 1, "customer_email": "a@example.com", "start_date": "2030-01-10",
+         "end_date": "2030-01-15", "total_days": 5.0, "total_price": 100.0, "status": "Active"},
+        {"id": 2, "car_id": 2, "customer_email": "b@example.com", "start_date": "2030-01-01",
+         "end_date": "2030-02-01", "total_days": 31.0, "total_price": 620.0, "status": "Active"},
+        {"id": 3, "car_id": 1, "customer_email": "a@example.com", "start_date": "2030-01-20",
+         "end_date": "2030-01-25", "total_days": None, "total_price": None, "status": "Cancelled"},
+    ])
+    return columns
+
+class TestBookingColumns:
+    """Tests for the columnar booking store"""
+
+    def test_models_at_boundary(self, columns):
+        """Bookings are rebuilt as models with their original values"""
+        booking = columns.get(3)
+        assert isinstance(booking, Booking)
+        assert booking.start_date == date(2030, 1, 20)
+        assert booking.status == BookingStatus.cancelled
+        assert booking.total_price is None
+        assert columns.get(4) is None
+        assert [b.id for b in columns.models()] == [1, 2, 3]
+
+    def test_put_and_remove(self, columns):
+        """Rows are overwritten in place and deleted by moving the last row"""
+        booking = columns.get(1)
+        booking.status = BookingStatus.completed
+        columns.put(booking)
+        assert columns.get(1).status == BookingStatus.completed
+
+        columns.remove(1)
+        assert len(columns) == 2
+        assert columns.get(1) is None
+        assert columns.get(3).customer_email == "a@example.com"
+        assert columns.max_id() == 3
+
+    def test_scans(self, columns):
+        """Partition dumps select bookings by date, finished bookings are those no longer active"""
+        assert [r["id"] for r in columns.dump_between("start_date", date(2030, 1, 1), date(2030, 1, 20))] == [1, 2]
+        assert [r["id"] for r in columns.dump_between("end_date", date(2030, 1, 20), date(2030, 2, 1))] == [3]
+        assert columns.finished_ids(date(2030, 1, 25)) == [3]
+        assert columns.finished_ids(date(2030, 1, 24)) == []
@@ -0,0 +1,143 @@
+import multiprocessing
+import os
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+from code.models import Booking, CarStatus
+from tests.helpers import make_car
+from code.data_access import utils
+from code.data_access.bookings import create_booking
+from code.data_access.cars import create_car, get_car
+from code.data_access.storage import get_storage
+from code.data_access.store import cars_table
+
+CARS = 48
+ATTEMPTS = 2000
+WORKERS = 4
+READ_SECONDS = 1.0
+
+def _try_booking(car_id):
+    """Try to book the car, returning the booking ID or None if rejected"""
+    start_date = date.today() + timedelta(days=10)
+    booking = Booking(
+        car_id=car_id,
+        customer_email="test@example.com",
+        start_date=start_date,
+        end_date=start_date + timedelta(days=2)
+    )
+    try:
+        return create_booking(booking).id
+    except ValueError:
+        return None
+
+def _create_cars_worker(data_dir, backend, first_car):
+    """Process entry point: create a share of the cars"""
+    utils.DATA_DIR = Path(data_dir)
+    utils.STORAGE_BACKEND = backend
+    for number in range(first_car, first_car + CARS // 4):
+        create_car(make_car(license_plate=f"{number:04d}YYY"))
+
+def _book_cars_worker(data_dir, backend, attempts):
+    """Process entry point: try to book every car"""
+    utils.DATA_DIR = Path(data_dir)
+    utils.STORAGE_BACKEND = backend
+    return [_try_booking(attempt % CARS + 1) for attempt in range(attempts)]
+
+def _use_data_dir(data_dir, backend, invalidation):
+    utils.DATA_DIR = Path(data_dir)
+    utils.STORAGE_BACKEND = backend
+    utils.CACHE_INVALIDATION = invalidation
+
+def _shared_cache_worker(data_dir, backend, invalidation, worker, barrier):
+    """Process entry point: cache the cars, create some, then list the cars created by every worker"""
+    _use_data_dir(data_dir, backend, invalidation)
+    cars_table.all()
+    barrier.wait()
+    created = [create_car(make_car(license_plate=f"{worker * CARS + number:04d}YYY")).id for number in range(CARS // WORKERS)]
+    barrier.wait()
+    return created, sorted(car.id for car in cars_table.all())
+
+def _read_worker(data_dir, backend, invalidation, barrier):
+    """Process entry point: count the car lookups served from the cache in READ_SECONDS"""
+    _use_data_dir(data_dir, backend, invalidation)
+    get_car(1)
+    barrier.wait()
+    reads, deadline = 0, time.perf_counter() + READ_SECONDS
+    while time.perf_counter() < deadline:
+        get_car(reads % CARS + 1)
+        reads += 1
+    return reads
+
+def _run_workers(function, arguments):
+    """Run `function(*args, barrier)` for each tuple of arguments, in worker processes started together"""
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager, context.Pool(len(arguments)) as pool:
+        barrier = manager.Barrier(len(arguments))
+        return pool.starmap(function, [(*args, barrier) for args in arguments])
+
+def _check_consistency(booking_ids):
+    """No car is booked twice and no created car or booking is lost"""
+    cars = get_storage().load("cars.json")
+    bookings = get_storage().load("bookings.json")
+    successful = [booking_id for booking_id in booking_ids if booking_id is not None]
+
+    assert sorted(car["id"] for car in cars) == list(range(1, CARS + 1))
+    assert all(car["status"] == CarStatus.rented for car in cars)
+    assert len(successful) == len(set(successful)) == CARS
+    assert sorted(booking["id"] for booking in bookings) == sorted(successful)
+    assert sorted(booking["car_id"] for booking in bookings) == list(range(1, CARS + 1))
+
+@pytest.mark.parametrize("backend", ["json", "log", "sqlite"])
+class TestConcurrency:
+    """Stress tests for concurrent writes"""
+
+    def test_concurrent_threads(self, temp_data_dir, backend, monkeypatch):
+        """Thousands of concurrent bookings from threads"""
+        monkeypatch.setattr(utils, "STORAGE_BACKEND", backend)
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            list(executor.map(create_car, [make_car(license_plate=f"{number:04d}YYY") for number in range(CARS)]))
+            booking_ids = list(executor.map(_try_booking, [attempt % CARS + 1 for attempt in range(ATTEMPTS)]))
+
+        _check_consistency(booking_ids)
+
+    def test_concurrent_processes(self, temp_data_dir, backend, monkeypatch):
+        """Thousands of concurrent bookings from several worker processes"""
+        monkeypatch.setattr(utils, "STORAGE_BACKEND", backend)
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(4) as pool:
+            pool.starmap(_create_cars_worker, [
+                (str(temp_data_dir), backend, worker * CARS // 4) for worker in range(4)
+            ])
+            results = pool.starmap(_book_cars_worker, [(str(temp_data_dir), backend, ATTEMPTS // 4)] * 4)
+
+        _check_consistency([booking_id for result in results for booking_id in result])
+
+@pytest.mark.parametrize("backend", ["json", "log", "sqlite"])
+class TestWorkers:
+    """Tests for several worker processes caching the same data directory"""
+
+    @pytest.mark.parametrize("invalidation", ["signature", "generation"])
+    def test_workers_see_each_other_writes(self, temp_data_dir, backend, invalidation):
+        """Workers with a cached table see the cars created by the others"""
+        results = _run_workers(_shared_cache_worker, [
+            (str(temp_data_dir), backend, invalidation, worker) for worker in range(WORKERS)
+        ])
+
+        created = sorted(car_id for result in results for car_id in result[0])
+        assert created == list(range(1, CARS + 1))
+        assert all(result[1] == created for result in results)
+
+    def test_read_throughput_scales(self, temp_data_dir, backend, monkeypatch):
+        """Cached reads of several workers scale with the processes"""
+        if (os.cpu_count() or 1) < WORKERS:
+            pytest.skip(f"Needs {WORKERS} CPUs")
+        monkeypatch.setattr(utils, "STORAGE_BACKEND", backend)
+        for number in range(CARS):
+            create_car(make_car(license_plate=f"{number:04d}YYY"))
+
+        arguments = (str(temp_data_dir), backend, "generation")
+        single = sum(_run_workers(_read_worker, [arguments]))
+        several = sum(_run_workers(_read_worker, [arguments] * WORKERS))
+        assert several > single * WORKERS / 2
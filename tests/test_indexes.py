@@ -0,0 +1,146 @@
+from datetime import date
+from code.models import Booking, BookingStatus
+from tests.helpers import make_car
+from code.data_access.indexes import FieldIndex, IntervalIndex, OccupancyIndex, RangeIndex
+
+def _booking(booking_id, car_id, start_date, end_date, status=BookingStatus.active, total_price=None):
+    return Booking(
+        id=booking_id,
+        car_id=car_id,
+        customer_email="test@example.com",
+        start_date=start_date,
+        end_date=end_date,
+        total_price=total_price,
+        status=status
+    )
+
+class TestIntervalIndex:
+    """Tests for the per-car booking interval index"""
+
+    def test_find_conflict(self):
+        """Only overlapping active bookings of the same car conflict"""
+        index = IntervalIndex()
+        index.rebuild([
+            _booking(1, 1, date(2030, 1, 10), date(2030, 1, 15)),
+            _booking(2, 1, date(2030, 1, 20), date(2030, 1, 25)),
+            _booking(3, 2, date(2030, 1, 1), date(2030, 2, 1)),
+            _booking(4, 1, date(2030, 1, 15), date(2030, 1, 20), BookingStatus.cancelled),
+        ])
+
+        assert index.find_conflict(1, date(2030, 1, 12), date(2030, 1, 13)) == 1
+        assert index.find_conflict(1, date(2030, 1, 14), date(2030, 1, 21)) == 2
+        assert index.find_conflict(1, date(2030, 1, 1), date(2030, 2, 1)) is not None
+        assert index.find_conflict(1, date(2030, 1, 15), date(2030, 1, 20)) is None
+        assert index.find_conflict(1, date(2030, 1, 1), date(2030, 1, 10)) is None
+        assert index.find_conflict(3, date(2030, 1, 1), date(2030, 2, 1)) is None
+
+    def test_add_and_remove(self):
+        """The index follows added and removed bookings"""
+        index = IntervalIndex()
+        booking = _booking(1, 1, date(2030, 1, 10), date(2030, 1, 15))
+
+        index.add(booking)
+        assert index.find_conflict(1, date(2030, 1, 11), date(2030, 1, 12)) == 1
+
+        index.remove(booking)
+        assert index.find_conflict(1, date(2030, 1, 11), date(2030, 1, 12)) is None
+
+    def test_overlapping_bookings(self):
+        """Cars with overlapping stored bookings are still checked correctly"""
+        index = IntervalIndex()
+        index.rebuild([
+            _booking(1, 1, date(2030, 1, 1), date(2030, 3, 1)),
+            _booking(2, 1, date(2030, 1, 5), date(2030, 1, 6)),
+        ])
+
+        assert index.find_conflict(1, date(2030, 2, 1), date(2030, 2, 2)) == 1
+
+class TestOccupancyIndex:
+    """Tests for the per-day occupancy counters"""
+
+    def test_daily_and_car_totals(self):
+        """Active and completed bookings are counted per day, with their price spread over their days"""
+        index = OccupancyIndex()
+        index.rebuild([
+            _booking(1, 1, date(2030, 1, 2), date(2030, 1, 4), total_price=100.0),
+            _booking(2, 2, date(2030, 1, 3), date(2030, 1, 5), BookingStatus.completed, total_price=60.0),
+            _booking(3, 1, date(2030, 1, 4), date(2030, 1, 6), BookingStatus.cancelled, total_price=80.0),
+        ])
+
+        booked, revenue = index.daily(date(2030, 1, 1), date(2030, 1, 6))
+        assert booked == [0, 1, 2, 1, 0]
+        assert revenue == [0.0, 50.0, 80.0, 30.0, 0.0]
+        assert index.daily(date(2029, 12, 30), date(2030, 1, 1)) == ([0, 0], [0.0, 0.0])
+
+        assert index.car_daily(1, date(2030, 1, 3), date(2030, 1, 5)) == ([1, 0], [50.0, 0.0])
+        assert index.car_totals(date(2030, 1, 3), date(2030, 2, 1)) == {1: (1, 50.0), 2: (2, 60.0)}
+
+    def test_add_and_remove(self):
+        """The counters follow added and removed bookings"""
+        index = OccupancyIndex()
+        booking = _booking(1, 1, date(2030, 1, 10), date(2030, 1, 12), total_price=40.0)
+
+        index.add(booking)
+        index.add(_booking(2, 2, date(2030, 1, 1), date(2030, 1, 2)))
+        assert index.daily(date(2030, 1, 10), date(2030, 1, 13))[0] == [1, 1, 0]
+
+        index.remove(booking)
+        assert index.daily(date(2030, 1, 10), date(2030, 1, 13)) == ([0, 0, 0], [0.0, 0.0, 0.0])
+        assert index.car_totals(date(2030, 1, 1), date(2030, 2, 1)) == {2: (1, 0.0)}
+
+    def test_overlapping_bookings_of_a_car(self):
+        """Days covered by several bookings of a car are counted once, their revenue is added up"""
+        index = OccupancyIndex()
+        index.rebuild([
+            _booking(1, 1, date(2030, 1, 1), date(2030, 1, 20), BookingStatus.completed, total_price=190.0),
+            _booking(2, 1, date(2030, 1, 10), date(2030, 1, 12), total_price=20.0),
+        ])
+        overlapping = _booking(3, 1, date(2030, 1, 11), date(2030, 1, 13), total_price=20.0)
+        index.add(overlapping)
+
+        assert index.daily(date(2030, 1, 9), date(2030, 1, 14))[0] == [1, 1, 1, 1, 1]
+        assert index.car_daily(1, date(2030, 1, 19), date(2030, 1, 21)) == ([1, 0], [10.0, 0.0])
+        assert index.car_totals(date(2030, 1, 15), date(2030, 2, 1)) == {1: (5, 50.0)}
+        assert index.car_totals(date(2030, 1, 9), date(2030, 1, 14)) == {1: (5, 90.0)}
+
+        index.remove(overlapping)
+        assert index.car_totals(date(2030, 1, 9), date(2030, 1, 14)) == {1: (5, 70.0)}
+        index.remove(_booking(1, 1, date(2030, 1, 1), date(2030, 1, 20), BookingStatus.completed, total_price=190.0))
+        assert index.daily(date(2030, 1, 9), date(2030, 1, 14))[0] == [0, 1, 1, 0, 0]
+
+    def test_far_off_dates(self):
+        """A booking ending far in the future only allocates the days around its start and end"""
+        index = OccupancyIndex()
+        # One unit of revenue a day
+        index.add(_booking(1, 1, date(2030, 1, 1), date(9999, 12, 31), total_price=2910981.0))
+        assert len(index._booked) == 2
+        assert index.daily(date(2029, 12, 31), date(2030, 1, 2))[0] == [0, 1]
+        assert index.daily(date(5000, 1, 1), date(5000, 1, 2))[0] == [1]
+        assert index.car_totals(date(9999, 12, 1), date(9999, 12, 31)) == {1: (30, 30.0)}
+
+class TestCarIndexes:
+    """Tests for the hash and range indexes of the cars"""
+
+    def test_normalized_field_index(self):
+        """Values are normalized when indexed and when looked up"""
+        index = FieldIndex("brand", normalize=str.casefold)
+        index.rebuild([make_car(id=1, brand="Toyota"), make_car(id=2, brand="TOYOTA"), make_car(id=3, brand="Seat")])
+
+        assert index.ids("toyota") == [1, 2]
+        index.remove(make_car(id=2, brand="TOYOTA"))
+        assert index.ids("Toyota") == [1]
+
+    def test_range_index(self):
+        """Range queries return the IDs within inclusive, optional bounds"""
+        index = RangeIndex("price")
+        index.rebuild([make_car(id=1, price=30.0), make_car(id=2, price=50.0), make_car(id=3, price=50.0), make_car(id=4, price=90.0)])
+
+        assert index.ids_between(40.0, 50.0) == {2, 3}
+        assert index.ids_between(None, 30.0) == {1}
+        assert index.ids_between(60.0) == {4}
+        assert index.ids_between(95.0) == set()
+
+        index.remove(make_car(id=2, price=50.0))
+        index.add(make_car(id=5, price=45.0))
+        assert index.ids_between(40.0, 50.0) == {3, 5}
+
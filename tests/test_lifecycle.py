@@ -0,0 +1,85 @@
+from datetime import date, timedelta
+from code.models import Booking, BookingStatus, CarStatus
+from tests.helpers import make_car
+from code.data_access import lifecycle
+from code.data_access.bookings import create_booking, delete_booking
+from code.data_access.cars import create_car, get_car
+from code.data_access.reports import get_utilization
+from code.data_access.store import archived_bookings_table, bookings_table
+
+def _book(car_id, start, days):
+    return create_booking(Booking(
+        car_id=car_id, customer_email="test@example.com", start_date=start, end_date=start + timedelta(days=days)
+    ))
+
+class TestLifecycle:
+    """Tests for the completion and archiving of the ended bookings"""
+
+    def test_complete_expired_bookings(self):
+        """Ended bookings are completed and their car freed once it has no active booking left"""
+        first, second = create_car(make_car(license_plate="1111YYY")), create_car(make_car(license_plate="2222YYY"))
+        start = date.today() + timedelta(days=1)
+        short = _book(first.id, start, 2)
+        # A rented car cannot be booked through the API, add its second booking directly
+        later = bookings_table.insert(Booking(
+            id=bookings_table.allocate_ids(), car_id=first.id, customer_email="test@example.com",
+            start_date=start + timedelta(days=5), end_date=start + timedelta(days=7), status=BookingStatus.active
+        ))
+        other = _book(second.id, start, 3)
+        assert lifecycle.next_end_date() == short.end_date
+
+        assert lifecycle.complete_expired_bookings(short.end_date) == [short.id]
+        assert bookings_table.get(short.id).status == BookingStatus.completed
+        assert get_car(first.id).status == CarStatus.rented
+        assert lifecycle.next_end_date() == other.end_date
+
+        assert sorted(lifecycle.complete_expired_bookings(later.end_date)) == [later.id, other.id]
+        assert get_car(first.id).status == CarStatus.available
+        assert get_car(second.id).status == CarStatus.available
+        assert lifecycle.next_end_date() is None
+
+    def test_deleted_bookings_are_skipped(self):
+        """Bookings deleted after being indexed are not completed"""
+        car = create_car(make_car())
+        booking = _book(car.id, date.today() + timedelta(days=1), 2)
+        delete_booking(booking.id)
+        assert lifecycle.complete_expired_bookings(booking.end_date) == []
+
+    def test_archive_old_bookings(self, client):
+        """Old finished bookings move to the archive, still counted by the reports and deletable"""
+        car = create_car(make_car())
+        start = date.today() + timedelta(days=1)
+        booking = _book(car.id, start, 2)
+        today = booking.end_date + timedelta(days=lifecycle.ARCHIVE_AFTER_DAYS)
+
+        assert lifecycle.run_lifecycle(today - timedelta(days=1)) == {"completed": 1, "archived": 0}
+        assert lifecycle.run_lifecycle(today) == {"completed": 0, "archived": 1}
+        assert bookings_table.get(booking.id) is None
+        assert archived_bookings_table.get(booking.id).status == BookingStatus.completed
+        assert get_utilization(start, booking.end_date).booked_days == 2
+
+        # Archived IDs stay taken
+        response = client.post("/bookings/new_booking", json={
+            "id": booking.id, "car_id": car.id, "customer_email": "test@example.com",
+            "start_date": str(start), "end_date": str(start + timedelta(days=1))
+        })
+        assert response.status_code == 400
+        assert "already registered" in response.json()["detail"]
+
+        response = client.delete(f"/bookings/delete_booking/{booking.id}")
+        assert response.status_code == 200
+        assert archived_bookings_table.get(booking.id) is None
+
+    def test_ids_after_archived_bookings(self, monkeypatch):
+        """Generated booking IDs stay above the archived bookings once they left the bookings table"""
+        car = create_car(make_car())
+        start = date.today() + timedelta(days=1)
+        booking = create_booking(Booking(
+            id=50, car_id=car.id, customer_email="test@example.com", start_date=start, end_date=start + timedelta(days=2)
+        ))
+        lifecycle.run_lifecycle(booking.end_date)
+        assert lifecycle.archive_old_bookings(booking.end_date + timedelta(days=lifecycle.ARCHIVE_AFTER_DAYS)) == [50]
+
+        # Reloaded as by another worker, the bookings table no longer knows about ID 50
+        monkeypatch.setattr(bookings_table, "_source", None)
+        assert _book(car.id, start, 2).id == 51
@@ -0,0 +1,36 @@
+import json
+import logging
+import sys
+from code import logging_config
+from code.logging_config import JsonFormatter, sampled
+
+class TestLogging:
+    """Tests for the logging configuration"""
+
+    def test_json_formatter(self):
+        """Records are formatted as one JSON object with the message merged"""
+        try:
+            raise ValueError("bad value")
+        except ValueError:
+            record = logging.LogRecord("code.test", logging.ERROR, __file__, 1, "Car %s failed", (7,), sys.exc_info())
+
+        entry = json.loads(JsonFormatter().format(record))
+        assert entry["level"] == "ERROR"
+        assert entry["logger"] == "code.test"
+        assert entry["message"] == "Car 7 failed"
+        assert "ValueError: bad value" in entry["exception"]
+
+    def test_sampling(self, caplog, monkeypatch):
+        """Hot-path messages are emitted at the configured rate"""
+        logger = logging.getLogger("code.test.sampling")
+        hot_path_logger = sampled(logger)
+
+        with caplog.at_level(logging.INFO, logger=logger.name):
+            monkeypatch.setattr(logging_config, "LOG_SAMPLE_RATE", 0.0)
+            for _ in range(100):
+                hot_path_logger.info("Lookup %s.", 1)
+            assert caplog.records == []
+
+            monkeypatch.setattr(logging_config, "LOG_SAMPLE_RATE", 1.0)
+            hot_path_logger.info("Lookup %s.", 2)
+            assert [record.getMessage() for record in caplog.records] == ["Lookup 2."]
@@ -0,0 +1,59 @@
+from datetime import date, timedelta
+from code.data_access import utils
+from code.metrics import BYTES_WRITTEN, HTTP_REQUESTS, STAGE_SECONDS, Histogram, _registry, render
+
+class TestMetrics:
+    """Tests for the metrics registry"""
+
+    def test_histogram_exposition(self):
+        """Histograms export cumulative buckets, sum and count"""
+        histogram = Histogram("test_latency_seconds", "Test latency.", ["stage"], buckets=(0.1, 1.0))
+        try:
+            for value in (0.05, 0.5, 5.0):
+                histogram.observe(value, stage="load")
+            text = render()
+        finally:
+            _registry.remove(histogram)
+
+        assert "# TYPE test_latency_seconds histogram" in text
+        assert 'test_latency_seconds_bucket{stage="load",le="0.1"} 1' in text
+        assert 'test_latency_seconds_bucket{stage="load",le="1"} 2' in text
+        assert 'test_latency_seconds_bucket{stage="load",le="+Inf"} 3' in text
+        assert 'test_latency_seconds_sum{stage="load"} 5.55' in text
+        assert 'test_latency_seconds_count{stage="load"} 3' in text
+
+class TestMetricsEndpoints:
+    """Tests for the metrics endpoint"""
+
+    def test_metrics_after_booking(self, client, sample_car_data):
+        """Requests, stages, records and cache lookups are exported"""
+        created = HTTP_REQUESTS.value(method="POST", path="/bookings/new_booking", status=201)
+        bookings = STAGE_SECONDS.count(stage="create_booking")
+
+        car_id = client.post("/cars/new_car", json=sample_car_data).json()["id"]
+        start = date.today() + timedelta(days=1)
+        response = client.post("/bookings/new_booking", json={
+            "car_id": car_id, "customer_email": "test@example.com",
+            "start_date": str(start), "end_date": str(start + timedelta(days=2))
+        })
+        assert response.status_code == 201
+
+        assert HTTP_REQUESTS.value(method="POST", path="/bookings/new_booking", status=201) == created + 1
+        assert STAGE_SECONDS.count(stage="create_booking") == bookings + 1
+        assert STAGE_SECONDS.count(stage="is_car_available") > 0
+
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert 'http_requests_total{method="POST",path="/bookings/new_booking",status="201"}' in response.text
+        assert 'stage_duration_seconds_count{stage="create_booking"}' in response.text
+        assert 'table_records{table="bookings.json"}' in response.text
+        assert 'table_cache_lookups_total{table="cars.json",result="hit"}' in response.text
+
+    def test_bytes_written(self, client, sample_car_data, monkeypatch):
+        """Bytes written to the JSON files are counted"""
+        monkeypatch.setattr(utils, "STORAGE_BACKEND", "json")
+        written = BYTES_WRITTEN.value(file="cars.json")
+
+        client.post("/cars/new_car", json=sample_car_data)
+        assert BYTES_WRITTEN.value(file="cars.json") - written == (utils.DATA_DIR / "cars.json").stat().st_size
@@ -0,0 +1,110 @@
+import pytest
+from pydantic import ValidationError
+from datetime import date, timedelta
+from code.models import Booking, LongRentalDiscount, PricingRules, Season
+from tests.helpers import make_car
+from code.data_access import pricing
+from code.data_access.bookings import create_booking
+from code.data_access.cars import create_car
+
+RULES = PricingRules(
+    seasons=[
+        Season(start="07-01", end="08-31", multiplier=1.5),
+        # Overlaps the summer, which is listed first and wins
+        Season(start="08-15", end="09-15", multiplier=1.2),
+        Season(start="12-20", end="01-06", multiplier=2.0),
+    ],
+    weekend_surcharge=0.1,
+    long_rental_discounts=[LongRentalDiscount(min_days=7, discount=0.1), LongRentalDiscount(min_days=30, discount=0.2)],
+)
+
+def _expected_price(price, start, end):
+    """Price a rental day by day, the way the rules read"""
+    total, day = 0.0, start
+    while day < end:
+        if date(day.year, 7, 1) <= day <= date(day.year, 8, 31):
+            factor = 1.5
+        elif date(day.year, 8, 15) <= day <= date(day.year, 9, 15):
+            factor = 1.2
+        elif day >= date(day.year, 12, 20) or day <= date(day.year, 1, 6):
+            factor = 2.0
+        else:
+            factor = 1.0
+        total += price * factor * (1.1 if day.weekday() >= 5 else 1.0)
+        day += timedelta(days=1)
+    days = (end - start).days
+    discount = 0.2 if days >= 30 else 0.1 if days >= 7 else 0.0
+    return round(total * (1 - discount), 2)
+
+@pytest.fixture
+def rules():
+    pricing.set_rules(RULES)
+    yield RULES
+    pricing.set_rules(PricingRules())
+
+class TestPricing:
+    """Tests for the pricing rules and the quotes"""
+
+    def test_default_rules_charge_the_daily_price(self):
+        """Without rules, a rental costs the daily price of the car times its days"""
+        quote = pricing.quote_car(make_car(), date(2030, 8, 3), date(2030, 8, 13))
+        assert quote.total_days == 10
+        assert quote.discount == 0.0
+        assert quote.base_price == quote.total_price == 500.0
+
+    @pytest.mark.parametrize("start,end", [
+        (date(2030, 6, 28), date(2030, 7, 2)),
+        (date(2030, 8, 10), date(2030, 8, 20)),
+        (date(2030, 12, 28), date(2031, 1, 10)),
+        (date(2031, 2, 20), date(2031, 3, 25)),
+        (date(2032, 2, 27), date(2032, 3, 2)),
+        (date(2030, 1, 1), date(2034, 1, 1)),
+        (date(1999, 12, 25), date(2401, 1, 3)),
+    ])
+    def test_quote_follows_the_rules(self, rules, start, end):
+        """Prefix sums give the same price as adding up the days one by one"""
+        quote = pricing.quote_car(make_car(), start, end)
+        assert quote.total_price == pytest.approx(_expected_price(50.0, start, end), abs=0.01)
+        assert quote.base_price == 50.0 * (end - start).days
+
+    @pytest.mark.parametrize("day", ["13-01", "02-30", "00-10"])
+    def test_invalid_season_days(self, day):
+        """Seasons must start and end on days of the year"""
+        with pytest.raises(ValidationError):
+            Season(start=day, end="12-31", multiplier=1.2)
+        assert Season(start="02-29", end="03-01", multiplier=1.2).start == "02-29"
+
+    def test_quotes_are_cached_until_the_rules_change(self, rules):
+        """Quotes are cached by car and dates, and dropped with the rules they were computed with"""
+        car, start, end = make_car(), date(2030, 7, 1), date(2030, 7, 3)
+        first = pricing.quote_car(car, start, end)
+        assert pricing.quote_car(car, start, end) is first
+        assert pricing.quote_car(make_car(price=80.0), start, end).total_price == 240.0
+
+        pricing.set_rules(PricingRules())
+        assert pricing.quote_car(car, start, end).total_price == 100.0
+
+    def test_booking_price_follows_the_rules(self, rules):
+        """Bookings are priced like their quote"""
+        car = create_car(make_car())
+        start = date.today() + timedelta(days=1)
+        booking = create_booking(Booking(
+            car_id=car.id, customer_email="test@example.com", start_date=start, end_date=start + timedelta(days=8)
+        ))
+        assert booking.total_days == 8
+        assert booking.total_price == _expected_price(50.0, start, start + timedelta(days=8))
+
+    def test_quote_endpoint(self, client, rules):
+        """Quoting a car through the API"""
+        car = create_car(make_car())
+        response = client.get("/bookings/quote", params={"car_id": car.id, "start": "2030-07-05", "end": "2030-07-08"})
+        assert response.status_code == 200
+        assert response.json() == {
+            "car_id": car.id, "start_date": "2030-07-05", "end_date": "2030-07-08", "total_days": 3,
+            "base_price": 150.0, "discount": 0.0, "total_price": 240.0,
+        }
+
+        response = client.get("/bookings/quote", params={"car_id": car.id, "start": "2030-07-08", "end": "2030-07-08"})
+        assert response.status_code == 400
+        response = client.get("/bookings/quote", params={"car_id": 999, "start": "2030-07-05", "end": "2030-07-08"})
+        assert response.status_code == 404
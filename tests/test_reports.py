@@ -0,0 +1,58 @@
+from datetime import date, timedelta
+from code.models import Booking
+from tests.helpers import make_car
+from code.data_access.bookings import create_booking, delete_booking
+from code.data_access.cars import create_car
+
+class TestReportsEndpoints:
+    """Tests for the reporting endpoints"""
+
+    def test_utilization(self, client):
+        """Fleet and per-car utilization follow created and deleted bookings"""
+        first = create_car(make_car())
+        second = create_car(make_car(license_plate="5678ZZZ", price=30.0))
+        start = date.today() + timedelta(days=1)
+        booking = create_booking(Booking(
+            car_id=first.id, customer_email="a@example.com", start_date=start, end_date=start + timedelta(days=2)
+        ))
+        create_booking(Booking(
+            car_id=second.id, customer_email="b@example.com", start_date=start + timedelta(days=1),
+            end_date=start + timedelta(days=4)
+        ))
+
+        params = {"start": str(start), "end": str(start + timedelta(days=4))}
+        report = client.get("/reports/utilization", params=params).json()
+        assert report["cars"] == 2
+        assert report["booked_days"] == 5
+        assert report["revenue"] == 190.0
+        assert report["utilization"] == 5 / 8
+        assert [period["booked_days"] for period in report["periods"]] == [1, 2, 1, 1]
+        assert report["periods"][0]["period"] == str(start)
+
+        report = client.get("/reports/utilization", params={**params, "car_id": second.id}).json()
+        assert [period["booked_days"] for period in report["periods"]] == [0, 1, 1, 1]
+        assert report["revenue"] == 90.0
+
+        report = client.get("/reports/utilization", params={**params, "granularity": "month"}).json()
+        assert sum(period["booked_days"] for period in report["periods"]) == 5
+        assert report["periods"][0]["period"] == start.strftime("%Y-%m")
+
+        cars = client.get("/reports/utilization/cars", params=params).json()
+        assert [(car["car_id"], car["booked_days"], car["revenue"]) for car in cars] == [
+            (first.id, 2, 100.0), (second.id, 3, 90.0)
+        ]
+
+        delete_booking(booking.id)
+        report = client.get("/reports/utilization", params=params).json()
+        assert report["booked_days"] == 3
+        assert report["revenue"] == 90.0
+
+    def test_utilization_invalid(self, client):
+        """Invalid ranges, granularities and cars are rejected"""
+        response = client.get("/reports/utilization", params={"start": "2030-01-10", "end": "2030-01-05"})
+        assert response.status_code == 400
+        response = client.get("/reports/utilization", params={"start": "2030-01-01", "end": "2030-01-05", "granularity": "week"})
+        assert response.status_code == 422
+        response = client.get("/reports/utilization", params={"start": "2030-01-01", "end": "2030-01-05", "car_id": 99})
+        assert response.status_code == 400
+        assert "not found" in response.json()["detail"]
@@ -0,0 +1,184 @@
+import json
+import pytest
+from datetime import date
+from code.models import Booking, BookingStatus, CarStatus
+from tests.helpers import make_car
+from code.data_access import utils
+from code.data_access.cars import create_car, get_car, update_car_status
+from code.data_access.store import bookings_table, cars_table
+from code.data_access.storage import LogStorage, get_storage
+
+@pytest.fixture
+def log_backend(monkeypatch):
+    """Use the append-only log storage backend"""
+    monkeypatch.setattr(utils, "STORAGE_BACKEND", "log")
+    return get_storage()
+
+class TestLogStorage:
+    """Tests for the append-only log storage backend"""
+
+    def test_changes_are_appended(self, temp_data_dir, log_backend):
+        """Changes are appended to the log and the snapshot is left untouched"""
+        create_car(make_car())
+        update_car_status(1, CarStatus.rented)
+
+        assert json.loads((temp_data_dir / "cars.json").read_text()) == []
+        events = [json.loads(line) for line in (temp_data_dir / "cars.json.log").read_text().splitlines()]
+        assert [event["op"] for event in events] == ["insert", "update"]
+        assert events[1] == {"op": "update", "id": 1, "changes": {"status": "Rented"}}
+
+    def test_replay(self, temp_data_dir, log_backend):
+        """Loading replays the log over the snapshot"""
+        (temp_data_dir / "cars.json").write_text(json.dumps([
+            {**make_car(license_plate="0001YYY").model_dump(), "id": 1},
+            {**make_car(license_plate="0002YYY").model_dump(), "id": 2},
+        ]))
+        with (temp_data_dir / "cars.json.log").open("w") as f:
+            f.write(json.dumps({"op": "insert", "record": {**make_car(license_plate="0003YYY").model_dump(), "id": 3}}) + "\n")
+            f.write(json.dumps({"op": "update", "id": 1, "changes": {"status": "Maintenance"}}) + "\n")
+            f.write(json.dumps({"op": "delete", "id": 2}) + "\n")
+            f.write('{"op": "ins')
+
+        records = log_backend.load("cars.json")
+        assert [record["id"] for record in records] == [1, 3]
+        assert records[0]["status"] == "Maintenance"
+        assert get_car(2) is None
+
+    def test_append_after_torn_line(self, temp_data_dir, log_backend):
+        """Events appended after a crash in the middle of an append are replayed"""
+        create_car(make_car(license_plate="0001YYY"))
+        with (temp_data_dir / "cars.json.log").open("a") as f:
+            f.write('{"op": "ins')
+
+        create_car(make_car(license_plate="0002YYY"))
+        assert [record["id"] for record in log_backend.load("cars.json")] == [1, 2]
+
+    def test_compaction(self, temp_data_dir, log_backend):
+        """Compaction folds the log into the snapshot"""
+        for number in range(3):
+            create_car(make_car(license_plate=f"{number:04d}YYY"))
+        update_car_status(2, CarStatus.rented)
+
+        cars_table.compact()
+
+        assert (temp_data_dir / "cars.json.log").read_text() == ""
+        snapshot = json.loads((temp_data_dir / "cars.json").read_text())
+        assert [car["id"] for car in snapshot] == [1, 2, 3]
+        assert snapshot[1]["status"] == "Rented"
+        assert get_car(2).status == CarStatus.rented
+
+    def test_needs_compaction(self, temp_data_dir):
+        """The log asks for compaction once it holds enough events"""
+        storage = LogStorage(max_events=3)
+        storage.load("cars.json")
+        storage.write("cars.json", [{"op": "delete", "id": 1}], list)
+        assert not storage.needs_compaction("cars.json")
+        storage.write("cars.json", [{"op": "delete", "id": 2}, {"op": "delete", "id": 3}], list)
+        assert storage.needs_compaction("cars.json")
+
+def _booking(booking_id, start_date):
+    return Booking(
+        id=booking_id,
+        car_id=1,
+        customer_email="test@example.com",
+        start_date=start_date,
+        end_date=date(start_date.year, start_date.month, start_date.day + 2),
+        total_days=2,
+        total_price=100.0,
+        status=BookingStatus.completed
+    )
+
+class TestPartitionedJsonStorage:
+    """Tests for the bookings stored by month with the JSON backend"""
+
+    def test_single_file_is_split(self, temp_data_dir, monkeypatch):
+        """A single bookings file is read as is and split into months by the first change"""
+        monkeypatch.setattr(utils, "STORAGE_BACKEND", "json")
+        (temp_data_dir / "bookings.json").write_text(json.dumps([
+            _booking(1, date(2024, 1, 10)).model_dump(mode="json"),
+            _booking(2, date(2024, 3, 5)).model_dump(mode="json"),
+        ]))
+        assert bookings_table.get(2).start_date == date(2024, 3, 5)
+
+        bookings_table.update(1, status=BookingStatus.cancelled)
+
+        assert not (temp_data_dir / "bookings.json").exists()
+        assert json.loads((temp_data_dir / "bookings" / "manifest.json").read_text()) == ["2024-01", "2024-03"]
+        january = json.loads((temp_data_dir / "bookings" / "2024-01.json").read_text())
+        assert [(booking["id"], booking["status"]) for booking in january] == [(1, "Cancelled")]
+        assert sorted(booking["id"] for booking in get_storage().load("bookings.json")) == [1, 2]
+
+    def test_changes_rewrite_their_partitions(self, temp_data_dir, monkeypatch):
+        """Changes only rewrite the months of the bookings they touch"""
+        monkeypatch.setattr(utils, "STORAGE_BACKEND", "json")
+        bookings_table.insert_many([_booking(1, date(2024, 1, 10)), _booking(2, date(2024, 3, 5))])
+        march = temp_data_dir / "bookings" / "2024-03.json"
+        march_inode = march.stat().st_ino
+
+        bookings_table.insert(_booking(3, date(2024, 1, 20)))
+        bookings_table.delete(1)
+        assert march.stat().st_ino == march_inode
+        assert [booking["id"] for booking in json.loads((temp_data_dir / "bookings" / "2024-01.json").read_text())] == [3]
+
+        # Emptied months are dropped
+        bookings_table.delete(2)
+        assert not march.exists()
+        assert json.loads((temp_data_dir / "bookings" / "manifest.json").read_text()) == ["2024-01"]
+        assert [booking.id for booking in bookings_table.all()] == [3]
+
+    def test_switch_to_log_backend(self, temp_data_dir, monkeypatch):
+        """The log backend reads and compacts the bookings split by the JSON backend, losing none"""
+        monkeypatch.setattr(utils, "STORAGE_BACKEND", "json")
+        bookings_table.insert_many([_booking(1, date(2024, 1, 10)), _booking(2, date(2024, 3, 5))])
+        assert not (temp_data_dir / "bookings.json").exists()
+
+        monkeypatch.setattr(utils, "STORAGE_BACKEND", "log")
+        assert [booking.id for booking in bookings_table.all()] == [1, 2]
+        bookings_table.insert(_booking(3, date(2024, 4, 1)))
+        bookings_table.compact()
+        assert json.loads((temp_data_dir / "bookings" / "manifest.json").read_text()) == ["2024-01", "2024-03", "2024-04"]
+
+        monkeypatch.setattr(utils, "STORAGE_BACKEND", "json")
+        assert [booking.id for booking in bookings_table.all()] == [1, 2, 3]
+
+class TestSqliteStorage:
+    """Tests for the SQLite storage backend"""
+
+    def test_migrate_from_json(self, temp_data_dir, monkeypatch):
+        """The migrator copies the JSON files into the database"""
+        monkeypatch.setattr(utils, "STORAGE_BACKEND", "json")
+        for number in range(3):
+            create_car(make_car(license_plate=f"{number:04d}YYY"))
+        update_car_status(2, CarStatus.rented)
+
+        from code.data_access.migrate import migrate_json_to_sqlite
+        assert migrate_json_to_sqlite() == {"cars.json": 3, "bookings.json": 0, "bookings_archive.json": 0}
+
+        monkeypatch.setattr(utils, "STORAGE_BACKEND", "sqlite")
+        assert [car.id for car in cars_table.all()] == [1, 2, 3]
+        assert get_car(2).status == CarStatus.rented
+
+    def test_changes_are_row_statements(self, temp_data_dir, monkeypatch):
+        """Changes are stored row by row and bump the table version"""
+        monkeypatch.setattr(utils, "STORAGE_BACKEND", "sqlite")
+        storage = get_storage()
+
+        create_car(make_car())
+        version = storage.signature("cars.json")
+        update_car_status(1, CarStatus.maintenance)
+
+        assert storage.signature("cars.json") == version + 1
+        assert storage.load("cars.json")[0]["status"] == "Maintenance"
+        assert json.loads((temp_data_dir / "cars.json").read_text()) == []
+
+    def test_indexes(self, temp_data_dir, monkeypatch):
+        """The lookup columns are indexed"""
+        monkeypatch.setattr(utils, "STORAGE_BACKEND", "sqlite")
+        storage = get_storage()
+        storage.load("cars.json")
+
+        with storage._pool().connection() as connection:
+            rows = connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'").fetchall()
+            journal_mode = connection.execute("PRAGMA journal_mode").fetchone()[0]
+        assert {"idx_cars_status", "idx_bookings_car_dates", "idx_bookings_status"} <= {row["name"] for row in rows}
+        assert journal_mode == "wal"
@@ -0,0 +1,66 @@
+import json
+import os
+from code.models import CarStatus
+from tests.helpers import make_car
+from code.data_access import utils
+from code.data_access.cars import create_car, get_car, update_car_status
+from code.data_access.store import cars_table
+from code.data_access.storage import get_storage
+
+class TestStore:
+    """Tests for the in-memory write-through store"""
+
+    def test_reads_served_from_memory(self, temp_data_dir, monkeypatch):
+        """Repeated reads do not parse the JSON file again"""
+        create_car(make_car())
+        get_car(1)
+
+        def fail(filename):
+            raise AssertionError(f"{filename} was loaded again")
+        monkeypatch.setattr(utils, "_load_file", fail)
+
+        assert get_car(1).brand == "Toyota"
+        assert len(cars_table.all()) == 1
+
+    def test_writes_go_through_to_disk(self, temp_data_dir):
+        """Mutations are persisted to the JSON file"""
+        created_car = create_car(make_car())
+        update_car_status(created_car.id, CarStatus.maintenance)
+
+        data = get_storage().load("cars.json")
+        assert len(data) == 1
+        assert data[0]["status"] == "Maintenance"
+
+    def test_reload_on_external_change(self, temp_data_dir, monkeypatch):
+        """Changes made to the file outside the process are picked up"""
+        monkeypatch.setattr(utils, "STORAGE_BACKEND", "json")
+        create_car(make_car())
+        assert get_car(1).status == CarStatus.available
+
+        path = temp_data_dir / "cars.json"
+        data = json.loads(path.read_text())
+        data[0]["status"] = "Out_of_Service"
+        path.write_text(json.dumps(data))
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        assert get_car(1).status == CarStatus.out_of_service
+
+    def test_ids_not_reused(self, temp_data_dir):
+        """Generated IDs come from a persistent sequence and are never reused"""
+        first = create_car(make_car())
+        second = create_car(make_car(license_plate="5678ZZZ"))
+        assert (first.id, second.id) == (1, 2)
+
+        cars_table.delete(second.id)
+        assert create_car(make_car(license_plate="9012XXX")).id == 3
+
+        data = json.loads((temp_data_dir / "sequences.json").read_text())
+        assert data == [{"table": "cars.json", "last_id": 3}]
+
+    def test_ids_after_explicit_id(self, temp_data_dir):
+        """Generated IDs skip IDs given explicitly"""
+        car = make_car()
+        car.id = 10
+        create_car(car)
+        assert create_car(make_car(license_plate="5678ZZZ")).id == 11
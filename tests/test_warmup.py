@@ -0,0 +1,98 @@
+import threading
+import time
+from datetime import date, timedelta
+from fastapi.testclient import TestClient
+from code import main
+from code.main import app
+from code.models import Booking
+from tests.helpers import make_car
+from code.data_access import warmup
+from code.data_access.bookings import create_booking
+from code.data_access.cars import create_car, get_car
+from code.data_access.store import bookings_table, cars_table
+
+class TestWarmUp:
+    """Tests for the startup warm-up and the table snapshots"""
+
+    def test_ready_after_warm_up(self, client, monkeypatch):
+        """The service reports itself ready once the tables are loaded"""
+        monkeypatch.setattr(warmup, "_ready", threading.Event())
+        response = client.get("/ready")
+        assert response.status_code == 503
+        assert response.json() == {"status": "warming_up"}
+
+        assert set(warmup.warm_up(snapshots=False).values()) == {"storage"}
+        response = client.get("/ready")
+        assert response.status_code == 200
+        assert response.json() == {"status": "ready"}
+
+    def test_warm_up_in_lifespan(self, monkeypatch):
+        """The app warms up in the background of its startup and records the startup times"""
+        monkeypatch.setattr(warmup, "_ready", threading.Event())
+        with TestClient(app) as client:
+            deadline = time.monotonic() + 10
+            while client.get("/ready").status_code != 200:
+                assert time.monotonic() < deadline
+                time.sleep(0.01)
+            metrics = client.get("/metrics").text
+        assert 'startup_seconds{phase="import"}' in metrics
+        assert 'startup_seconds{phase="warm_up"}' in metrics
+
+    def test_failed_warm_up_is_retried(self, monkeypatch):
+        """The service becomes ready once a failed warm-up succeeds again"""
+        monkeypatch.setattr(warmup, "_ready", threading.Event())
+        monkeypatch.setattr(main, "WARMUP_RETRY_DELAY", 0.01)
+        calls = []
+
+        def failing_once(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 1:
+                raise OSError("Storage not mounted yet")
+            return warmup.warm_up(*args, **kwargs)
+
+        monkeypatch.setattr(main, "warm_up", failing_once)
+        with TestClient(app) as client:
+            deadline = time.monotonic() + 10
+            while client.get("/ready").status_code != 200:
+                assert time.monotonic() < deadline
+                time.sleep(0.01)
+        assert len(calls) == 2
+
+    def test_restore_snapshot(self):
+        """Tables are restored from their snapshot while the stored table is unchanged"""
+        car = create_car(make_car())
+        start = date.today() + timedelta(days=1)
+        booking = create_booking(Booking(
+            car_id=car.id, customer_email="test@example.com", start_date=start, end_date=start + timedelta(days=2)
+        ))
+        warmup.save_snapshots()
+
+        assert warmup.warm_up(snapshots=True) == {
+            "cars.json": "snapshot", "bookings.json": "snapshot", "bookings_archive.json": "snapshot"
+        }
+        assert get_car(car.id) == car
+        assert bookings_table.get(booking.id) == booking
+        assert cars_table.query_index("license_plate", lambda index: index.get("1234YYY")) == car.id
+        assert bookings_table.query_index(
+            "intervals", lambda intervals: intervals.find_conflict(car.id, start, start + timedelta(days=1))
+        ) == booking.id
+
+        # Stale snapshots are ignored
+        other = create_car(make_car(license_plate="5678ZZZ"))
+        assert not warmup.restore_snapshot(cars_table)
+        assert warmup.warm_up(snapshots=True)["cars.json"] == "storage"
+        assert get_car(other.id) == other
+
+    def test_snapshot_of_other_code(self, monkeypatch):
+        """Snapshots taken by another version of the code are ignored"""
+        create_car(make_car())
+        warmup.save_snapshot(cars_table)
+        monkeypatch.setattr(warmup, "_code_version", lambda: 0)
+        assert not warmup.restore_snapshot(cars_table)
+
+    def test_unreadable_snapshot(self, temp_data_dir):
+        """Missing or corrupted snapshots are ignored"""
+        assert not warmup.restore_snapshot(cars_table)
+        (temp_data_dir / warmup.SNAPSHOT_DIR).mkdir()
+        (temp_data_dir / warmup.SNAPSHOT_DIR / "cars.json.pickle").write_bytes(b"corrupted")
+        assert not warmup.restore_snapshot(cars_table)